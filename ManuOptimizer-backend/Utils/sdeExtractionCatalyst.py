@@ -1,11 +1,26 @@
+import hashlib
 import os
 import sqlite3
+import sys
+import time
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 SDE_PATH = os.path.join(BASE_DIR, 'sde.sqlite')
 MINI_SDE_PATH = os.path.join(BASE_DIR, 'mini_sde.sqlite')
 
+# Rows pulled from the source cursor per executemany
+CHUNK_SIZE = 10_000
+
+# Bulk-load settings for the scratch file; it's thrown away on failure, so no journal is needed
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",  # 256 MB
+)
+
 # ── Classification maps ────────────────────────────────────────────────────────
 
 # Checked first — groupName takes priority over categoryName
@@ -68,130 +83,284 @@ MANUFACTURING_CATEGORY_MAP = {
     'Planetary Commodities':'Planetary Materials',
 }
 
-# ── Build mini SDE ─────────────────────────────────────────────────────────────
-
-if os.path.exists(MINI_SDE_PATH):
-    os.remove(MINI_SDE_PATH)
-
-full_conn = sqlite3.connect(SDE_PATH)
-full_conn.row_factory = sqlite3.Row
-full_cursor = full_conn.cursor()
-
-mini_conn = sqlite3.connect(MINI_SDE_PATH)
-mini_cursor = mini_conn.cursor()
-
-# ── Create tables ──────────────────────────────────────────────────────────────
-
-mini_cursor.execute('''
-CREATE TABLE IF NOT EXISTS types (
-    typeID   INTEGER PRIMARY KEY,
-    typeName TEXT
+# ── Helpers ────────────────────────────────────────────────────────────────────
+
+def source_checksum():
+    # The script is hashed too, so changing what gets extracted also forces a rebuild
+    digest = hashlib.sha256()
+    for path in (SDE_PATH, os.path.abspath(__file__)):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def built_checksum():
+    # Checksum recorded by the last successful build, if any
+    if not os.path.exists(MINI_SDE_PATH):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{MINI_SDE_PATH}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM buildInfo WHERE key = 'source_checksum'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def chunks(cursor):
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            return
+        yield rows
+
+
+def report(stage, rows, started):
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else float('inf')
+    print(f"── {stage}: {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s) ──")
+
+
+def classify(row):
+    # Group override takes priority, then the category map; None for anything we don't care about
+    return MANUFACTURING_GROUP_MAP.get(row['groupName']) or MANUFACTURING_CATEGORY_MAP.get(row['categoryName'])
+
+
+# ── Build stages ───────────────────────────────────────────────────────────────
+
+def create_tables(mini_cursor):
+    mini_cursor.execute('''
+    CREATE TABLE types (
+        typeID   INTEGER PRIMARY KEY,
+        typeName TEXT
+    )
+    ''')
+
+    mini_cursor.execute('''
+    CREATE TABLE materialClassifications (
+        typeID                INTEGER PRIMARY KEY,
+        typeName              TEXT,
+        groupID               INTEGER,
+        groupName             TEXT,
+        categoryID            INTEGER,
+        categoryName          TEXT,
+        manufacturingCategory TEXT
+    )
+    ''')
+
+    mini_cursor.execute('''
+    CREATE VIEW invTypes AS SELECT * FROM types
+    ''')
+
+    mini_cursor.execute('''
+    CREATE TABLE buildInfo (
+        key   TEXT PRIMARY KEY,
+        value TEXT
+    )
+    ''')
+
+
+def copy_types(full_conn, mini_cursor):
+    # Streams the joined type query; returns the published typeIDs for the industry filter
+    started = time.perf_counter()
+    full_cursor = full_conn.execute('''
+    SELECT
+        et.typeID,
+        etn.en          AS typeName,
+        et.groupID,
+        gn.en           AS groupName,
+        eg.categoryID,
+        cn.en           AS categoryName,
+        et.marketGroupID,
+        mgn.en          AS marketGroupName,
+        eg.published    AS groupPublished
+    FROM EveType et
+    JOIN EveTypeName etn   ON etn.parentTypeId  = et.typeID
+    JOIN EveGroup eg       ON eg.groupID        = et.groupID
+    JOIN GroupName gn      ON gn.parentTypeId   = et.groupID
+    JOIN CategoryName cn   ON cn.parentTypeId   = eg.categoryID
+    LEFT JOIN MarketGroupName mgn ON mgn.parentTypeId = et.marketGroupID
+    WHERE eg.published = 1
+    ''')
+
+    published = set()
+    total = 0
+    for rows in chunks(full_cursor):
+        mini_cursor.executemany(
+            "INSERT OR IGNORE INTO types (typeID, typeName) VALUES (?, ?)",
+            [(row['typeID'], row['typeName']) for row in rows]
+        )
+
+        classified = []
+        for row in rows:
+            manu_cat = classify(row)
+            if manu_cat:
+                classified.append((
+                    row['typeID'], row['typeName'],
+                    row['groupID'], row['groupName'],
+                    row['categoryID'], row['categoryName'],
+                    manu_cat
+                ))
+        mini_cursor.executemany('''
+        INSERT OR IGNORE INTO materialClassifications
+        (typeID, typeName, groupID, groupName, categoryID, categoryName, manufacturingCategory)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', classified)
+
+        published.update(row['typeID'] for row in rows)
+        total += len(rows)
+
+    report("types", total, started)
+    return published
+
+
+# Manufacturing, invention and reaction recipes for /api/blueprints/blueprints/import,
+# kept to published blueprints. Source tables use the industryActivity* layout.
+INDUSTRY_ACTIVITIES = (1, 8, 11)  # Manufacturing, invention, reactions
+
+INDUSTRY_TABLES = (
+    ('industryActivityMaterials',     'typeID, activityID, materialTypeID, quantity'),
+    ('industryActivityProducts',      'typeID, activityID, productTypeID, quantity'),
+    ('industryActivityProbabilities', 'typeID, activityID, productTypeID, probability'),
 )
-''')
-
-mini_cursor.execute('''
-CREATE TABLE IF NOT EXISTS materialClassifications (
-    typeID                INTEGER PRIMARY KEY,
-    typeName              TEXT,
-    groupID               INTEGER,
-    groupName             TEXT,
-    categoryID            INTEGER,
-    categoryName          TEXT,
-    manufacturingCategory TEXT
-)
-''')
-
-# ── Fetch all items with full join ─────────────────────────────────────────────
-
-full_cursor.execute('''
-SELECT
-    et.typeID,
-    etn.en          AS typeName,
-    et.groupID,
-    gn.en           AS groupName,
-    eg.categoryID,
-    cn.en           AS categoryName,
-    et.marketGroupID,
-    mgn.en          AS marketGroupName,
-    eg.published    AS groupPublished
-FROM EveType et
-JOIN EveTypeName etn   ON etn.parentTypeId  = et.typeID
-JOIN EveGroup eg       ON eg.groupID        = et.groupID
-JOIN GroupName gn      ON gn.parentTypeId   = et.groupID
-JOIN CategoryName cn   ON cn.parentTypeId   = eg.categoryID
-LEFT JOIN MarketGroupName mgn ON mgn.parentTypeId = et.marketGroupID
-WHERE eg.published = 1
-''')
-
-rows = full_cursor.fetchall()
-
-# ── Populate types table ───────────────────────────────────────────────────────
-
-mini_cursor.executemany(
-    "INSERT OR IGNORE INTO types (typeID, typeName) VALUES (?, ?)",
-    [(row['typeID'], row['typeName']) for row in rows]
-)
-
-# ── Classify and populate materialClassifications ─────────────────────────────
 
-classified = []
 
-for row in rows:
-    typeID       = row['typeID']
-    typeName     = row['typeName']
-    groupID      = row['groupID']
-    groupName    = row['groupName']
-    categoryID   = row['categoryID']
-    categoryName = row['categoryName']
+def copy_industry(full_conn, mini_cursor, published):
+    # Separate execute() calls: executescript() would commit the build transaction
+    mini_cursor.execute('''
+    CREATE TABLE industryActivityMaterials (
+        typeID         INTEGER,
+        activityID     INTEGER,
+        materialTypeID INTEGER,
+        quantity       INTEGER
+    )
+    ''')
+    mini_cursor.execute('''
+    CREATE TABLE industryActivityProducts (
+        typeID        INTEGER,
+        activityID    INTEGER,
+        productTypeID INTEGER,
+        quantity      INTEGER
+    )
+    ''')
+    mini_cursor.execute('''
+    CREATE TABLE industryActivityProbabilities (
+        typeID        INTEGER,
+        activityID    INTEGER,
+        productTypeID INTEGER,
+        probability   REAL
+    )
+    ''')
+
+    full_tables = {r[0] for r in full_conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+    activity_filter = f"activityID IN ({', '.join('?' * len(INDUSTRY_ACTIVITIES))})"
+
+    for table, columns in INDUSTRY_TABLES:
+        if table not in full_tables:
+            print(f"── {table} not in {SDE_PATH}, skipped ──")
+            continue
+        started = time.perf_counter()
+        full_cursor = full_conn.execute(
+            f"SELECT {columns} FROM {table} WHERE {activity_filter} ORDER BY rowid", INDUSTRY_ACTIVITIES
+        )
+        total = 0
+        for rows in chunks(full_cursor):
+            kept = [tuple(r) for r in rows if r['typeID'] in published]
+            mini_cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES (?, ?, ?, ?)", kept)
+            total += len(kept)
+        report(table, total, started)
+
+    # Indexes after the load, so inserts don't maintain them row by row
+    mini_cursor.execute("CREATE INDEX ix_iam_type     ON industryActivityMaterials (typeID, activityID)")
+    mini_cursor.execute("CREATE INDEX ix_iap_product  ON industryActivityProducts (productTypeID, activityID)")
+    mini_cursor.execute("CREATE INDEX ix_iapr_product ON industryActivityProbabilities (productTypeID, activityID)")
+
+
+def build_search_index(mini_cursor):
+    # Trigram FTS5 over types.typeName for /api/types/search; external content, so names aren't stored twice
+    started = time.perf_counter()
+    mini_cursor.execute('''
+    CREATE VIRTUAL TABLE typeSearch USING fts5(
+        typeName,
+        content='types',
+        content_rowid='typeID',
+        tokenize='trigram'
+    )
+    ''')
+    mini_cursor.execute("INSERT INTO typeSearch(typeSearch) VALUES ('rebuild')")
+    mini_cursor.execute("INSERT INTO typeSearch(typeSearch) VALUES ('optimize')")
+    total = mini_cursor.execute("SELECT COUNT(*) FROM types").fetchone()[0]
+    report("typeSearch trigram index", total, started)
+
+
+def print_summary(mini_cursor):
+    mini_cursor.execute('''
+    SELECT manufacturingCategory, COUNT(*) as cnt
+    FROM materialClassifications
+    GROUP BY manufacturingCategory
+    ORDER BY cnt DESC
+    ''')
+
+    print("\n── materialClassifications breakdown ──")
+    for r in mini_cursor.fetchall():
+        print(f"  {r[0]:<25} {r[1]}")
+
+    mini_cursor.execute("SELECT COUNT(*) FROM types")
+    print(f"\n── types table: {mini_cursor.fetchone()[0]} total items ──")
 
-    # Group override takes priority
-    manu_cat = MANUFACTURING_GROUP_MAP.get(groupName)
 
-    # Fall back to category map
-    if not manu_cat:
-        manu_cat = MANUFACTURING_CATEGORY_MAP.get(categoryName)
-
-    # Skip anything we don't care about
-    if not manu_cat:
-        continue
-
-    classified.append((
-        typeID, typeName,
-        groupID, groupName,
-        categoryID, categoryName,
-        manu_cat
-    ))
-
-mini_cursor.executemany('''
-INSERT OR IGNORE INTO materialClassifications
-(typeID, typeName, groupID, groupName, categoryID, categoryName, manufacturingCategory)
-VALUES (?, ?, ?, ?, ?, ?, ?)
-''', classified)
-
-mini_conn.commit()
-
-# ── Summary ────────────────────────────────────────────────────────────────────
-
-mini_cursor.execute('''
-SELECT manufacturingCategory, COUNT(*) as cnt
-FROM materialClassifications
-GROUP BY manufacturingCategory
-ORDER BY cnt DESC
-''')
-
-print("\n── materialClassifications breakdown ──")
-for r in mini_cursor.fetchall():
-    print(f"  {r[0]:<25} {r[1]}")
-
-mini_cursor.execute("SELECT COUNT(*) FROM types")
-print(f"\n── types table: {mini_cursor.fetchone()[0]} total items ──")
-
-mini_cursor.execute('''
-    CREATE VIEW IF NOT EXISTS invTypes AS SELECT * FROM types
-''')
-mini_conn.commit()
-
-full_conn.close()
-mini_conn.close()
+# ── Build mini SDE ─────────────────────────────────────────────────────────────
 
-print("\nDone! mini_sde.sqlite written.")
\ No newline at end of file
+def build(checksum):
+    # Everything goes into a scratch file next to the target, swapped in only once complete
+    tmp_path = MINI_SDE_PATH + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    started = time.perf_counter()
+    full_conn = sqlite3.connect(f"file:{SDE_PATH}?mode=ro", uri=True)
+    full_conn.row_factory = sqlite3.Row
+    mini_conn = sqlite3.connect(tmp_path, isolation_level=None)  # Transactions managed below
+    try:
+        mini_cursor = mini_conn.cursor()
+        for pragma in BULK_LOAD_PRAGMAS:
+            mini_cursor.execute(pragma)
+
+        mini_cursor.execute("BEGIN")
+        create_tables(mini_cursor)
+        published = copy_types(full_conn, mini_cursor)
+        copy_industry(full_conn, mini_cursor, published)
+        build_search_index(mini_cursor)
+        mini_cursor.executemany("INSERT INTO buildInfo (key, value) VALUES (?, ?)", [
+            ('source_checksum', checksum),
+            ('built_at', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+        ])
+        mini_cursor.execute("COMMIT")
+
+        print_summary(mini_cursor)
+    except BaseException:
+        mini_conn.close()
+        full_conn.close()
+        os.remove(tmp_path)
+        raise
+    mini_conn.close()
+    full_conn.close()
+
+    os.replace(tmp_path, MINI_SDE_PATH)
+    print(f"\nDone! mini_sde.sqlite written in {time.perf_counter() - started:.2f}s.")
+
+
+def main(argv):
+    force = '--force' in argv
+    checksum = source_checksum()
+    if not force and built_checksum() == checksum:
+        print(f"── {os.path.basename(SDE_PATH)} unchanged since the last build, nothing to do (--force to rebuild) ──")
+        return
+    build(checksum)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,41 @@
+"""Add catalog indexes
+
+Revision ID: 9c3e5b71d8a4
+Revises: e5a1c7f04d2b
+Create Date: 2026-10-18 13:40:12.806154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e5b71d8a4'
+down_revision: Union[str, None] = 'e5a1c7f04d2b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, column), named the way db.create_all() names them
+INDEXES = [
+    ('ix_blueprint_type_id', 'blueprint', 'type_id'),
+    ('ix_blueprint_station_id', 'blueprint', 'station_id'),
+    ('ix_blueprint_tier', 'blueprint', 'tier'),
+    ('ix_material_type_id', 'material', 'type_id'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    for name, table, column in INDEXES:
+        # db.create_all() may already have created it on app startup
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, [column])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,42 @@
+"""Add price cache table
+
+Revision ID: b7d41e9a20c5
+Revises: 6f9e12b6c3ac
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41e9a20c5'
+down_revision: Union[str, None] = '6f9e12b6c3ac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # db.create_all() may already have created it on app startup
+    if 'price_cache' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'price_cache',
+        sa.Column('type_id', sa.Integer(), nullable=False),
+        sa.Column('location_id', sa.BigInteger(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=True),
+        sa.Column('source', sa.String(length=20), nullable=False),
+        sa.Column('etag', sa.String(length=100), nullable=True),
+        sa.Column('expires_at', sa.Float(), nullable=True),
+        sa.Column('fetched_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('type_id', 'location_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('price_cache')
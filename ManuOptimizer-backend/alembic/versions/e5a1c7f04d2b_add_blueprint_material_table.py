@@ -0,0 +1,142 @@
+"""Add blueprint_material table
+
+Revision ID: e5a1c7f04d2b
+Revises: b7d41e9a20c5
+Create Date: 2026-10-18 10:02:47.518330
+
+"""
+import json
+import os
+import sqlite3
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1c7f04d2b'
+down_revision: Union[str, None] = 'b7d41e9a20c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SDE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'sde', 'mini_sde.sqlite')
+
+blueprint_material = sa.table(
+    'blueprint_material',
+    sa.column('blueprint_id', sa.Integer),
+    sa.column('material_type_id', sa.Integer),
+    sa.column('material_name', sa.String),
+    sa.column('category', sa.String),
+    sa.column('qty_per_run', sa.Float),
+)
+
+
+def _normalized(raw):
+    # Same shapes routes.utils.normalize_materials_structure accepts, copied so the migration stands alone
+    materials = json.loads(raw) if isinstance(raw, str) else raw
+    if isinstance(materials, dict):
+        normalized = {}
+        for key, value in materials.items():
+            if isinstance(value, dict):
+                normalized.setdefault(key, {}).update(value)
+            else:  # Flat form {material: qty}
+                normalized.setdefault("Uncategorized", {})[key] = value
+        return normalized
+    normalized = {}
+    for entry in materials or []:
+        if isinstance(entry, dict) and entry.get("name"):
+            normalized.setdefault(entry.get("category", "Other"), {})[entry["name"]] = entry.get("quantity", 0)
+    return normalized
+
+
+def _name_to_type_id(bind):
+    # Material rows first, then the SDE, like update_prices resolves names
+    lookup = {}
+    if os.path.exists(SDE_PATH):
+        sde = sqlite3.connect(f"file:{os.path.abspath(SDE_PATH)}?mode=ro", uri=True)
+        try:
+            for name, type_id in sde.execute("SELECT typeName, typeID FROM types ORDER BY typeID"):
+                lookup[unicodedata.normalize("NFKC", name.strip())] = type_id
+        finally:
+            sde.close()
+    for name, type_id in bind.execute(sa.text("SELECT name, type_id FROM material WHERE type_id IS NOT NULL")):
+        lookup[unicodedata.normalize("NFKC", name.strip())] = type_id
+    return lookup
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # db.create_all() may already have created it on app startup
+    if 'blueprint_material' not in inspector.get_table_names():
+        op.create_table(
+            'blueprint_material',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('blueprint_id', sa.Integer(), nullable=False),
+            sa.Column('material_type_id', sa.Integer(), nullable=True),
+            sa.Column('material_name', sa.String(length=100), nullable=False),
+            sa.Column('category', sa.String(length=50), nullable=False),
+            sa.Column('qty_per_run', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ['blueprint_id'], ['blueprint.id'], name='fk_blueprint_material_blueprint_id', ondelete='CASCADE'
+            ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_blueprint_material_blueprint_id', 'blueprint_material', ['blueprint_id'])
+        op.create_index('ix_blueprint_material_material_type_id', 'blueprint_material', ['material_type_id'])
+
+    if 'materials' not in {c['name'] for c in inspector.get_columns('blueprint')}:
+        return
+
+    # Backfill in each blueprint's own material order, then drop the JSON column
+    already_backfilled = {
+        row[0] for row in bind.execute(sa.text("SELECT DISTINCT blueprint_id FROM blueprint_material"))
+    }
+    type_ids = _name_to_type_id(bind)
+    rows = []
+    for blueprint_id, raw in bind.execute(sa.text("SELECT id, materials FROM blueprint ORDER BY id")):
+        if blueprint_id in already_backfilled:
+            continue
+        for category, section in _normalized(raw).items():
+            for name, qty in section.items():
+                rows.append({
+                    'blueprint_id': blueprint_id,
+                    'material_type_id': type_ids.get(unicodedata.normalize("NFKC", name.strip())),
+                    'material_name': name,
+                    'category': category,
+                    'qty_per_run': qty,
+                })
+    if rows:
+        op.bulk_insert(blueprint_material, rows)
+
+    with op.batch_alter_table('blueprint', schema=None) as batch_op:
+        batch_op.drop_column('materials')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    with op.batch_alter_table('blueprint', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('materials', sa.JSON(), nullable=True))
+
+    materials = {}
+    for blueprint_id, name, category, qty in bind.execute(sa.text(
+        "SELECT blueprint_id, material_name, category, qty_per_run FROM blueprint_material ORDER BY blueprint_id, id"
+    )):
+        materials.setdefault(blueprint_id, {}).setdefault(category, {})[name] = int(qty) if qty.is_integer() else qty
+    for blueprint_id, in bind.execute(sa.text("SELECT id FROM blueprint")):
+        bind.execute(
+            sa.text("UPDATE blueprint SET materials = :materials WHERE id = :id"),
+            {'materials': json.dumps(materials.get(blueprint_id, {})), 'id': blueprint_id}
+        )
+
+    with op.batch_alter_table('blueprint', schema=None) as batch_op:
+        batch_op.alter_column('materials', existing_type=sa.JSON(), nullable=False)
+
+    op.drop_index('ix_blueprint_material_material_type_id', table_name='blueprint_material')
+    op.drop_index('ix_blueprint_material_blueprint_id', table_name='blueprint_material')
+    op.drop_table('blueprint_material')
@@ -1,7 +1,9 @@
 from datetime import timedelta
 import os
 import secrets
+import sqlite3
 import sys
+import threading
 import logging
 import traceback
 from flask import Flask, jsonify, render_template, request, session
@@ -11,6 +13,12 @@ from flask_migrate import Migrate
 from routes.materials import materials_bp
 from routes.blueprints import blueprints_bp
 from routes.stations import stations_bp
+from routes.types import types_bp
+from routes.market import forge_snapshot
+from routes.price_cache import price_store
+from routes.price_refresher import price_refresher
+from routes.sde import sde_index
+from routes import db_profile
 from auth import auth_bp, get_oauth_config
 from dotenv import load_dotenv
 
@@ -42,7 +50,7 @@ def get_env_path():
 
 load_dotenv(dotenv_path=get_env_path())
 
-def create_app():
+def create_app(test_config=None):
     load_dotenv(dotenv_path=get_env_path())
     if getattr(sys, 'frozen', False):
         # Compiled binary
@@ -74,6 +82,17 @@ def create_app():
     flask_app.permanent_session_lifetime = timedelta( minutes=20)
     flask_app.secret_key = os.getenv("FLASK_SECRET_KEY")
     flask_app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    flask_app.config['OPTIMIZER_SOLVER'] = os.getenv("OPTIMIZER_SOLVER", "cbc")
+    flask_app.config['PRICE_REFRESH'] = os.getenv("PRICE_REFRESH", "1") != "0"
+    flask_app.config['DB_POOL_SIZE'] = db_profile.DB_POOL_SIZE
+    flask_app.config['DB_MAX_OVERFLOW'] = db_profile.DB_MAX_OVERFLOW
+    # Tests and scripts can point at another database or resize the pool
+    flask_app.config.update(test_config or {})
+    flask_app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', db_profile.engine_options(
+        flask_app.config['SQLALCHEMY_DATABASE_URI'],
+        pool_size=flask_app.config['DB_POOL_SIZE'],
+        max_overflow=flask_app.config['DB_MAX_OVERFLOW'],
+    ))
     session_version_key = secrets.token_hex(16)
     
     config = get_oauth_config()
@@ -85,6 +104,7 @@ def create_app():
     flask_app.register_blueprint(blueprints_bp)
     flask_app.register_blueprint(auth_bp)
     flask_app.register_blueprint(stations_bp)
+    flask_app.register_blueprint(types_bp)
 
     # 👇 This will serve index.html for all unknown routes (like a SPA)
     @flask_app.route("/")
@@ -115,7 +135,31 @@ def create_app():
             
             
     with flask_app.app_context():
+        # Before anything connects, so every pooled connection gets the pragmas
+        db_profile.install(db.engine)
         db.create_all()
         logger.info("Database tables created (if they didn't exist)")
-            
+
+        # Warm the price caches from the last run so the first price update can skip ESI
+        price_store.load()
+        forge_snapshot.restore()
+
+    # Name lookups are served from memory from here on
+    try:
+        sde_index.load()
+        # Type search indexes take a moment to build; don't hold up startup for them
+        threading.Thread(target=sde_index.prepare_search, name="sde-search-warmup", daemon=True).start()
+    except (FileNotFoundError, sqlite3.Error):
+        logger.error("Could not load the SDE, item lookups will fail until it is available", exc_info=True)
+
     return flask_app
+
+
+def start_background_tasks(flask_app):
+    """
+    Start the background price refresher, which keeps prices fresh so /update_prices
+    only has to commit them. Server entry points call this; create_app() doesn't,
+    so tests, migrations and scripts never hit ESI from a background thread.
+    """
+    if flask_app.config['PRICE_REFRESH'] and not flask_app.config.get('TESTING'):
+        price_refresher.start(flask_app)
@@ -6,6 +6,7 @@ import requests
 from flask import Blueprint, redirect, request, session, url_for
 from dotenv import load_dotenv
 import os
+from routes.esi_client import get_esi_session
 def get_env_path():
     if getattr(sys, 'frozen', False):
         env_path = os.path.join(os.path.dirname(sys.executable), '.env')
@@ -74,7 +75,8 @@ def callback():
     client_secret = config["client_secret"]
     code = request.args.get("code")
 
-    response = requests.post(
+    esi = get_esi_session()
+    response = esi.post(
         TOKEN_URL,
         auth=(client_id, client_secret),
         data={"grant_type": "authorization_code", "code": code},
@@ -89,7 +91,7 @@ def callback():
     session["token"] = access_token
     session["refresh_token"] = refresh_token
 
-    verify = requests.get(
+    verify = esi.get(
         VERIFY_URL, headers={"Authorization": f"Bearer {access_token}"}
     ).json()
 
@@ -101,7 +103,7 @@ def callback():
 
     # Get character info using character_id
     headers = {'Authorization': f'Bearer {access_token}'}
-    character_info = requests.get(f"https://esi.evetech.net/latest/characters/{character_id}/", headers=headers).json()
+    character_info = esi.get(f"https://esi.evetech.net/latest/characters/{character_id}/", headers=headers).json()
 
     # Extract character name from character_info
     character_name = character_info.get("name") or verify.get("CharacterName") or "Unknown"
@@ -125,7 +127,7 @@ def auth_status():
         return {"logged_in": False, "character_name": None}
 
     # Proactively verify the token
-    verify = requests.get("https://esi.evetech.net/verify", headers={"Authorization": f"Bearer {token}"})
+    verify = get_esi_session().get(VERIFY_URL, headers={"Authorization": f"Bearer {token}"})
 
     if verify.status_code != 200:
         # Clear session on invalid token
@@ -1,30 +1,51 @@
 from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
+
+def nest_materials(rows):
+    """{category: {material name: qty per run}} from (category, name, qty) rows in BOM order."""
+    materials = {}
+    for category, name, qty in rows:
+        if isinstance(qty, float) and qty.is_integer():
+            qty = int(qty)  # Whole quantities read back as the ints they were written as
+        materials.setdefault(category, {})[name] = qty
+    return materials
+
+
 class Blueprint(db.Model):
     __tablename__ = 'blueprint'
 
     id = db.Column(db.Integer, primary_key=True)
-    type_id = db.Column(db.Integer, nullable=True)
+    type_id = db.Column(db.Integer, nullable=True, index=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     amt_per_run = db.Column(db.Integer, nullable=False, server_default="1")
-    materials = db.Column(db.JSON, nullable=False)
+    # Bill of materials, one row per (category, material); loaded for all blueprints in one IN query
+    material_rows = db.relationship(
+        'BlueprintMaterial', lazy='selectin', order_by='BlueprintMaterial.id',
+        cascade='all, delete-orphan'
+    )
+
+    @property
+    def materials(self):
+        """{category: {material name: qty per run}}, built from material_rows. Write material_rows to change it."""
+        return nest_materials((row.category, row.material_name, row.qty_per_run) for row in self.material_rows)
+
     def get_normalized_materials(self):
-        from routes.utils import normalize_materials_structure
-        return normalize_materials_structure(self.materials)
+        return self.materials
     sell_price = db.Column(db.Float, nullable=False)
     max = db.Column(db.Integer, nullable=True)
     material_cost = db.Column(db.Float, nullable=False)
-    tier = db.Column(db.String(10), nullable=False, default="T1")  # "T1" or "T2"
+    tier = db.Column(db.String(10), nullable=False, default="T1", index=True)  # "T1" or "T2"
     station_id = db.Column(
         db.Integer,
         db.ForeignKey('station.station_id', name='fk_blueprint_station_id'),
-        nullable=True
+        nullable=True, index=True
     )
     region_id = db.Column(db.Integer, nullable=False, default=10000002)  # Default to Jita
     use_jita_sell = db.Column(db.Boolean, default=True, nullable=False)
     used_jita_fallback = db.Column(db.Boolean, default=False)
-    station = db.relationship('Station', backref='blueprints', lazy='joined')
+    # Only the blueprint list shows it; routes.catalog_queries joins it in there
+    station = db.relationship('Station', backref='blueprints', lazy='select')
     @property
     def per_unit_material_cost(self):
         return self.material_cost / self.amt_per_run if self.amt_per_run else self.material_cost
@@ -52,12 +73,26 @@ class ReactionFormula(Blueprint):
         "polymorphic_identity": "Reaction",
     }
 
+class BlueprintMaterial(db.Model):
+    __tablename__ = 'blueprint_material'
+
+    id = db.Column(db.Integer, primary_key=True)
+    blueprint_id = db.Column(
+        db.Integer,
+        db.ForeignKey('blueprint.id', name='fk_blueprint_material_blueprint_id', ondelete='CASCADE'),
+        nullable=False, index=True
+    )
+    material_type_id = db.Column(db.Integer, nullable=True, index=True)  # None when the SDE doesn't know the name
+    material_name = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    qty_per_run = db.Column(db.Float, nullable=False)
+
 class Material(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     sell_price = db.Column(db.Float, nullable=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
-    type_id = db.Column(db.Integer, nullable=True)  # Make sure this is here
+    type_id = db.Column(db.Integer, nullable=True, index=True)  # Make sure this is here
     category = db.Column(db.String, nullable=True) 
 
 class Region(db.Model):
@@ -70,4 +105,15 @@ class Station(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    station_id = db.Column(db.Integer, unique=True, nullable=False)
\ No newline at end of file
+    station_id = db.Column(db.Integer, unique=True, nullable=False)
+
+class PriceCache(db.Model):
+    __tablename__ = 'price_cache'
+
+    type_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    location_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)  # Station, structure or region
+    price = db.Column(db.Float, nullable=True)
+    source = db.Column(db.String(20), nullable=False)
+    etag = db.Column(db.String(100), nullable=True)
+    expires_at = db.Column(db.Float, nullable=True)   # ESI Expires header, epoch seconds
+    fetched_at = db.Column(db.Float, nullable=False)  # epoch seconds
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import aiohttp
+
+from .esi_client import ESI_MAX_CONCURRENCY, esi_error_limit
+from .order_book import OrderBookIndex
+from .market import ESI_BASE_URL
+from .price_cache import parse_expires, price_store
+from .utils import CACHE_TTL, JITA_REGION_ID, JITA_STATION_ID, PRICE_CACHE_TTL, structure_order_cache
+
+
+logger = logging.getLogger(__name__)
+
+ESI_ASYNC_RETRIES = int(os.getenv("ESI_ASYNC_RETRIES", 3))
+RETRY_STATUSES = {500, 502, 503, 504}
+
+
+class EsiRequestError(Exception):
+    def __init__(self, status, url):
+        super().__init__(f"ESI returned {status} for {url}")
+        self.status = status
+
+
+class AsyncPriceFetcher:
+    """
+    Concurrent ESI price lookups on an aiohttp session running in its own
+    event loop thread.
+
+    At most `concurrency` requests are in flight. Lookups are single-flight per
+    key: while a type's price (or a structure's order book) is being fetched,
+    every other caller asking for it awaits the same task instead of sending
+    another request. Retries follow ESI's rules: 420 waits for the error window
+    to reset, 429 honours Retry-After, 5xx backs off exponentially, and the
+    whole fetcher pauses when X-ESI-Error-Limit-Remain reaches the floor. The
+    error limit is tracked together with the requests session's, since ESI
+    counts one budget for both.
+
+    fetch_prices() is the synchronous facade the Flask routes call.
+    """
+
+    def __init__(self, concurrency=ESI_MAX_CONCURRENCY, base_url=ESI_BASE_URL, retries=ESI_ASYNC_RETRIES,
+                 error_limit=esi_error_limit, backoff=1.0):
+        self.concurrency = concurrency
+        self.base_url = base_url
+        self.retries = retries
+        self.error_limit = error_limit
+        self.backoff = backoff
+        self.requests_sent = 0
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._session = None
+        self._semaphore = None
+        self._inflight = {}
+
+    # === Loop plumbing ===
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="esi-async", daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the fetcher's loop and block for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._session is not None:
+            self.run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = self._session = self._semaphore = None
+        self._inflight = {}
+
+    async def _get_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def _single_flight(self, key, factory):
+        """Await the in-flight task for `key`, starting it with factory() if there is none."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    # === HTTP ===
+
+    async def _get(self, url, headers, params=None):
+        """GET with ESI retry rules. Returns (status, headers, json body or None)."""
+        session = await self._get_session()
+
+        for attempt in range(self.retries + 1):
+            wait = self.error_limit.wait_time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            async with self._semaphore:
+                self.requests_sent += 1
+                async with session.get(url, headers=headers, params=params) as res:
+                    self.error_limit.update(res.headers)
+                    status = res.status
+                    if status == 200:
+                        return status, res.headers, await res.json(content_type=None)
+                    if status == 304:
+                        return status, res.headers, None
+                    retry_after = res.headers.get("Retry-After")
+                    reset = res.headers.get("X-ESI-Error-Limit-Reset")
+
+            if attempt == self.retries:
+                break
+            if status == 420:
+                self.error_limit.pause(float(reset or 60))
+                continue
+            if status == 429:
+                delay = float(retry_after or self.backoff * 2 ** attempt)
+            elif status in RETRY_STATUSES:
+                delay = self.backoff * 2 ** attempt
+            else:
+                break
+            logger.warning(f"ESI {status} for {url}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        raise EsiRequestError(status, url)
+
+    async def fetch_all_pages(self, url, headers, params=None):
+        """
+        Every page of a paged endpoint, in order: page 1 for X-Pages, then the
+        rest concurrently. A page that fails after retries raises EsiRequestError.
+        """
+        params = dict(params or {})
+        _, res_headers, first = await self._get(url, headers, params={**params, "page": 1})
+        total_pages = int(res_headers.get("X-Pages", 1))
+        rest = await asyncio.gather(*(
+            self._get(url, headers, params={**params, "page": page}) for page in range(2, total_pages + 1)
+        ))
+        return [first] + [body for _, _, body in rest]
+
+    # === Prices ===
+
+    async def jita_price(self, type_id, headers):
+        """Async get_lowest_jita_sell_price: (price, source)."""
+        if price_store.get_fresh(type_id, JITA_STATION_ID, PRICE_CACHE_TTL):
+            return price_store.get(type_id, JITA_STATION_ID)["price"], "cached"
+        return await self._single_flight(("jita", type_id), lambda: self._fetch_jita_price(type_id, headers))
+
+    async def _fetch_jita_price(self, type_id, headers):
+        cached = price_store.get(type_id, JITA_STATION_ID)
+        local_headers = dict(headers)
+        if cached and cached.get("etag"):
+            local_headers["If-None-Match"] = cached["etag"]
+
+        url = f"{self.base_url}/markets/{JITA_REGION_ID}/orders/"
+        try:
+            status, res_headers, orders = await self._get(
+                url, local_headers, params={"order_type": "sell", "type_id": type_id}
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, EsiRequestError) as e:
+            logger.error(f"Price fetch for type_id {type_id} failed: {e}")
+            return None, "error"
+
+        expires_at = parse_expires(res_headers.get("Expires"), PRICE_CACHE_TTL)
+        if status == 304 and cached:
+            price_store.touch(type_id, JITA_STATION_ID, expires_at)
+            return cached["price"], "cached"
+
+        jita_orders = [o for o in orders or [] if o.get("location_id") == JITA_STATION_ID] or orders or []
+        if not jita_orders:
+            return None, "not_found"
+
+        lowest = min(order["price"] for order in jita_orders)
+        price_store.put(type_id, JITA_STATION_ID, lowest, "jita", etag=res_headers.get("ETag"), expires_at=expires_at)
+        return lowest, "jita"
+
+    async def _revalidate_jita_prices(self, type_ids, headers):
+        return await asyncio.gather(*(
+            self._single_flight(("jita", tid), lambda tid=tid: self._fetch_jita_price(tid, headers))
+            for tid in type_ids
+        ))
+
+    def revalidate_jita_prices(self, type_ids, headers, timeout=None):
+        """
+        Refetch Jita prices even if the cached ones are still fresh, sending the
+        cached ETag so unchanged prices come back as a cheap 304. Returns
+        {type_id: (price, source)}.
+        """
+        type_ids = list(type_ids)
+        return dict(zip(type_ids, self.run(self._revalidate_jita_prices(type_ids, headers), timeout=timeout)))
+
+    async def station_orders(self, station_id, headers):
+        """A structure's indexed order book, cached like get_station_sell_price does."""
+        cached = structure_order_cache.get(station_id)
+        if cached and time.time() - cached[0] < CACHE_TTL:
+            return cached[1]
+        return await self._single_flight(("structure", station_id), lambda: self._fetch_station_orders(station_id, headers))
+
+    async def _fetch_station_orders(self, station_id, headers):
+        now = time.time()
+        url = f"{self.base_url}/markets/structures/{station_id}/"
+        pages = await self.fetch_all_pages(url, headers)
+        all_orders = [order for page_orders in pages for order in page_orders]
+
+        book = OrderBookIndex(all_orders, fetched_at=now)
+        structure_order_cache[station_id] = (now, book)
+        price_store.put_many(station_id, book.lowest, "structure", fetched_at=now)
+        return book
+
+    async def station_price(self, type_id, station_id, headers):
+        """Async get_station_sell_price: (price, source)."""
+        try:
+            book = await self.station_orders(station_id, headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError, EsiRequestError) as e:
+            logger.error(f"Failed to fetch structure orders from {station_id}: {e}")
+            return None, "error"
+
+        lowest = book.lowest_price(type_id)
+        if lowest is None:
+            return None, "not_found"
+        return lowest, "structure"
+
+    async def fetch_price(self, type_id, station_id, headers):
+        """Async fetch_price: (type_id, (price, source), fell_back_to_jita)."""
+        if station_id:
+            price_data = await self.station_price(type_id, station_id, headers)
+            if price_data[0] is not None:
+                return type_id, price_data, False
+            return type_id, await self.jita_price(type_id, headers), True
+        return type_id, await self.jita_price(type_id, headers), False
+
+    async def fetch_prices_async(self, jobs, headers):
+        unique_jobs = list(dict.fromkeys(jobs))
+        return await asyncio.gather(*(self.fetch_price(tid, sid, headers) for tid, sid in unique_jobs))
+
+    def fetch_prices(self, jobs, headers, timeout=None):
+        """
+        Price every (type_id, station_id or None) job concurrently and return
+        fetch_price-style tuples, one per distinct job. Blocks the caller.
+        """
+        started = time.time()
+        sent_before = self.requests_sent
+        results = self.run(self.fetch_prices_async(jobs, headers), timeout=timeout)
+        logger.info(
+            f"Fetched {len(results)} prices with {self.requests_sent - sent_before} ESI requests "
+            f"in {time.time() - started:.2f}s"
+        )
+        return results
+
+
+price_fetcher = AsyncPriceFetcher()
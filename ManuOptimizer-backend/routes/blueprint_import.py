@@ -0,0 +1,105 @@
+import logging
+
+from models import BlueprintT2, Blueprint, ReactionFormula, db
+from .sde import ACTIVITY_REACTION, sde_index
+from .utils import JITA_STATION_ID, build_material_rows
+
+
+logger = logging.getLogger(__name__)
+
+INVENTION_SECTION = "Invention Materials"
+
+MODELS = {"T1": Blueprint, "T2": BlueprintT2, "Reaction": ReactionFormula}
+
+
+def _sectioned(materials, section=None):
+    """[(typeID, qty)] -> {category: {name: qty}} using the SDE classifications."""
+    out = {}
+    for type_id, quantity in materials:
+        name = sde_index.type_name(type_id)
+        if name is None:
+            logger.warning(f"SDE material typeID {type_id} has no name, skipping it")
+            continue
+        category = section or sde_index.by_name[name][1]
+        if category == INVENTION_SECTION and section is None:
+            # Cost code treats this section as invention-only; a build input must not land in it
+            category = "Other"
+        out.setdefault(category, {})
+        out[category][name] = out[category].get(name, 0) + quantity
+    return out
+
+
+def blueprint_specs(product_type_ids):
+    """
+    Column values for the blueprint row of every product, from the SDE
+    industry tables. Returns (specs, not_found), not_found listing type IDs
+    no blueprint or reaction formula produces.
+    """
+    recipes = sde_index.industry_recipes(product_type_ids)
+
+    specs = []
+    not_found = []
+    for type_id in dict.fromkeys(product_type_ids):
+        recipe = recipes.get(type_id)
+        name = sde_index.type_name(type_id)
+        if recipe is None or name is None:
+            not_found.append(type_id)
+            continue
+
+        materials = _sectioned(recipe["materials"])
+        spec = {
+            "name": name,
+            "type_id": type_id,
+            "tier": "Reaction" if recipe["activity_id"] == ACTIVITY_REACTION else "T1",
+            "amt_per_run": recipe["quantity"],
+            "materials": materials,
+        }
+        invention = recipe["invention"]
+        if invention is not None and invention["probability"]:
+            materials.update(_sectioned(invention["materials"], INVENTION_SECTION))
+            spec.update(tier="T2", invention_chance=invention["probability"], runs_per_copy=invention["runs"])
+        specs.append(spec)
+    return specs, not_found
+
+
+def upsert_blueprints(specs, station_id=None):
+    """
+    Create or update one row per spec in a single transaction, matched by
+    name. A row whose tier changed is replaced, since the polymorphic class
+    can't change in place. Prices and costs are left for /update_prices.
+    Returns counts of created, updated and replaced rows.
+    """
+    existing = {
+        bp.name: bp
+        for bp in Blueprint.query.filter(Blueprint.name.in_([s["name"] for s in specs])).all()
+    } if specs else {}
+
+    counts = {"created": 0, "updated": 0, "replaced": 0}
+    try:
+        for spec in specs:
+            row = existing.get(spec["name"])
+            if row is not None and row.tier != spec["tier"]:
+                db.session.delete(row)
+                db.session.flush()
+                row = None
+                counts["replaced"] += 1
+            elif row is not None:
+                counts["updated"] += 1
+            else:
+                counts["created"] += 1
+
+            if row is None:
+                row = MODELS[spec["tier"]](sell_price=0, material_cost=0)
+                db.session.add(row)
+            for column, value in spec.items():
+                if column != "materials":
+                    setattr(row, column, value)
+            row.material_rows = build_material_rows(spec["materials"])
+            if station_id is not None:
+                row.station_id = station_id
+                row.use_jita_sell = station_id == JITA_STATION_ID
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return counts
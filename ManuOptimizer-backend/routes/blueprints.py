@@ -4,7 +4,9 @@ import os
 import subprocess
 import sys
 import concurrent
-from flask import jsonify, render_template, request, session
+import json
+import time
+from flask import Response, current_app, jsonify, render_template, request, session
 import logging
 import traceback
 import re
@@ -14,7 +16,23 @@ from urllib3.util.retry import Retry
 
 
 import pulp
-from .utils import accumulate_materials, compute_expanded_materials, expand_materials, expand_materials_clean, expand_sub_blueprints_one_level, fetch_price, get_lowest_jita_sell_price, get_lowest_jita_sell_prices_loop, get_material_category_lookup, get_item_info, get_material_quantity, normalize_materials_structure, normalize_name, parse_blueprint_text, parse_ingame_invention_text, refresh_access_token, safe_subtract, sanitize_name, validate_inventory
+from .utils import accumulate_materials, build_material_rows, compute_expanded_materials, expand_materials, expand_materials_clean, expand_sub_blueprints_one_level, fetch_price, get_lowest_jita_sell_price, get_lowest_jita_sell_prices_loop, get_material_category_lookup, get_item_info, get_material_quantity, normalize_materials_structure, normalize_name, parse_blueprint_text, parse_ingame_invention_text, refresh_access_token, safe_subtract, sanitize_name, validate_inventory
+from .market import fetch_snapshot_price, forge_snapshot, lookup_jita_price, lookup_jita_prices
+from .async_fetch import price_fetcher
+from .blueprint_import import blueprint_specs, upsert_blueprints
+from .catalog_queries import catalog_blueprints, listing_blueprints
+from .catalog_state import catalog_changed
+from .cost_engine import CostMatrix
+from .esi_client import get_esi_session
+from .jobs import JobQueueFull, job_summary, optimization_jobs
+from .listing_cache import conditional_listing
+from .optimization import run_optimization
+from .result_cache import optimization_cache
+from .sde import sde_index
+from .price_cache import price_store
+from .price_ledger import blueprints_by_type_id, price_ledger
+from .price_refresher import price_refresher
+from .solvers import get_solver_name
 from models import BlueprintT2, Blueprint as BlueprintModel, Station, db, Material
 from flask import Blueprint
 from pulp import LpProblem, LpVariable, lpSum, value, LpMaximize, LpStatus, PULP_CBC_CMD, LpAffineExpression
@@ -75,7 +93,7 @@ def add_blueprint():
 
         # === Sell price ===
         if sell_price == 0 or sell_price is None:
-            sell_price = get_lowest_jita_sell_price(typeID, headers=headers)[0]
+            sell_price = lookup_jita_price(typeID, headers=headers)[0]
 
         # === Material cost calculation ===
         if not material_cost:
@@ -90,7 +108,7 @@ def add_blueprint():
                 for name, info in material_info.items()
             }
             type_ids = list(set(type_id_map.values()))
-            price_map = get_lowest_jita_sell_prices_loop(type_ids, headers=headers)
+            price_map = lookup_jita_prices(type_ids, headers=headers)
 
             material_cost = 0
             for category, materials in normalized_materials.items():
@@ -129,7 +147,7 @@ def add_blueprint():
         existing = model.query.filter_by(name=name).first()
         if existing:
             existing.type_id = typeID
-            existing.materials = normalized_materials
+            existing.material_rows = build_material_rows(normalized_materials)
             existing.sell_price = sell_price
             existing.material_cost = material_cost
             existing.tier = blueprint_tier
@@ -140,6 +158,8 @@ def add_blueprint():
                 existing.amt_per_run = amt_per_run
                 existing.runs_per_copy = runs_per_copy
             db.session.commit()
+            price_store.flush()
+            catalog_changed("blueprints", [existing.id])
             return jsonify({
                 "message": "Blueprint updated successfully",
                 "is_reaction": is_reaction,
@@ -150,7 +170,7 @@ def add_blueprint():
         new_blueprint = model(
             name=name,
             type_id=typeID,
-            materials=normalized_materials,
+            material_rows=build_material_rows(normalized_materials),
             sell_price=sell_price,
             material_cost=material_cost,
             tier=blueprint_tier
@@ -164,6 +184,8 @@ def add_blueprint():
 
         db.session.add(new_blueprint)
         db.session.commit()
+        price_store.flush()
+        catalog_changed("blueprints")
 
         logger.info(f"Blueprint: {name} (Reaction: {is_reaction}) added successfully")
 
@@ -192,34 +214,30 @@ def add_manual_blueprint():
         sell_price = data['sell_price']
         material_cost = data['material_cost']
 
-        # Initialize the normalized materials dictionary
-        normalized_materials = {}
-
-        # Loop through the materials and normalize them
-        for category, category_materials in materials.items():
-            normalized_materials[category] = {}
-            for material, quantity in category_materials.items():
-                normalized_materials[category][material] = quantity
+        # Nested {category: {material: qty}}; flat pastes land under "Uncategorized"
+        normalized_materials = normalize_materials_structure(materials)
 
         # Check if a blueprint with the same name already exists
         existing_blueprint = BlueprintModel.query.filter_by(name=name).first()
         if existing_blueprint:
-            existing_blueprint.materials = normalized_materials
+            existing_blueprint.material_rows = build_material_rows(normalized_materials)
             existing_blueprint.sell_price = sell_price
             existing_blueprint.material_cost = material_cost
             db.session.commit()
+            catalog_changed("blueprints", [existing_blueprint.id])
             logger.info(f"Blueprint: {name} was updated successfully")
             return jsonify({"message": "Blueprint updated successfully"}), 200
 
         # Create a new blueprint
         new_blueprint = Blueprint(
             name=name,
-            materials=normalized_materials,
+            material_rows=build_material_rows(normalized_materials),
             sell_price=sell_price,
             material_cost=material_cost
         )
         db.session.add(new_blueprint)
         db.session.commit()
+        catalog_changed("blueprints")
         logger.info(f"Blueprint: {name} was added successfully")
         return jsonify({"message": "Blueprint added successfully"}), 201
 
@@ -228,6 +246,45 @@ def add_manual_blueprint():
         logger.error(f"Error adding blueprint! See the traceback for more info:")
         logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
+
+
+@blueprints_bp.route('/blueprints/import', methods=['POST'])
+def import_blueprints():
+    """
+    Bulk-create or update blueprints from product type IDs using the SDE
+    industry tables: {"type_ids": [...], "station_id": optional}. Rows are
+    written in one transaction; run /update_prices afterwards to price them.
+    """
+    try:
+        data = request.json or {}
+        try:
+            type_ids = [int(t) for t in data.get('type_ids') or []]
+            station_id = int(data['station_id']) if data.get('station_id') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({"error": "type_ids must be a list of integers"}), 400
+        if not type_ids:
+            return jsonify({"error": "type_ids is required"}), 400
+
+        if not sde_index.has_industry_data():
+            return jsonify({"error": "The SDE has no industry tables; rebuild it with Utils/sdeExtractionCatalyst.py"}), 503
+
+        specs, not_found = blueprint_specs(type_ids)
+        counts = upsert_blueprints(specs, station_id=station_id)
+        if specs:
+            catalog_changed("blueprints")
+
+        logger.info(f"Imported {len(specs)} blueprints from the SDE ({counts}), {len(not_found)} type IDs not found")
+        return jsonify({
+            **counts,
+            "not_found": not_found,
+            "blueprints": [{"name": s["name"], "type_id": s["type_id"], "tier": s["tier"]} for s in specs],
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error importing blueprints! See the traceback for more info:")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
     
 
 @blueprints_bp.route('/blueprint/<int:id>', methods=['GET'])
@@ -260,15 +317,16 @@ def get_blueprint(id):
         }), 500
 
 @blueprints_bp.route('/blueprints', methods=['GET'])
+@conditional_listing("blueprints")
 def get_blueprints():
     try:
-        blueprints = BlueprintModel.query.all()
+        blueprints, materials_by_id = listing_blueprints()
         logger.info("Blueprints retrieved successfully")
         response = []
         
         for b in blueprints:
             materials = []
-            normalized = normalize_materials_structure(b.materials)
+            normalized = normalize_materials_structure(materials_by_id.get(b.id, {}))
 
             for category, quantities in normalized.items():
                 for name, quantity in quantities.items():
@@ -309,7 +367,8 @@ def update_blueprint(id):
         data = request.json
 
         blueprint.name = data.get('name', blueprint.name)
-        blueprint.materials = data.get('materials', blueprint.materials)
+        if 'materials' in data:
+            blueprint.material_rows = build_material_rows(data['materials'])
         blueprint.sell_price = data.get('sell_price', blueprint.sell_price)
         blueprint.amt_per_run = data.get('amt_per_run', blueprint.amt_per_run)
         blueprint.material_cost = data.get('material_cost', blueprint.material_cost)
@@ -343,6 +402,7 @@ def update_blueprint(id):
             blueprint.invention_cost = None
 
         db.session.commit()
+        catalog_changed("blueprints", [id])
         logger.info("Blueprint updated successfully")
         return jsonify({'message': 'Blueprint updated successfully'}), 200
 
@@ -358,10 +418,10 @@ def update_blueprint(id):
 @blueprints_bp.route('/blueprints/reset_max', methods=['POST'])
 def reset_all_blueprint_max():
     try:
-        blueprints = BlueprintModel.query.all()
-        for blueprint in blueprints:
-            blueprint.max = None  # Set max to None for ALL blueprints
+        # Set max to None for ALL blueprints, in one UPDATE
+        db.session.execute(db.update(BlueprintModel).values(max=None))
         db.session.commit()
+        catalog_changed("blueprints")
         logger.info("All blueprint max values have been reset")
         return jsonify({"message": "All blueprint max values have been reset."}), 200
     except Exception as e:
@@ -377,6 +437,7 @@ def delete_blueprint(id):
         blueprint = BlueprintModel.query.get_or_404(id)
         db.session.delete(blueprint)
         db.session.commit()
+        catalog_changed("blueprints", [id])
         logger.info("Blueprint deleted successfully")
         return jsonify({"message": "Blueprint deleted successfully"}), 200
     except Exception as e:
@@ -387,6 +448,8 @@ def delete_blueprint(id):
                 
 @blueprints_bp.route('/update_prices', methods=['POST'])
 def update_prices():
+    # ?full=1 recomputes every blueprint instead of only those whose prices moved
+    full_refresh = request.args.get('full', '').lower() in ('1', 'true')
     try:
         access_token = session.get("token")
         headers = {
@@ -395,7 +458,7 @@ def update_prices():
         if access_token:
             headers['Authorization'] = f'Bearer {access_token}'
             
-            test = requests.get("https://esi.evetech.net/verify", headers=headers)
+            test = get_esi_session().get("https://esi.evetech.net/verify", headers=headers)
             if test.status_code == 401:
                 # token expired — try refreshing
                 access_token = refresh_access_token()
@@ -407,15 +470,13 @@ def update_prices():
     
 
         materials = Material.query.all()
-        blueprints = BlueprintModel.query.all()
+        blueprints = catalog_blueprints()
         
         
-        # Prepopulate missing type_ids from normalized material names
-        all_needed_names = set()
-        for bp in blueprints:
-            normalized = bp.get_normalized_materials()
-            for category in normalized.values():
-                all_needed_names.update(category.keys())
+        # Every BOM entry, already loaded alongside the blueprints
+        material_rows = [row for bp in blueprints for row in bp.material_rows]
+        row_type_ids = {row.material_name: row.material_type_id for row in material_rows}
+        all_needed_names = set(row_type_ids)
 
 
         # Fetch missing type_ids
@@ -423,10 +484,14 @@ def update_prices():
         # Get existing name->type_id from DB
         existing_name_to_id = {mat.name: mat.type_id for mat in materials if mat.type_id}
 
+        # Names without a material row take the type_id resolved when the BOM was written
+        for name in all_needed_names:
+            if name not in existing_name_to_id and row_type_ids[name]:
+                existing_name_to_id[name] = row_type_ids[name]
+                unique_type_ids.add(row_type_ids[name])
+
         # Identify missing ones
         missing_names = [name for name in all_needed_names if name not in existing_name_to_id]
-        
-       
 
         if missing_names:
             lookup_result = get_item_info(missing_names)
@@ -447,14 +512,16 @@ def update_prices():
         # Stage material fetch jobs
         material_jobs = [(tid, None) for tid in unique_type_ids]
         blueprint_jobs = []
+        resolved_bp_ids = set()
+        info = get_item_info([bp.name for bp in blueprints if not bp.type_id])
         # Stage blueprint fetch jobs
         for bp in blueprints:
             if not bp.type_id:
-                info = get_item_info([bp.name])
                 norm_name = normalize_name(bp.name)
                 if norm_name in info:
                     bp.type_id = info[norm_name]['type_id']
                     unique_type_ids.add(bp.type_id)
+                    resolved_bp_ids.add(bp.id)
                 else:
                     logger.warning(f"Could not resolve type_id for blueprint '{bp.name}'")
                     continue  # Skip blueprint if no type_id
@@ -469,36 +536,77 @@ def update_prices():
 
         
         jobs = material_jobs + blueprint_jobs
-        
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(fetch_price, tid, sid, headers): tid for tid, sid in jobs}
-            for future in concurrent.futures.as_completed(futures):
-                tid, price_tuple, fallback = future.result()
-                price, source = price_tuple  # unpack the tuple
-
-                if price is not None:
-                    prices[tid] = price_tuple  # store tuple (price, source)
-                    fallback_flags[tid] = fallback
-                else:
-                    logger.warning(f"No price found for type_id {tid} — source: {source}")
+        # Prices the background refresher kept within their staleness tier are committed as is
+        results, stale_jobs = price_refresher.cached_results(jobs)
+        logger.info(f"{len(results)} of {len(jobs)} prices already fresh, fetching {len(stale_jobs)}")
+
+        # One pass over The Forge order book answers every Jita lookup, so the number
+        # of ESI calls depends on the page count rather than on the catalog size
+        if stale_jobs:
+            try:
+                forge_snapshot.ensure_fresh(headers)
+                results += [fetch_snapshot_price(tid, sid, headers) for tid, sid in stale_jobs]
+            except requests.exceptions.RequestException:
+                logger.error("Market snapshot refresh failed, falling back to per-type lookups", exc_info=True)
+                # Duplicate jobs (an item that is both a material and a blueprint) are fetched once
+                results += price_fetcher.fetch_prices(stale_jobs, headers)
+
+        for tid, price_tuple, fallback in results:
+            price, source = price_tuple  # unpack the tuple
+
+            if price is not None:
+                prices[tid] = price_tuple  # store tuple (price, source)
+                fallback_flags[tid] = fallback
+            else:
+                logger.warning(f"No price found for type_id {tid} — source: {source}")
 
         # Cache all material prices (including invention materials)
-        material_price_map = {}
+        materials_updated = 0
 
         for mat in materials:
             price_data = prices.get(mat.type_id)
             if price_data:
-                mat.sell_price = price_data[0]
-                material_price_map[mat.type_id] = mat.sell_price
+                if mat.sell_price != price_data[0]:
+                    mat.sell_price = price_data[0]
+                    materials_updated += 1
             else:
                 if mat.category != "Invention Materials":
                     logger.warning(f"No price found for material {mat.name} (type_id: {mat.type_id})")
 
 
-        for bp in blueprints:
-            price_data = prices.get(bp.type_id)
+        name_to_type_id = existing_name_to_id
+        type_id_to_price = {
+            tid: prices.get(tid, (None,))[0]
+            for tid in name_to_type_id.values()
+            if tid is not None
+        }
+        # Only blueprints whose own price, BOM prices or definition changed since the
+        # last run get new costs; everything else keeps the row it already has
+        job_prices = {
+            tid: (prices[tid][0] if tid in prices else None, fallback_flags.get(tid, False))
+            for tid, _ in jobs
+        }
+        changed_type_ids = None if full_refresh else price_ledger.changed(job_prices)
+        if changed_type_ids is None:
+            dirty_ids = {bp.id for bp in blueprints}
+        else:
+            consumers = blueprints_by_type_id(material_rows, name_to_type_id)
+            dirty_ids = price_ledger.dirty_blueprints() | resolved_bp_ids
+            for tid in changed_type_ids:
+                dirty_ids |= consumers.get(tid, set())
+            dirty_ids |= {bp.id for bp in blueprints if bp.type_id in changed_type_ids}
+
+        dirty = [bp for bp in blueprints if bp.id in dirty_ids]
+
+        # One sparse mat-vec prices every dirty blueprint's build and invention materials
+        cost_matrix = CostMatrix(dirty, name_to_type_id)
+        material_costs, _, full_material_costs = cost_matrix.costs(type_id_to_price)
+        for bp, type_id in cost_matrix.missing_prices(type_id_to_price):
+            logger.warning(f"No price for material (type_id: {type_id}) in blueprint {bp.name}")
 
+        for bp, material_cost, full_material_cost in zip(dirty, material_costs, full_material_costs):
+            price_data = prices.get(bp.type_id)
             if price_data:
                 bp.sell_price = price_data[0]
                 bp.used_jita_fallback = fallback_flags.get(bp.type_id, False)
@@ -507,59 +615,29 @@ def update_prices():
                 bp.sell_price = None
                 bp.used_jita_fallback = False
 
-            total_cost = 0.0
-            invention_cost = 0.0
-            
-            
-
-            name_to_type_id = existing_name_to_id
-            type_id_to_price = {mat.type_id: prices.get(mat.type_id, (None,))[0] for mat in materials}
-            
-            for bp in blueprints:
-                total_cost = 0.0
-                invention_cost = 0.0
-
-                name_to_type_id = existing_name_to_id
-                type_id_to_price = {
-                    tid: prices.get(tid, (None,))[0]
-                    for tid in name_to_type_id.values()
-                    if tid is not None
-                }
-
-                normalized = bp.get_normalized_materials()
-
-                for category, materials_dict in normalized.items():
-                    for mat_name, qty in materials_dict.items():
-                        type_id = name_to_type_id.get(mat_name)
-                        unit_price = type_id_to_price.get(type_id)
-
-                        if unit_price is None:
-                            logger.warning(f"No price for material {mat_name} (type_id: {type_id}) in blueprint {bp.name}")
-                            continue
-
-                        if category == "Invention Materials":
-                            invention_cost += unit_price * qty
-                        else:
-                            total_cost += unit_price * qty
-
-                bp.material_cost = round(total_cost, 2)
-
-                # Full material cost calculation
-                if bp.tier == 'T2' and bp.invention_chance and bp.runs_per_copy:
-                    try:
-                        invention_chance_decimal = bp.invention_chance / 100.0 if bp.invention_chance > 1 else bp.invention_chance
-                        invention_cost_per_run = invention_cost / (invention_chance_decimal * bp.runs_per_copy) if invention_chance_decimal > 0 else 0
-                        bp.full_material_cost = round(bp.material_cost + invention_cost_per_run, 2)
-                    except ZeroDivisionError:
-                        bp.full_material_cost = bp.material_cost
-                        logger.warning(f"ZeroDivisionError in invention cost calculation for {bp.name}")
-                else:
-                    bp.full_material_cost = bp.material_cost
-
+            bp.material_cost = material_cost
+            bp.full_material_cost = full_material_cost
 
+        recomputed = len(dirty)
+        skipped = len(blueprints) - recomputed
+        logger.info(
+            f"Price update: {len(changed_type_ids) if changed_type_ids is not None else 'all'} type_ids changed, "
+            f"{recomputed} blueprints recomputed, {skipped} skipped, {materials_updated} materials updated"
+        )
 
         db.session.commit()
-        return jsonify({"message": "Prices updated successfully"}), 200
+        price_store.flush()
+        price_ledger.commit(job_prices)
+        if recomputed or materials_updated:
+            catalog_changed("prices")
+        return jsonify({
+            "message": "Prices updated successfully",
+            "incremental": changed_type_ids is not None,
+            "changed_type_ids": len(changed_type_ids) if changed_type_ids is not None else None,
+            "recomputed": recomputed,
+            "skipped": skipped,
+            "materials_updated": materials_updated,
+        }), 200
 
     except Exception:
         db.session.rollback()
@@ -573,415 +651,59 @@ def update_prices():
 @blueprints_bp.route('/optimize', methods=['GET'])
 def optimize():
     try:
-        blueprints = BlueprintModel.query.all()
-        material_objs = {m.name: m for m in Material.query.all()}
-        inventory = {name: m.quantity for name, m in material_objs.items()}
-        untouched_inventory = {name: m.quantity for name, m in material_objs.items()}
-        
-        if not blueprints or not inventory:
-            return jsonify({"status": "No optimal solution found"}), 400
-
-        logger.info("Materials loaded: %s", inventory)
-        bp_names = {b.name for b in blueprints}
-
-        # 1. Create mappings between original and sanitized names for consistent lookups
-        # We need this to display final results with the original "pretty" names
-        s_name_to_original = {
-            **{sanitize_name(b.name): b.name for b in blueprints},
-            **{sanitize_name(m.name): m.name for m in material_objs.values()}
-        }
-
-        # Create a version of the inventory with sanitized keys for the model
-        sanitized_inventory = {sanitize_name(name): qty for name, qty in inventory.items()}
-
-        # 2. Create decision variables using SANITIZED names
-        # The LpVariable name AND the dictionary key must be sanitized and identical.
-        x = {sanitize_name(b.name): LpVariable(sanitize_name(b.name), lowBound=0, cat='Integer') for b in blueprints}
-
-        prob = LpProblem("MaxProfit", LpMaximize)
-
-        # 3. Calculate profit and build the objective function using SANITIZED names
-        profit_per_bp = {}
-        for b in blueprints:
-            s_name = sanitize_name(b.name)
-            profit_per_bp[s_name] = (b.sell_price - (b.full_material_cost if b.tier == 'T2' else b.material_cost)) / b.amt_per_run
-
-        prob += lpSum(profit_per_bp[s_name] * x[s_name] for s_name in x.keys())
-
-        # 4. Calculate material consumption and production using SANITIZED names
-        consumption = defaultdict(LpAffineExpression)
-        production = defaultdict(LpAffineExpression)
-
-        for b in blueprints:
-            s_bp_name = sanitize_name(b.name)
-            quantity_per_run = getattr(b, "amt_per_run", 1)
-
-            # Production: This blueprint produces itself
-            production[s_bp_name] += quantity_per_run * x[s_bp_name]
+        solver_name = get_solver_name(request.args.get('solver'), current_app.config)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-            # Consumption: This blueprint consumes its materials
-            normalized_mats = normalize_materials_structure(b.materials) if isinstance(b.materials, list) else b.materials
+    result, status_code = run_optimization(solver_name)
+    return jsonify(result), status_code
 
-            for section_name, section in normalized_mats.items():
-                for mat_name, qty_per_run in section.items():
-                    s_mat_name = sanitize_name(mat_name)
-                    consumption[s_mat_name] += qty_per_run * x[s_bp_name]
 
-        # 5. The UNIFIED material balance constraint using SANITIZED names
-        # This is the logic that fixes your inventory issue.
-        all_sanitized_items = set(sanitized_inventory.keys()) | set(consumption.keys()) | set(production.keys())
+@blueprints_bp.route('/optimize/cache', methods=['GET'])
+def optimize_cache_stats():
+    return jsonify(optimization_cache.stats()), 200
 
-        for s_item_name in all_sanitized_items:
-            consumed_expr = consumption.get(s_item_name, 0)
-            produced_expr = production.get(s_item_name, 0)
-            inventory_qty = sanitized_inventory.get(s_item_name, 0)
 
-            # Constraint: Total Consumed - Total Produced <= Starting Inventory
-            prob += consumed_expr - produced_expr <= inventory_qty, f"MaterialBalance_{s_item_name}"
-
-        # 6. Max production constraints using SANITIZED names
-        for b in blueprints:
-            if b.max is not None:
-                s_name = sanitize_name(b.name)
-                prob += x[s_name] <= b.max, f"MaxProd_{s_name}"
-                
-                
-        logger.info("Solving optimization problem...")
-        prob.solve(PULP_CBC_CMD(msg=False))
-
-        if LpStatus[prob.status] != 'Optimal':
-            logger.info("Optimization status: %s", LpStatus[prob.status])
-            # Save the LP file for debugging non-optimal solutions
-            with open("lp_debug_output.lp", "w") as f:
-                f.write(str(prob))
-            return jsonify({"status": f"No optimal solution found: {LpStatus[prob.status]}"}), 400
-
-        # Save the LP file for inspection of the successful run
-        with open("lp_output.lp", "w") as f:
-            f.write(str(prob))
-
-        # Optimization results - convert sanitized names back to original names for the response
-        what_to_produce = {
-            s_name_to_original[s_name]: int(value(var) or 0)
-            for s_name, var in x.items()
-            if (value(var) or 0) > 0  # Only include items we are actually producing
-        }
+def _run_optimization_job(app, solver_name, progress=None):
+    with app.app_context():
+        return run_optimization(solver_name, progress=progress)
 
-        logger.info("Optimal production: %s", what_to_produce)
-        logger.info("Objective value: %s", value(prob.objective))
 
-        # === Dependency resolution with inventory awareness ===
-
-        # Step 1: Build intermediate dependencies first (inventory-aware)
-        total_needed = defaultdict(int)  # Materials (minerals/components/etc.)
-        item_needs = defaultdict(int)    # Items to build (intermediates)
-        used_from_inv_total = defaultdict(int)
-        final_produced = defaultdict(int)
-        produced = defaultdict(int)
-        remaining_inventory = inventory.copy()
-
-        # Set to track processed blueprints
-        processed_blueprints = set()
-
-        # === Pass 1: Expand dependencies BEFORE handling top-level "what_to_produce" ===
-        for b in blueprints:
-            count = what_to_produce.get(b.name, 0)
-            if count > 0:
-                produced[b.name] += count
-
-        logger.info("Initial production plan: %s", produced)  # Log produced quantities
-
-        # === Dependency resolution phase ===
-        # Accumulate all materials and intermediate item needs from the initial production plan
-        for b in blueprints:
-            count = produced.get(b.name, 0)
-            if count > 0 and b.name not in processed_blueprints:
-                accumulate_materials(b, count, total_needed, item_needs, blueprints)
-                processed_blueprints.add(b.name)  # Mark this blueprint as processed
-
-        # Now subtract inventory from intermediate items first
-        to_build = defaultdict(int)
-        for name, qty_needed in item_needs.items():
-            inv_qty = remaining_inventory.get(name, 0)
-            used = min(inv_qty, qty_needed)
-            if used > 0:
-                used_from_inv_total[name] = used
-                remaining_inventory[name] -= used
-            if qty_needed > used:
-                to_build[name] = qty_needed - used
-
-        # Recursively build what's still missing
-        while to_build:
-            new_item_needs = defaultdict(int)
-            for item_name, qty_to_build in to_build.items():
-                bp = next((b for b in blueprints if b.name == item_name), None)
-                if not bp:
-                    logger.warning("No blueprint found for intermediate item: %s", item_name)
-                    continue
-                produced[item_name] += qty_to_build
-                accumulate_materials(bp, qty_to_build, total_needed, new_item_needs, blueprints)
-
-            # Subtract inventory from the new layer of dependencies
-            to_build = defaultdict(int)
-            for name, needed_qty in new_item_needs.items():
-                inv_qty = remaining_inventory.get(name, 0)
-                used = min(inv_qty, needed_qty)
-                if used > 0:
-                    used_from_inv_total[name] += used
-                    remaining_inventory[name] -= used
-                if needed_qty > used:
-                    to_build[name] = needed_qty - used
-
-        # === Now build the top-level "what_to_produce" goals ===
-        for b in blueprints:
-            count = what_to_produce.get(b.name, 0)
-            if count > 0:
-                # Only accumulate materials if the blueprint has not been processed
-                if b.name not in processed_blueprints:
-                    final_produced[b.name] += count
-                    accumulate_materials(b, count, total_needed, item_needs, blueprints)
-                    processed_blueprints.add(b.name)  # Mark this blueprint as processed
-                else:
-                    # If already processed, just add to final_produced
-                    final_produced[b.name] += count
-
-        logger.info("Initial Final produced items: %s", final_produced)  # Log final produced quantities
-
-       
-
-
-        # Satisfy needs from inventory first (for materials, not intermediates)
-        inventory_cost_savings = 0.0
-        inventory_items_used = {}
-
-        # Create a copy of final_produced to preserve original numbers
-        original_final_produced = dict(final_produced)
-        adjusted_final_produced = {}
-
-        for item_name, qty_needed in final_produced.items():
-            adjusted_final_produced[item_name] = qty_needed  # Start with original required amount
-
-            if qty_needed > 0:
-                mat_obj = material_objs.get(item_name)
-
-                if mat_obj:
-                    if mat_obj.sell_price is not None:  # Check if sell_price is not None
-                        cost_per_unit = mat_obj.sell_price
-                        inv_qty = remaining_inventory.get(item_name, 0)
-                        if inv_qty > 0:
-                            used_from_inv = min(inv_qty, qty_needed)
-                            saved = used_from_inv * cost_per_unit
-                            inventory_cost_savings += saved
-                            logger.info("INVENTORY: Using %d x %s (intermediate), cost savings: %.2f", 
-                                    used_from_inv, item_name, saved)
-
-                            remaining_inventory[item_name] -= used_from_inv
-                            category = getattr(mat_obj, "category", "Other")
-
-                            inventory_items_used[item_name] = {
-                                "amount": used_from_inv,
-                                "category": category,
-                                "original_required": qty_needed,  # Track original requirement
-                                "remaining_requirement": qty_needed - used_from_inv  # Track what's left to produce
-                            }
-
-                            # Reduce the production requirement
-                            adjusted_final_produced[item_name] -= used_from_inv
-                        else:
-                            logger.info("INVENTORY: No inventory available for %s", item_name)
-                    else:
-                        logger.warning("Sell price is None for material: %s", item_name)
-                else:
-                    logger.warning("No material found for item: %s", item_name)
+@blueprints_bp.route('/optimize/jobs', methods=['POST'])
+def submit_optimize_job():
+    try:
+        solver_name = get_solver_name(request.args.get('solver'), current_app.config)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        logger.info("Original production requirements: %s", original_final_produced)
-        logger.info("Consumed from inventory directly to production: %s", inventory_items_used)
-        logger.info("Actual production needed after inventory: %s", 
-                   {k: v for k, v in adjusted_final_produced.items() if v > 0})
+    try:
+        job_id = optimization_jobs.submit(_run_optimization_job, current_app._get_current_object(), solver_name)
+    except JobQueueFull as e:
+        return jsonify({"error": f"Too many optimization jobs in flight ({e}), try again later"}), 429
 
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
 
-        
-        # Remaining dependencies after accounting for inventory
-        deps = defaultdict(float)
-        for b in blueprints:
-            net_production = final_produced.get(b.name, 0)
-            if net_production > 0:
-                expand_materials(b, blueprints, quantity=net_production, t1_dependencies=deps, inventory=remaining_inventory)
-        for name, inv_qty in untouched_inventory.items():
-            if name in deps:
-                used = min(inv_qty, deps[name])
-                deps[name] -= used
-                if deps[name] <= 0:
-                    del deps[name]
-
-        # Remove dependencies that are already in the final production
-        for item_name, qty_needed in list(adjusted_final_produced.items()):
-            if item_name in deps:
-                del adjusted_final_produced[item_name]
-
-        extra_produced_t2 = defaultdict(int)
-
-        # Build T1->T2 lookup (could cache this elsewhere)
-        t1_to_t2_bp = {}
-        for bp in blueprints:
-            if bp.tier == "T2":
-                t1_name = bp.name[:-2] + "I" if bp.name.endswith("II") else None
-                if t1_name:
-                    t1_to_t2_bp[t1_name] = bp
-
-        for t1_name, t1_count in list(adjusted_final_produced.items()):  # list() in case we modify produced
-            t2_bp = t1_to_t2_bp.get(t1_name)
-            if not t2_bp or t1_count == 0:
-                continue
-            
-            
-            s_name = sanitize_name(t2_bp.name)
-            if profit_per_bp[s_name] <= 0:
-                continue  # Skip unprofitable T2 blueprints
-            
-            
-            t2_mats = normalize_materials_structure(t2_bp.materials)
-            min_craftable = t1_count
-
-            for section_name, section in t2_mats.items():
-                if section_name == "Invention Materials":
-                    continue
-                for mat, amt_per_run in section.items():
-                    # If the T2 blueprint consumes its T1 version, limit by produced and/or inventory
-                    available = adjusted_final_produced.get(mat, 0) + remaining_inventory.get(mat, 0)
-                    possible = available // amt_per_run if amt_per_run else float('inf')
-                    min_craftable = min(min_craftable, possible)
-
-            if min_craftable > 0:
-                extra_produced_t2[t2_bp.name] += min_craftable
-                for section_name, section in t2_mats.items():
-                    if section_name == "Invention Materials":
-                        continue
-                    for mat, amt_per_run in section.items():
-                        total_needed = min_craftable * amt_per_run
-                        use_from_produced = min(adjusted_final_produced.get(mat, 0), total_needed)
-                        if use_from_produced:
-                            final_produced[mat] -= use_from_produced
-                        use_from_inventory = total_needed - use_from_produced
-                        if use_from_inventory > 0:
-                            remaining_inventory[mat] -= use_from_inventory
-                # Update adjusted, deps, and what to produce to make sure they look right after optimize
-                adjusted_final_produced[t1_name] -= min_craftable
-                deps[t1_name] = deps.get(t1_name, 0) + min_craftable
-                what_to_produce[t2_bp.name] = what_to_produce.get(t2_bp.name, 0) + min_craftable
-
-        # Add this to your output
-        for t2_name, qty in extra_produced_t2.items():
-            adjusted_final_produced[t2_name] = adjusted_final_produced.get(t2_name, 0) + qty  # or wherever you report output
-
-        logger.info("Extra T2s made from leftovers: %s", dict(extra_produced_t2))\
-
-        # Calculate expected invention materials used and expected cost
-        expected_invention_materials_used = defaultdict(float)
-        invention_cost = 0.0 
-        for b in blueprints:
-            s_bp_name = sanitize_name(b.name)
-            produced_qty = int(value(x[s_bp_name]) or 0)  # Get the solved quantity for this blueprint
-            if produced_qty > 0:
-                normalized_mats = normalize_materials_structure(b.materials) if isinstance(b.materials, list) else b.materials
-                runs_per_copy = getattr(b, "runs_per_copy", 1) or 1
-                for section_name, section in normalized_mats.items():
-                    if section_name == "Invention Materials":
-                        for mat_name, qty_per_run in section.items():
-                            s_mat_name = sanitize_name(mat_name)
-                            # Calculate attempts needed (handle potential division by zero if invention_chance is 0 or None)
-                            attempts_needed = 1.0  # Default to 1 if no invention chance (e.g., for T1 BPCs)
-                            if hasattr(b, "invention_chance") and b.invention_chance is not None and b.invention_chance > 0:
-                                attempts_needed = 1 / b.invention_chance
-                            # Update expected invention materials used
-                            expected_invention_materials_used[s_mat_name] += (qty_per_run * attempts_needed * produced_qty) / runs_per_copy
-                            # Calculate expected cost for datacores
-                            mat_obj = material_objs.get(mat_name)
-                            if mat_obj and hasattr(mat_obj, 'sell_price') and mat_obj.sell_price is not None:
-                                invention_cost += mat_obj.sell_price * (qty_per_run * attempts_needed * produced_qty) / runs_per_copy
-                            elif mat_obj.sell_price is None:
-                                headers = {
-                                    'User-Agent': 'ManuOptimizer 1.0 nariod14@gmail.com'
-                                }
-                                mat_obj.sell_price = get_lowest_jita_sell_price(mat_obj.type_id, headers=headers)[0]
-                                invention_cost += mat_obj.sell_price * (qty_per_run * attempts_needed * produced_qty) / runs_per_copy
-        # Convert sanitized names back to original             
-        report_invention_materials = {
-            s_name_to_original.get(s_mat_name, s_mat_name): round(qty)  # Use .get for safety, round for display
-            for s_mat_name, qty in expected_invention_materials_used.items()
-            if qty > 0 
-        }
-        
-        logger.debug("Expected invention materials used: %s", report_invention_materials)
-                
 
-        # Calculate final material usage (non-recursive)
-        final_usage = defaultdict(float)
-
-        # Accumulate materials for the total production goal
-        for name, count in original_final_produced.items():
-            if count > 0:
-                bp = next((bp for bp in blueprints if bp.name == name), None)
-                if bp:
-                    accumulate_materials(bp, count, final_usage, {}, blueprints)
-
-        final_material_usage = {}
-        all_materials = set(final_usage) | set(used_from_inv_total)
-        for mat in all_materials:
-            obj = material_objs.get(mat)
-            starting_qty = getattr(obj, "quantity", inventory.get(mat, 0))
-            category = getattr(obj, "category", "Other") if obj else "Other"
-
-            used_int = int(round(final_usage.get(mat, 0)))
-            final_material_usage[mat] = {
-                "used": used_int,
-                "remaining": starting_qty - used_int,
-                "category": category
-            }
+@blueprints_bp.route('/optimize/jobs/<job_id>', methods=['GET'])
+def get_optimize_job(job_id):
+    job = optimization_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_summary(job)), 200
 
 
-        
-        # Calculate profits
-        total_sell = sum(bp.sell_price * what_to_produce.get(bp.name, 0) for bp in blueprints)
-        # Calculate true profit considering material costs
-        true_jita = 0.0
-        for bp in blueprints:
-            produced_qty = final_produced.get(bp.name, 0)
-            if produced_qty > 0:
-                # Calculate the total material cost for the produced quantity
-                material_cost = (bp.full_material_cost if bp.tier == 'T2' else bp.material_cost)
-                total_material_cost = material_cost * produced_qty
-
-                # Log the values for debugging
-                logger.info("Blueprint: %s, Produced: %d, Sell Price: %f, Material Cost: %f, Total Material Cost: %f",
-                            bp.name, produced_qty, bp.sell_price, material_cost, total_material_cost)
-
-                # Subtract the total material cost from the total sell price
-                true_jita += (bp.sell_price * produced_qty) - total_material_cost
-        logger.info("True Jita Profit: %f", true_jita)
-
-        result = {
-            "status": "Optimal",
-            
-            "total_profit": total_sell,
-            "true_profit_jita": true_jita,
-            "true_profit_inventory": true_jita + inventory_cost_savings,
-            "inventory_cost_savings": inventory_cost_savings,
-            "what_to_produce": what_to_produce,
-            "original_production_plan": original_final_produced,
-            "adjusted_production_plan": {k: v for k, v in adjusted_final_produced.items() if v > 0},
-            "material_usage": final_material_usage,
-            "dependencies_needed": {k: int(v) for k, v in deps.items() if v > 0},
-            "inventory_savings": inventory_items_used,
-            "expected_invention_materials_used": report_invention_materials,
-            "invention_cost": invention_cost
-        }
+@blueprints_bp.route('/optimize/jobs/<job_id>/events', methods=['GET'])
+def stream_optimize_job(job_id):
+    job = optimization_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
 
-        logger.info("Optimization complete. Final result: %s", result)
-        return jsonify(result), 200
+    def events(job):
+        while job:
+            yield f"data: {json.dumps(job_summary(job))}\n\n"
+            if job["status"] in ("done", "failed"):
+                return
+            job = optimization_jobs.wait_for_change(job_id, job["version"])
 
-    except Exception as e:
-        logger.error("Error: %s", str(e))
-        logger.error(traceback.format_exc())
-        return jsonify({"error": "An error occurred during optimization"}), 500
+    return Response(events(job), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
@@ -0,0 +1,205 @@
+import logging
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+logger = logging.getLogger(__name__)
+
+
+class BomGraph:
+    """
+    Bill-of-materials graph compiled from a list of blueprints.
+
+    Every item (blueprint output or material) gets an integer id. For each
+    blueprint j, `edges[j]` holds (section, item_id, qty_per_run) tuples from
+    its pre-normalized materials and `producer[item_id]` is the index of the
+    blueprint that builds the item, or -1 for raw materials. Name lookups are
+    dict hits instead of scans over the blueprint list.
+
+    Iterating a BomGraph yields its blueprints, so it can be passed anywhere a
+    blueprint list was expected.
+
+    explode() turns whole production plans into base materials with sparse
+    matrix products over the graph's topological layers.
+    """
+
+    def __init__(self, blueprints):
+        from .utils import normalize_materials_structure
+
+        self.blueprints = list(blueprints)
+        self.items = []
+        self.item_index = {}
+        self.producer = []
+        self.materials = []
+        self.edges = []
+        self._bp_index = {}
+        self._obj_index = {}
+        self._explosion = None
+
+        for j, bp in enumerate(self.blueprints):
+            self._obj_index[id(bp)] = j
+            # First blueprint with a given name wins, like the old next(...) scans
+            self._bp_index.setdefault(bp.name, j)
+
+        for j, bp in enumerate(self.blueprints):
+            self.item_id(bp.name)
+            normalized = normalize_materials_structure(bp.materials)
+            self.materials.append(normalized)
+            self.edges.append([
+                (section_name, self.item_id(mat), qty)
+                for section_name, section in normalized.items()
+                for mat, qty in section.items()
+            ])
+
+    def item_id(self, name):
+        idx = self.item_index.get(name)
+        if idx is None:
+            idx = len(self.items)
+            self.item_index[name] = idx
+            self.items.append(name)
+            self.producer.append(self._bp_index.get(name, -1))
+        return idx
+
+    def __iter__(self):
+        return iter(self.blueprints)
+
+    def __len__(self):
+        return len(self.blueprints)
+
+    def get(self, name):
+        """The blueprint that builds `name`, or None for raw materials."""
+        j = self._bp_index.get(name)
+        return self.blueprints[j] if j is not None else None
+
+    def is_buildable(self, name):
+        return name in self._bp_index
+
+    def normalized(self, bp):
+        """Pre-normalized {section: {material: qty}} for a blueprint."""
+        j = self._obj_index.get(id(bp))
+        if j is not None:
+            return self.materials[j]
+        from .utils import normalize_materials_structure
+        return normalize_materials_structure(bp.materials)
+
+    # === Vectorized explosion ===
+
+    def _consumption(self, j, per_unit=True):
+        """(item_ids, quantities) one run (or one output unit) of blueprint j consumes."""
+        bp = self.blueprints[j]
+        invention_chance = getattr(bp, "invention_chance", None)
+        amt_per_run = getattr(bp, "amt_per_run", 1) if per_unit else 1
+
+        ids, qtys = [], []
+        for section_name, item, qty in self.edges[j]:
+            if section_name == "Invention Materials" and invention_chance:
+                qty = qty / invention_chance
+            ids.append(item)
+            qtys.append(qty / amt_per_run)
+        return ids, qtys
+
+    def _compile_explosion(self):
+        """
+        Per-unit input matrix A (A[i, k] = units of item i consumed per unit of
+        item k built), the same per run, and the buildable items grouped into
+        topological layers with every consumer ahead of what it consumes.
+        """
+        n = len(self.items)
+        rows, cols, per_unit, per_run = [], [], [], []
+        consumers_left = np.zeros(n, dtype=int)
+        inputs = [[] for _ in range(n)]
+
+        for k, j in enumerate(self.producer):
+            if j < 0:
+                continue
+            ids, unit_qtys = self._consumption(j)
+            _, run_qtys = self._consumption(j, per_unit=False)
+            rows.extend(ids)
+            cols.extend([k] * len(ids))
+            per_unit.extend(unit_qtys)
+            per_run.extend(run_qtys)
+            for i in set(ids):
+                if self.producer[i] >= 0:
+                    consumers_left[i] += 1
+                    inputs[k].append(i)
+
+        unit_matrix = csr_matrix((per_unit, (rows, cols)), shape=(n, n), dtype=float)
+        run_matrix = csr_matrix((per_run, (rows, cols)), shape=(n, n), dtype=float)
+        reach_matrix = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n), dtype=float)
+
+        # Kahn's algorithm, peeling off items nothing (left) consumes
+        buildable = [k for k in range(n) if self.producer[k] >= 0]
+        layer = [k for k in buildable if consumers_left[k] == 0]
+        layers, seen = [], 0
+        while layer:
+            layers.append(np.array(layer))
+            seen += len(layer)
+            next_layer = []
+            for k in layer:
+                for i in inputs[k]:
+                    consumers_left[i] -= 1
+                    if consumers_left[i] == 0:
+                        next_layer.append(i)
+            layer = next_layer
+        if seen != len(buildable):
+            raise ValueError("Blueprint materials form a cycle, cannot explode the chain")
+
+        amt_per_run = np.array([
+            getattr(self.blueprints[j], "amt_per_run", 1) if j >= 0 else 1 for j in self.producer
+        ], dtype=float)
+        self._explosion = {
+            "layers": [
+                (ids, unit_matrix[:, ids].tocsr(), run_matrix[:, ids].tocsr(), reach_matrix[:, ids].tocsr())
+                for ids in layers
+            ],
+            "amt_per_run": amt_per_run,
+            "raw": np.array([j < 0 for j in self.producer]),
+        }
+        return self._explosion
+
+    def demand_vector(self, plan):
+        """{item name: quantity} as a dense demand vector over item ids."""
+        demand = np.zeros(len(self.items))
+        for name, qty in plan.items():
+            demand[self.item_id(name)] += qty
+        return demand
+
+    def explode_vectors(self, demand, round_runs=False):
+        """
+        Gross requirement of every item for a demand vector, or a matrix with one
+        plan per column. Equivalent to solving (I - A) g = demand layer by layer.
+
+        With round_runs, each item is built in whole runs (ceil(needed / amt_per_run))
+        and its inputs are charged per run, instead of pro rata per unit.
+        Returns (gross, reached) where reached flags every item the plans touch.
+        """
+        explosion = self._explosion
+        if explosion is None or len(explosion["raw"]) != len(self.items):
+            explosion = self._compile_explosion()
+
+        gross = np.array(demand, dtype=float)
+        reached = (gross != 0).astype(float)
+        amt_per_run = explosion["amt_per_run"]
+        for ids, unit_matrix, run_matrix, reach_matrix in explosion["layers"]:
+            if round_runs:
+                per_item = amt_per_run[ids] if gross.ndim == 1 else amt_per_run[ids][:, None]
+                runs = np.ceil(gross[ids] / per_item - 1e-9)
+                gross += run_matrix @ runs
+            else:
+                gross += unit_matrix @ gross[ids]
+            reached += reach_matrix @ reached[ids]
+        return gross, reached > 0
+
+    def explode(self, plan, round_runs=False):
+        """Base materials {name: quantity} needed to build a whole {item name: quantity} plan."""
+        gross, reached = self.explode_vectors(self.demand_vector(plan), round_runs=round_runs)
+        raw = self._explosion["raw"]
+        return {self.items[i]: float(gross[i]) for i in np.flatnonzero(raw & reached)}
+
+
+def as_bom_graph(blueprints):
+    """Compile a blueprint list, or pass an existing BomGraph through."""
+    if isinstance(blueprints, BomGraph):
+        return blueprints
+    return BomGraph(blueprints)
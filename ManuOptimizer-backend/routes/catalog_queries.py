@@ -0,0 +1,76 @@
+from itertools import groupby
+from operator import itemgetter
+
+from sqlalchemy.orm import joinedload, lazyload, load_only, raiseload, selectinload, with_polymorphic
+
+from models import Blueprint, BlueprintMaterial, BlueprintT2, ReactionFormula, Station, db, nest_materials
+
+
+# Blueprint.query only selects the blueprint table, so every T2 row then lazy-loads its
+# blueprint_t2 columns with a SELECT of its own. Loading through this alias joins them in
+# instead (reaction formulas share the blueprint table), and with the bills of materials
+# in one IN query the statement count no longer grows with the catalog.
+CatalogBlueprint = with_polymorphic(Blueprint, [BlueprintT2, ReactionFormula])
+
+
+def catalog_blueprints():
+    """
+    Every blueprint as a full entity, for routes that read most columns and
+    write costs back (/optimize, /update_prices). Two statements.
+    """
+    return db.session.execute(
+        db.select(CatalogBlueprint).options(
+            selectinload(CatalogBlueprint.material_rows),
+            lazyload(CatalogBlueprint.station),
+        )
+    ).scalars().all()
+
+
+def listing_blueprints():
+    """
+    (blueprints, {blueprint id: materials}) for the blueprint list, with the
+    station name joined in. The bills of materials come back as plain rows
+    rather than entities, which is most of the time saved on a large catalog.
+    Two statements.
+    """
+    blueprints = db.session.execute(
+        db.select(CatalogBlueprint).options(
+            load_only(
+                CatalogBlueprint.id, CatalogBlueprint.name, CatalogBlueprint.sell_price,
+                CatalogBlueprint.amt_per_run, CatalogBlueprint.material_cost, CatalogBlueprint.tier,
+                CatalogBlueprint.station_id, CatalogBlueprint.use_jita_sell, CatalogBlueprint.used_jita_fallback,
+                CatalogBlueprint.BlueprintT2.invention_chance, CatalogBlueprint.BlueprintT2.invention_cost,
+                CatalogBlueprint.BlueprintT2.full_material_cost,
+                raiseload=True,
+            ),
+            joinedload(CatalogBlueprint.station).load_only(Station.name, raiseload=True),
+            raiseload(CatalogBlueprint.material_rows),
+        )
+    ).scalars().all()
+
+    rows = db.session.execute(
+        db.select(
+            BlueprintMaterial.blueprint_id, BlueprintMaterial.category,
+            BlueprintMaterial.material_name, BlueprintMaterial.qty_per_run,
+        ).order_by(BlueprintMaterial.blueprint_id, BlueprintMaterial.id)
+    )
+    materials = {
+        blueprint_id: nest_materials(row[1:] for row in group)
+        for blueprint_id, group in groupby(rows, key=itemgetter(0))
+    }
+    return blueprints, materials
+
+
+def pricing_blueprints():
+    """What the price refresher needs to decide which type_ids to keep warm. Two statements."""
+    return db.session.execute(
+        db.select(Blueprint).options(
+            load_only(
+                Blueprint.name, Blueprint.type_id, raiseload=True,
+            ),
+            lazyload(Blueprint.station),
+            selectinload(Blueprint.material_rows).load_only(
+                BlueprintMaterial.material_name, BlueprintMaterial.material_type_id, raiseload=True
+            ),
+        )
+    ).scalars().all()
@@ -0,0 +1,44 @@
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Callbacks run after any write to blueprints, materials, stations or prices
+_listeners = []
+
+# Bumped on every change; list endpoints derive their ETag and Last-Modified from it
+_version = 0
+_changed_at = time.time()
+_version_lock = threading.Lock()
+
+
+def catalog_version():
+    """(version, changed_at) of the catalog; changed_at is epoch seconds, process start until the first change."""
+    with _version_lock:
+        return _version, _changed_at
+
+
+def on_catalog_change(listener):
+    """Register listener(kind, ids) to be called whenever the catalog changes. Usable as a decorator."""
+    _listeners.append(listener)
+    return listener
+
+
+def catalog_changed(kind, ids=None):
+    """
+    Tell every listener that `kind` ("blueprints", "materials", "stations" or
+    "prices") changed. `ids` narrows it to those row ids when the caller knows
+    them; None means anything of that kind may have changed.
+    """
+    global _version, _changed_at
+    with _version_lock:
+        _version += 1
+        _changed_at = time.time()
+    logger.debug(f"Catalog changed: {kind} {ids if ids is not None else ''} (version {_version})")
+    for listener in _listeners:
+        try:
+            listener(kind, ids)
+        except Exception:
+            logger.error(f"Catalog change listener {listener!r} failed", exc_info=True)
@@ -0,0 +1,107 @@
+import logging
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+logger = logging.getLogger(__name__)
+
+INVENTION_SECTION = "Invention Materials"
+
+
+class CostMatrix:
+    """
+    Blueprint x type_id quantity matrices for the direct material costs update_prices writes.
+
+    `build` holds every non-invention material of each blueprint, `invention`
+    its invention materials. One sparse mat-vec against a price vector gives
+    every blueprint's material and invention cost at once; costs() turns those
+    into the material_cost / full_material_cost columns.
+
+    Entries are stored in the blueprint's own material order, so each row sums
+    in the same order the old per-blueprint loop did and the results match it
+    exactly. A material without a type_id or price contributes nothing, as before.
+    """
+
+    def __init__(self, blueprints, name_to_type_id):
+        self.blueprints = list(blueprints)
+        self.type_ids = []
+        self.column = {}
+        self.unresolved = []  # (row, material name) with no type_id
+
+        sections = {"build": ([], [], [0]), "invention": ([], [], [0])}
+        for row, bp in enumerate(self.blueprints):
+            for category, materials in bp.get_normalized_materials().items():
+                data, indices, _ = sections["invention" if category == INVENTION_SECTION else "build"]
+                for name, qty in materials.items():
+                    type_id = name_to_type_id.get(name)
+                    if type_id is None:
+                        self.unresolved.append((row, name))
+                        continue
+                    col = self.column.get(type_id)
+                    if col is None:
+                        col = self.column[type_id] = len(self.type_ids)
+                        self.type_ids.append(type_id)
+                    data.append(qty)
+                    indices.append(col)
+            for data, _, indptr in sections.values():
+                indptr.append(len(data))
+
+        shape = (len(self.blueprints), len(self.type_ids))
+        self.build, self.invention = (
+            csr_matrix((np.asarray(data, dtype=float), np.asarray(indices, dtype=np.int64), indptr), shape=shape)
+            for data, indices, indptr in sections.values()
+        )
+
+        # Invention amortization inputs; rows that don't amortize keep full == material cost
+        chance = np.array([float(getattr(bp, "invention_chance", None) or 0) for bp in self.blueprints])
+        runs = np.array([float(getattr(bp, "runs_per_copy", None) or 0) for bp in self.blueprints])
+        self.amortized = np.array([bp.tier == 'T2' for bp in self.blueprints], dtype=bool) & (chance != 0) & (runs != 0)
+        self.chance = np.where(chance > 1, chance / 100.0, chance)
+        self.runs = runs
+
+    def __len__(self):
+        return len(self.blueprints)
+
+    def price_vector(self, type_id_to_price):
+        """(prices, priced mask) aligned with the matrix columns. Unpriced columns cost 0."""
+        raw = [type_id_to_price.get(tid) for tid in self.type_ids]
+        priced = np.array([p is not None for p in raw], dtype=bool)
+        prices = np.array([p if p is not None else 0.0 for p in raw], dtype=float)
+        return prices, priced
+
+    def missing_prices(self, type_id_to_price):
+        """(blueprint, material type_id or None) for every BOM entry that can't be priced."""
+        _, priced = self.price_vector(type_id_to_price)
+        missing = []
+        if not priced.all():
+            unpriced_cols = np.flatnonzero(~priced)
+            for matrix in (self.build, self.invention):
+                rows, cols = matrix[:, unpriced_cols].nonzero()
+                missing.extend((self.blueprints[r], self.type_ids[unpriced_cols[c]]) for r, c in zip(rows, cols))
+        missing.extend((self.blueprints[row], None) for row, _ in self.unresolved)
+        return missing
+
+    def costs(self, type_id_to_price):
+        """
+        Returns (material_cost, invention_cost, full_material_cost) lists, one
+        entry per blueprint, rounded the way update_prices stores them.
+        """
+        prices, _ = self.price_vector(type_id_to_price)
+        total = self.build @ prices
+        invention = self.invention @ prices
+
+        # Python's round() on purpose: np.round rounds differently on some halves
+        material_cost = [round(v, 2) for v in total.tolist()]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            per_run = np.where(
+                self.amortized & (self.chance > 0),
+                invention / (self.chance * self.runs),
+                0.0,
+            )
+        full_material_cost = [
+            round(cost + extra, 2) if amortized else cost
+            for cost, extra, amortized in zip(material_cost, per_run.tolist(), self.amortized.tolist())
+        ]
+        return material_cost, invention.tolist(), full_material_cost
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import logging
+import threading
+
+from .catalog_state import on_catalog_change
+
+
+logger = logging.getLogger(__name__)
+
+
+def version_stamp(*mappings):
+    """Short stable hash of price/inventory dicts, used as the memo version."""
+    encoded = json.dumps([sorted(m.items(), key=lambda kv: str(kv[0])) for m in mappings], default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+class CostMemo:
+    """
+    Per-blueprint cost results keyed by (kind, blueprint key, version stamp).
+
+    The stamp captures the prices/inventory a value was computed against, so a
+    lookup with a newer stamp simply misses. Every kind walks sub-blueprints, so
+    any blueprint edit clears the memo: a parent's cost includes its components'.
+    """
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, kind, bp_key, stamp, compute):
+        key = (kind, bp_key, stamp)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+cost_memo = CostMemo()
+
+
+@on_catalog_change
+def _invalidate_cost_memo(kind, ids=None):
+    if kind in ("blueprints", "prices", "materials"):
+        cost_memo.clear()
@@ -0,0 +1,74 @@
+import logging
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+logger = logging.getLogger(__name__)
+
+# Waitress threads + the price refresher + optimizer job workers, with a little headroom
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 4))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))          # Seconds to wait for a free connection
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))  # How long a writer waits on a lock before erroring
+
+# Applied to every new pooled connection, in order
+SQLITE_PRAGMAS = {
+    # Readers see the last committed snapshot instead of waiting on an open write
+    "journal_mode": "WAL",
+    # Durable across application crashes; only an OS crash can lose the last commits
+    "synchronous": "NORMAL",
+    "cache_size": -int(os.getenv("DB_CACHE_KIB", 64 * 1024)),      # Negative means KiB, not pages
+    "mmap_size": int(os.getenv("DB_MMAP_BYTES", 256 * 1024 * 1024)),
+    "temp_store": "MEMORY",
+    "busy_timeout": DB_BUSY_TIMEOUT_MS,
+}
+
+
+def is_file_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def engine_options(uri, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the instance database.
+
+    Only file-backed SQLite gets an explicit QueuePool; in-memory databases keep
+    Flask-SQLAlchemy's single shared connection, which a pool would break.
+    """
+    if not is_file_sqlite(uri):
+        return {}
+    return {
+        "poolclass": QueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "connect_args": {"timeout": DB_BUSY_TIMEOUT_MS / 1000, "check_same_thread": False},
+    }
+
+
+def apply_pragmas(dbapi_connection, connection_record=None, pragmas=SQLITE_PRAGMAS):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def install(engine):
+    """Apply the SQLite profile on every connection `engine` opens from now on."""
+    if engine.dialect.name != "sqlite":
+        return
+    if event.contains(engine, "connect", apply_pragmas):
+        return
+    event.listen(engine, "connect", apply_pragmas)
+    logger.info(f"SQLite profile installed on {engine.url}: {SQLITE_PRAGMAS}, pool={engine.pool.status()}")
+
+
+def current_settings(connection, pragmas=SQLITE_PRAGMAS):
+    """What a live connection actually reports for each tuned pragma."""
+    return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in pragmas}
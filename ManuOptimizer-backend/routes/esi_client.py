@@ -0,0 +1,188 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+logger = logging.getLogger(__name__)
+
+# Parallel ESI fetches per process; the connection pool is sized to match
+ESI_MAX_CONCURRENCY = int(os.getenv("ESI_MAX_CONCURRENCY", 10))
+# Stop sending requests when this few errors are left in ESI's error window
+ESI_ERROR_LIMIT_FLOOR = int(os.getenv("ESI_ERROR_LIMIT_FLOOR", 10))
+ESI_MAX_RETRIES = int(os.getenv("ESI_MAX_RETRIES", 5))
+
+# Worth another try, but every try is an error against ESI's limit
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class ErrorLimitTracker:
+    """
+    ESI's error budget as last reported by X-ESI-Error-Limit-Remain / -Reset.
+
+    ESI counts errors per IP, so the requests session and the async fetcher
+    share one tracker: once the budget drops to the floor, both hold off
+    until the window resets. wait_time() never blocks, so the async side
+    can check it from the event loop.
+    """
+
+    def __init__(self, floor=ESI_ERROR_LIMIT_FLOOR):
+        self.floor = floor
+        self.remain = None
+        self.reset_at = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, headers):
+        remain = headers.get("X-ESI-Error-Limit-Remain")
+        reset = headers.get("X-ESI-Error-Limit-Reset")
+        if remain is None or reset is None:
+            return
+        try:
+            remain, reset = int(remain), int(reset)
+        except ValueError:
+            return
+
+        with self._lock:
+            self.remain = remain
+            self.reset_at = time.time() + reset
+        if remain <= self.floor:
+            logger.warning(f"ESI error limit low: {remain} left, window resets in {reset}s")
+
+    def pause(self, seconds):
+        """Treat the budget as spent for `seconds`, e.g. after a 420."""
+        with self._lock:
+            self.remain = 0
+            self.reset_at = max(self.reset_at, time.time() + seconds)
+
+    def wait_time(self):
+        """Seconds to hold off before the next request; 0 once the window has reset."""
+        with self._lock:
+            if self.remain is None or self.remain > self.floor:
+                return 0.0
+            wait = self.reset_at - time.time()
+            if wait <= 0:
+                self.remain = None
+                return 0.0
+            return wait
+
+    def wait(self):
+        """Block while the error budget is at the floor and the window has not reset yet."""
+        wait = self.wait_time()
+        if wait > 0:
+            logger.warning(f"Pausing ESI requests for {wait:.1f}s to stay under the error limit")
+            time.sleep(wait)
+            self.wait_time()  # Clears the budget if no newer response moved the window on
+
+
+esi_error_limit = ErrorLimitTracker()
+
+
+class EsiSession(requests.Session):
+    """
+    requests.Session with a keep-alive pool sized to ESI_MAX_CONCURRENCY, retry
+    with backoff, and a process-wide brake on ESI's error limit.
+
+    ESI answers every request with X-ESI-Error-Limit-Remain / -Reset. Once the
+    remaining budget drops to the tracker's floor, every thread using the
+    session waits out the reset window instead of burning the last errors and
+    getting the IP banned.
+
+    The adapter only retries connection failures. Retries on an error status
+    happen in request(), so each one reads the limit headers of the response
+    before it and goes through throttle() like any other request.
+    """
+
+    def __init__(self, pool_size=ESI_MAX_CONCURRENCY, error_limit=esi_error_limit,
+                 max_retries=ESI_MAX_RETRIES, backoff_factor=1):
+        super().__init__()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(),
+            respect_retry_after_header=False,  # Or the adapter would retry a 429/503 itself
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.mount("https://", adapter)
+
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.error_limit = error_limit
+        self.hooks["response"].append(self._track_error_limit)
+
+    def _track_error_limit(self, response, *args, **kwargs):
+        self.error_limit.update(response.headers)
+
+    def throttle(self):
+        self.error_limit.wait()
+
+    def _retry_delay(self, response, attempt):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return min(self.backoff_factor * (2 ** attempt), Retry.DEFAULT_BACKOFF_MAX)
+
+    def request(self, method, url, *args, **kwargs):
+        retryable = method.upper() in Retry.DEFAULT_ALLOWED_METHODS
+        attempt = 0
+        while True:
+            self.throttle()
+            response = super().request(method, url, *args, **kwargs)
+            if not retryable or response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return response
+
+            delay = self._retry_delay(response, attempt)
+            attempt += 1
+            logger.warning(f"ESI {response.status_code} on {url}, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            response.close()
+            time.sleep(delay)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_esi_session():
+    """The process-wide pooled ESI session."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = EsiSession()
+    return _session
+
+
+def fetch_all_pages(url, headers=None, params=None, session=None, max_workers=ESI_MAX_CONCURRENCY, timeout=20):
+    """
+    GET every page of a paged ESI endpoint and return the responses in page order.
+
+    Page 1 comes first for its X-Pages header, then the remaining pages are
+    fetched concurrently on the pooled session, so a refresh costs about two
+    round trips instead of one per page. A page that still fails after the
+    session's retries raises; callers never get a silently truncated book.
+    """
+    session = session or get_esi_session()
+    params = dict(params or {})
+
+    def get_page(page):
+        res = session.get(url, params={**params, "page": page}, headers=headers, timeout=timeout)
+        res.raise_for_status()
+        return res
+
+    first = get_page(1)
+    total_pages = int(first.headers.get("X-Pages", 1))
+    if total_pages <= 1:
+        return [first]
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, total_pages - 1))
+    try:
+        rest = list(pool.map(get_page, range(2, total_pages + 1)))
+    finally:
+        # On a failed page don't wait for the pages still queued behind it
+        pool.shutdown(cancel_futures=True)
+    return [first] + rest
@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("OPTIMIZER_WORKERS", 2))
+JOB_MAX_PENDING = int(os.getenv("OPTIMIZER_MAX_PENDING", 8))
+JOB_TTL = 15 * 60        # Seconds a finished job stays retrievable
+JOB_MAX_STORED = 100     # Finished jobs kept before the oldest are dropped
+
+TERMINAL_STATES = ("done", "failed")
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobManager:
+    """
+    Runs long jobs on a bounded thread pool and keeps their state for polling.
+
+    Each job moves queued -> running -> done/failed and records the phase it is
+    in. Finished jobs expire after `ttl` seconds or once more than `max_stored`
+    have piled up, so the store stays bounded however many jobs are submitted.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, ttl=JOB_TTL, max_stored=JOB_MAX_STORED):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_stored = max_stored
+        self._jobs = OrderedDict()
+        self._executor = None
+        self._changed = threading.Condition()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="optimize-job")
+        return self._executor
+
+    def _active_count(self):
+        return sum(1 for job in self._jobs.values() if job["status"] not in TERMINAL_STATES)
+
+    def _evict(self):
+        now = time.time()
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in TERMINAL_STATES
+        ]
+        for job_id in finished:
+            if now - self._jobs[job_id]["finished_at"] > self.ttl:
+                del self._jobs[job_id]
+        finished = [job_id for job_id in finished if job_id in self._jobs]
+        for job_id in finished[:max(0, len(finished) - self.max_stored)]:
+            del self._jobs[job_id]
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue fn(*args, progress=callback, **kwargs). fn returns (payload, status_code).
+        Raises JobQueueFull when max_pending jobs are already queued or running.
+        """
+        with self._changed:
+            self._evict()
+            if self._active_count() >= self.max_pending:
+                raise JobQueueFull(f"{self.max_pending} jobs already pending")
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "phase": None,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "status_code": None,
+                "error": None,
+                "version": 0,
+            }
+
+        self._get_executor().submit(self._run, job_id, fn, args, kwargs)
+        logger.info(f"Queued job {job_id}")
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["version"] += 1
+            self._changed.notify_all()
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._update(job_id, status="running", started_at=time.time())
+
+        def progress(phase):
+            self._update(job_id, phase=phase)
+
+        try:
+            result, status_code = fn(*args, progress=progress, **kwargs)
+            status = "done" if status_code < 400 else "failed"
+            self._update(job_id, status=status, result=result, status_code=status_code, finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Job {job_id} crashed: {e}")
+            logger.error(traceback.format_exc())
+            self._update(job_id, status="failed", error=str(e), status_code=500, finished_at=time.time())
+
+        logger.info(f"Job {job_id} finished")
+
+    def get(self, job_id):
+        """Copy of the job's state, or None if it is unknown or has expired."""
+        with self._changed:
+            self._evict()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait_for_change(self, job_id, version, timeout=15):
+        """Block until the job's version moves past `version` (or timeout), then return it."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id]["version"] != version,
+                timeout=timeout,
+            )
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+def job_summary(job):
+    """Public view of a job; the result is only included once it has finished."""
+    summary = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "phase": job["phase"],
+        "submitted_at": job["submitted_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] in TERMINAL_STATES:
+        summary["result"] = job["result"]
+        if job["error"]:
+            summary["error"] = job["error"]
+    return summary
+
+
+optimization_jobs = JobManager()
@@ -0,0 +1,103 @@
+import logging
+import secrets
+import threading
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, request
+from werkzeug.http import is_resource_modified
+
+from .catalog_state import catalog_version
+
+
+logger = logging.getLogger(__name__)
+
+# Versions restart from 0 with the process, so tag them with the run they came from
+BOOT_ID = secrets.token_hex(4)
+
+
+class ListingCache:
+    """Serialized list responses, one per endpoint, each valid for a single catalog version."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, version):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, name, version, body):
+        with self._lock:
+            # The version was read before the view ran, so the body is at least that new
+            self._entries[name] = (version, body)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "entries": {name: version for name, (version, _) in self._entries.items()},
+            }
+
+
+listing_cache = ListingCache()
+
+
+def catalog_etag(version):
+    return f"{BOOT_ID}-{version}"
+
+
+def conditional_listing(name):
+    """
+    Serve a catalog list endpoint with an ETag and Last-Modified taken from the catalog version.
+
+    A request whose If-None-Match (or, without one, If-Modified-Since) still matches gets a
+    304 before the view runs. Otherwise the view's JSON is reused until the next catalog change.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, changed_at = catalog_version()
+            etag = catalog_etag(version)
+            # HTTP dates are whole seconds, so two changes in one second share a date; the ETag,
+            # which browsers send alongside and which takes precedence, still tells them apart
+            last_modified = datetime.fromtimestamp(int(changed_at), tz=timezone.utc)
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                listing_cache.record_not_modified()
+                response = current_app.response_class(status=304)
+            else:
+                body = listing_cache.get(name, version)
+                if body is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response  # Errors are never cached or tagged
+                    body = response.get_data()
+                    listing_cache.put(name, version, body)
+                    logger.debug(f"Cached {name} listing for catalog version {version} ({len(body)} bytes)")
+                response = current_app.response_class(body, mimetype="application/json")
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True  # Always revalidate; the 304 is cheap
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,128 @@
+import logging
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from pulp import LpAffineExpression, LpConstraint, LpConstraintLE, LpMaximize, LpProblem, LpVariable
+
+from .utils import normalize_materials_structure
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProductionModel:
+    """
+    The /optimize production LP compiled into matrix form.
+
+    Items (materials and blueprint outputs) and blueprints get integer indices.
+    balance[i, j] is how much of item i one run of blueprint j nets out of stock
+    (consumed minus produced), so the model is
+
+        maximize    profit @ x
+        subject to  balance @ x <= inventory,  0 <= x <= upper,  x integer
+    """
+
+    def __init__(self, blueprints, inventory):
+        started = time.perf_counter()
+
+        self.blueprints = list(blueprints)
+        self.items = []
+        self.item_index = {}
+
+        def item_id(name):
+            idx = self.item_index.get(name)
+            if idx is None:
+                idx = len(self.items)
+                self.item_index[name] = idx
+                self.items.append(name)
+            return idx
+
+        n_bps = len(self.blueprints)
+        self.profit = np.zeros(n_bps)
+        self.upper = np.full(n_bps, np.inf)
+
+        rows, cols, data = [], [], []
+        for j, b in enumerate(self.blueprints):
+            amt_per_run = getattr(b, "amt_per_run", 1)
+            material_cost = b.full_material_cost if b.tier == 'T2' else b.material_cost
+            self.profit[j] = (b.sell_price - material_cost) / b.amt_per_run
+            if b.max is not None:
+                self.upper[j] = b.max
+
+            # Production: this blueprint produces itself
+            rows.append(item_id(b.name))
+            cols.append(j)
+            data.append(-amt_per_run)
+
+            # Consumption: this blueprint consumes its materials
+            normalized_mats = normalize_materials_structure(b.materials)
+            for section in normalized_mats.values():
+                for mat_name, qty_per_run in section.items():
+                    rows.append(item_id(mat_name))
+                    cols.append(j)
+                    data.append(qty_per_run)
+
+        for name in inventory:
+            item_id(name)
+
+        # Duplicate (item, blueprint) entries are summed by the COO -> CSR conversion
+        self.balance = csr_matrix((data, (rows, cols)), shape=(len(self.items), n_bps), dtype=float)
+        self.balance.sum_duplicates()
+        self.inventory = np.array([inventory.get(name, 0) for name in self.items], dtype=float)
+
+        self.problem = None
+        self.solution = None
+        self.status = None
+        self.objective = None
+        self.timings = {"build_ms": (time.perf_counter() - started) * 1000}
+
+    @property
+    def shape(self):
+        return self.balance.shape
+
+    def to_pulp(self):
+        """Emit the model as a PuLP problem in one pass over the CSR rows."""
+        started = time.perf_counter()
+
+        prob = LpProblem("MaxProfit", LpMaximize)
+        variables = [
+            LpVariable(f"x_{j}", lowBound=0, upBound=None if np.isinf(self.upper[j]) else self.upper[j], cat='Integer')
+            for j in range(len(self.blueprints))
+        ]
+
+        prob.setObjective(LpAffineExpression(zip(variables, self.profit.tolist())))
+
+        indptr, indices, coefs = self.balance.indptr, self.balance.indices, self.balance.data.tolist()
+        constraints = {}
+        for i in range(len(self.items)):
+            start, end = indptr[i], indptr[i + 1]
+            if start == end:
+                continue  # Inventory nobody uses, 0 <= stock always holds
+            expr = LpAffineExpression((variables[indices[k]], coefs[k]) for k in range(start, end))
+            name = f"balance_{i}"
+            constraints[name] = LpConstraint(expr, LpConstraintLE, name, self.inventory[i])
+        prob.extend(constraints)
+
+        self.problem = prob
+        self.timings["emit_ms"] = (time.perf_counter() - started) * 1000
+        return prob, variables
+
+    def write_lp(self, path):
+        """Dump the model in PuLP's text form for debugging."""
+        prob = self.problem or self.to_pulp()[0]
+        with open(path, "w") as f:
+            f.write(str(prob))
+
+    def runs_by_name(self):
+        """{blueprint name: solved integer runs} including zeros."""
+        if self.solution is None:
+            return {}
+        return {b.name: int(round(v)) for b, v in zip(self.blueprints, self.solution)}
+
+    def log_timings(self):
+        logger.info(
+            "LP %dx%d (%d nonzeros): %s",
+            self.shape[0], self.shape[1], self.balance.nnz,
+            ", ".join(f"{k}={v:.1f}" for k, v in self.timings.items())
+        )
@@ -0,0 +1,188 @@
+import logging
+import threading
+import time
+
+from .esi_client import fetch_all_pages
+from .price_cache import parse_expires, price_store
+from .utils import JITA_REGION_ID, JITA_STATION_ID, PRICE_CACHE_TTL, create_esi_session, get_lowest_jita_sell_price, get_station_sell_price
+
+
+logger = logging.getLogger(__name__)
+
+ESI_BASE_URL = "https://esi.evetech.net/latest"
+
+
+class MarketSnapshot:
+    """
+    Lowest sell price per type_id for one region, built from a single pass over
+    every page of the region's sell order book.
+
+    Prices at the hub station (Jita 4-4 by default) win; any other sell order in
+    the region is only used when the hub has none, which mirrors the fallback in
+    get_lowest_jita_sell_price.
+    """
+
+    def __init__(self, region_id=JITA_REGION_ID, station_id=JITA_STATION_ID, ttl=PRICE_CACHE_TTL):
+        self.region_id = region_id
+        self.station_id = station_id
+        self.ttl = ttl
+        self.station_lowest = {}
+        self.region_lowest = {}
+        self.fetched_at = 0.0
+        self.expires_at = 0.0
+        self.esi_expires_at = 0.0
+        self.pages = 0
+        self.orders = 0
+        self._lock = threading.Lock()
+
+    def is_fresh(self):
+        return self.fetched_at > 0 and time.time() < self.expires_at
+
+    def add_orders(self, orders, station_lowest=None, region_lowest=None):
+        """Fold one page of orders into the lowest-price indexes."""
+        station_lowest = self.station_lowest if station_lowest is None else station_lowest
+        region_lowest = self.region_lowest if region_lowest is None else region_lowest
+
+        for order in orders:
+            if order.get("is_buy_order"):
+                continue
+            type_id = order["type_id"]
+            price = order["price"]
+
+            current = region_lowest.get(type_id)
+            if current is None or price < current:
+                region_lowest[type_id] = price
+
+            if order.get("location_id") == self.station_id:
+                current = station_lowest.get(type_id)
+                if current is None or price < current:
+                    station_lowest[type_id] = price
+
+    def load_pages(self, pages, expires_at=None):
+        """Replace the snapshot with the given iterable of order pages."""
+        station_lowest = {}
+        region_lowest = {}
+        page_count = 0
+        order_count = 0
+
+        for page_orders in pages:
+            self.add_orders(page_orders, station_lowest, region_lowest)
+            page_count += 1
+            order_count += len(page_orders)
+
+        self.station_lowest = station_lowest
+        self.region_lowest = region_lowest
+        self.pages = page_count
+        self.orders = order_count
+        self.fetched_at = time.time()
+        self.expires_at = expires_at if expires_at is not None else self.fetched_at + self.ttl
+
+    def _iter_pages(self, headers, session, expiries):
+        url = f"{ESI_BASE_URL}/markets/{self.region_id}/orders/"
+        responses = fetch_all_pages(url, headers=headers, params={"order_type": "sell"}, session=session)
+
+        for res in responses:
+            expiries.append(parse_expires(res.headers.get("Expires"), self.ttl))
+            yield res.json()
+
+    def refresh(self, headers, session=None):
+        """Pull the whole region order book and rebuild the indexes."""
+        session = session or create_esi_session()
+        started = time.time()
+        expiries = []
+
+        self.load_pages(self._iter_pages(headers, session, expiries))
+        # ESI serves the same pages until the oldest one expires
+        self.esi_expires_at = min(expiries) if expiries else self.expires_at
+        self.persist()
+
+        logger.info(
+            f"Market snapshot for region {self.region_id}: {self.pages} pages, {self.orders} orders, "
+            f"{len(self.region_lowest)} types in {time.time() - started:.2f}s"
+        )
+
+    def ensure_fresh(self, headers, session=None, force=False):
+        """Refresh the snapshot if it has expired (or force). Concurrent callers share one refresh."""
+        if self.is_fresh() and not force:
+            return
+        started = time.time()
+        with self._lock:
+            # A caller that waited on the lock can use the refresh that just finished
+            if not self.is_fresh() or (force and self.fetched_at < started):
+                self.refresh(headers, session=session)
+
+    def persist(self, store=price_store):
+        """
+        Write the snapshot to the persistent price store: hub prices under the
+        station, region-only fallbacks under the region, each with its own marker.
+        """
+        store.put_many(self.station_id, self.station_lowest, "jita", expires_at=self.esi_expires_at, fetched_at=self.fetched_at)
+        store.put_many(self.region_id, self.region_lowest, "jita", expires_at=self.esi_expires_at, fetched_at=self.fetched_at)
+
+    def _restore_prices(self, store, location_id):
+        marker = store.fetched_marker(location_id, self.ttl)
+        if not marker:
+            return {}
+        return {
+            type_id: entry["price"]
+            for type_id, entry in store.entries_for(location_id).items()
+            if entry["source"] == "jita" and entry["price"] is not None
+            and entry["fetched_at"] >= marker["fetched_at"]
+        }
+
+    def restore(self, store=price_store):
+        """Rebuild the snapshot from the price store if the last refresh is still within the TTL."""
+        marker = store.fetched_marker(self.station_id, self.ttl)
+        if not marker:
+            return False
+
+        self.station_lowest = self._restore_prices(store, self.station_id)
+        self.region_lowest = self._restore_prices(store, self.region_id)
+        self.pages = 0
+        self.orders = 0
+        self.fetched_at = marker["fetched_at"]
+        self.expires_at = self.fetched_at + self.ttl
+        self.esi_expires_at = marker["expires_at"] or self.expires_at
+        logger.info(
+            f"Restored market snapshot with {len(self.station_lowest)} hub and "
+            f"{len(self.region_lowest)} region prices from the price cache"
+        )
+        return True
+
+    def get_price(self, type_id):
+        """Returns (price, source) like get_lowest_jita_sell_price."""
+        price = self.station_lowest.get(type_id)
+        if price is None:
+            price = self.region_lowest.get(type_id)
+        if price is None:
+            return None, "not_found"
+        return price, "jita"
+
+
+forge_snapshot = MarketSnapshot()
+
+
+def lookup_jita_price(type_id, headers):
+    """Answer from the region snapshot when it is fresh, otherwise fall back to a single-type ESI call."""
+    if forge_snapshot.is_fresh():
+        return forge_snapshot.get_price(type_id)
+    return get_lowest_jita_sell_price(type_id, headers)
+
+
+def lookup_jita_prices(type_ids, headers):
+    """Batch variant of lookup_jita_price returning {type_id: price or 0.0}."""
+    prices = {}
+    for tid in type_ids:
+        price, _ = lookup_jita_price(tid, headers)
+        prices[tid] = price if price is not None else 0.0
+    return prices
+
+
+def fetch_snapshot_price(type_id, station_id, headers):
+    """Drop-in for fetch_price that reads Jita prices from the region snapshot."""
+    if station_id:
+        price_data = get_station_sell_price(type_id, station_id, headers)
+        if price_data[0] is not None:
+            return type_id, price_data, False
+        return type_id, forge_snapshot.get_price(type_id), True
+    return type_id, forge_snapshot.get_price(type_id), False
@@ -6,13 +6,17 @@ from flask import jsonify, render_template, request
 import logging
 import traceback
 import re
+import time
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from flask import Blueprint
+from .catalog_state import catalog_changed
+from .listing_cache import conditional_listing
 from .utils import get_material_category_lookup, get_item_info, normalize_name
 from models import BlueprintT2, db, Material
 from flask import Blueprint
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -25,6 +29,48 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 materials_bp = Blueprint('materials', __name__,url_prefix='/api/materials')
+
+# Ids per DELETE ... WHERE id IN (...), well under SQLite's parameter limit
+DELETE_CHUNK = 500
+
+
+def upsert_materials(rows, replace=False):
+    """
+    Write inventory rows [{"name", "quantity", "type_id", "category"}] keyed on name.
+
+    One SELECT reads the existing names, one executemany runs
+    INSERT ... ON CONFLICT(name) DO UPDATE for every row, and with replace the
+    rows not listed are deleted. Doesn't commit. Returns inserted / updated /
+    deleted counts.
+    """
+    existing = dict(db.session.query(Material.name, Material.id).all())
+    names = {row["name"] for row in rows}
+    counts = {
+        "inserted": len(names - existing.keys()),
+        "updated": len(names & existing.keys()),
+        "deleted": 0,
+    }
+
+    if rows:
+        stmt = sqlite_insert(Material.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Material.__table__.c.name],
+            set_={
+                "quantity": stmt.excluded.quantity,
+                "type_id": stmt.excluded.type_id,
+                "category": stmt.excluded.category,
+            },
+        )
+        db.session.execute(stmt, rows)
+
+    if replace:
+        stale = [material_id for name, material_id in existing.items() if name not in names]
+        for i in range(0, len(stale), DELETE_CHUNK):
+            Material.query.filter(Material.id.in_(stale[i:i + DELETE_CHUNK])).delete(synchronize_session=False)
+        counts["deleted"] = len(stale)
+
+    return counts
+
 @materials_bp.route('/material/<int:id>', methods=['PUT'])
 def update_material(id):
     try:
@@ -36,6 +82,7 @@ def update_material(id):
         material.category = data.get('category', material.category or "Other")
 
         db.session.commit()
+        catalog_changed("materials")
         logger.info("Material updated successfully")
         return jsonify({"message": "Material updated successfully"}), 200
 
@@ -51,6 +98,7 @@ def delete_material(id):
         material = Material.query.get_or_404(id)
         db.session.delete(material)
         db.session.commit()
+        catalog_changed("materials")
         logger.info("Material deleted successfully")
         return jsonify({"message": "Material deleted successfully"}), 200
     except Exception as e:
@@ -65,21 +113,24 @@ def add_material():
     try:
         data = request.form
         logger.info(f"Received material data: {data}")
-        
-        material = Material.query.filter_by(name=data['name']).first()
-        if material:
-            logger.info(f"Updating existing material: {data['name']}")
-            material.quantity = data['quantity']
-            material.type_id = data.get('type_id') or get_item_info(data['name'])['type_id']
-            material.category = data.get('category') or get_item_info(data['name'])['category']
-        else:
-            logger.info(f"Adding new material: {data['name']}")
-            new_material = Material(name=data['name'], quantity=data['quantity'], type_id=data.get('type_id'), category=data.get('category') or get_item_info(data['name'])['category'])
-            db.session.add(new_material)
-        
+
+        try:
+            quantity = int(data['quantity'])
+        except (TypeError, ValueError):
+            return jsonify({"error": "quantity must be an integer"}), 400
+
+        sde_info = get_item_info([data['name']])[normalize_name(data['name'])]
+        counts = upsert_materials([{
+            "name": data['name'],
+            "quantity": quantity,
+            "type_id": data.get('type_id') or sde_info['type_id'],
+            "category": data.get('category') or sde_info['category'],
+        }])
+
         db.session.commit()
-        logger.info("Material added/updated successfully")
-        return jsonify({"message": "Material updated successfully"}), 200
+        catalog_changed("materials")
+        logger.info(f"Material {data['name']} {'added' if counts['inserted'] else 'updated'} successfully")
+        return jsonify({"message": "Material updated successfully", **counts}), 200
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error adding/updating material: {str(e)}")
@@ -104,6 +155,7 @@ def get_material(id):
 
     
 @materials_bp.route('/materials', methods=['GET'])
+@conditional_listing("materials")
 def get_materials():
     try:
         materials = Material.query.all()
@@ -134,41 +186,35 @@ def get_materials():
 @materials_bp.route('/update_materials', methods=['POST'])
 def update_materials():
     try:
+        started = time.perf_counter()
         data = request.json
         materials = data.get('materials', {})
         update_type = data.get('updateType', 'replace')
 
-        logger.info(f"Received materials data: {materials}")
-        logger.info(f"Update type: {update_type}")
-
-        all_names = list(materials.keys())
-        material_info = get_item_info(all_names)  # Dict[str, {"type_id": ..., "category": ...}]
-
-        if update_type == 'replace':
-            Material.query.delete()
-            db.session.commit()
-            logger.info("All existing materials have been deleted.")
+        logger.info(f"Received {len(materials)} materials, update type: {update_type}")
 
+        material_info = get_item_info(list(materials.keys()))  # Dict[str, {"type_id": ..., "category": ...}]
+        rows = []
         for name, quantity in materials.items():
-            info = material_info.get(name, {})
-            type_id = info.get("type_id", 0)
-            category = info.get("category", "Other")
-
-            existing_material = Material.query.filter_by(name=name).first()
-
-            if update_type == 'add' and existing_material:
-                logger.info(f"Updating material: {name} -> Qty: {quantity}, Cat: {category}, ID: {type_id}")
-                existing_material.quantity = quantity
-                existing_material.category = category
-                existing_material.type_id = type_id
-            else:
-                logger.info(f"Adding new material: {name} -> Qty: {quantity}, Cat: {category}, ID: {type_id}")
-                new_material = Material(name=name, quantity=quantity, category=category, type_id=type_id)
-                db.session.add(new_material)
+            info = material_info.get(normalize_name(name), {})
+            rows.append({
+                "name": name,
+                "quantity": quantity,
+                "type_id": info.get("type_id", 0),
+                "category": info.get("category", "Other"),
+            })
 
+        # Replace drops whatever the paste doesn't list; both modes upsert the rest in the same transaction
+        counts = upsert_materials(rows, replace=update_type == 'replace')
         db.session.commit()
-        logger.info("Materials updated successfully.")
-        return jsonify({"message": "Materials updated successfully"}), 200
+        catalog_changed("materials")
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(
+            f"Materials updated: {counts['inserted']} inserted, {counts['updated']} updated, "
+            f"{counts['deleted']} deleted in {elapsed_ms} ms"
+        )
+        return jsonify({"message": "Materials updated successfully", **counts, "elapsed_ms": elapsed_ms}), 200
 
     except Exception as e:
         db.session.rollback()
@@ -181,15 +227,17 @@ def update_materials():
 def update_material_info():
     try:
         materials = Material.query.all()
-        
+        sde_info = get_item_info([material.name for material in materials])
+
         for material in materials:
-            material_info = get_item_info([material.name])[material.name]
+            material_info = sde_info[normalize_name(material.name)]
             material.type_id = material_info['type_id']
             material.category = material_info['category']
             logger.info(f"Updated material '{material.name}' (type_id: {material.type_id}, category: {material.category})")
 
         
         db.session.commit()
+        catalog_changed("materials")
         logger.info("Material info updated successfully")
         return jsonify({"message": "Material info updated successfully"}), 200
     except Exception as e:
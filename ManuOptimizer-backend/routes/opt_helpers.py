@@ -1,6 +1,8 @@
 import logging
 from collections import defaultdict, deque
 from models import Blueprint as BlueprintModel, Material
+from .bom_graph import BomGraph
+from .cost_memo import cost_memo, version_stamp
 
 
 
@@ -8,11 +10,21 @@ logger = logging.getLogger(__name__)
 
 
 class ProductionOptimizer:
-    def __init__(self, blueprints, materials, inventory):
+    def __init__(self, blueprints, materials, inventory, memo=cost_memo):
         self.blueprints = {bp.name: bp for bp in blueprints}
         self.materials = {m.name: m for m in materials}
         self.inventory = inventory.copy()
         self.initial_inventory = inventory.copy()
+        self.normalized = {name: bp.get_normalized_materials() for name, bp in self.blueprints.items()}
+
+        # Costs are memoized against the prices, starting inventory and catalog they were computed from;
+        # the inventory version moves on every executed production step
+        self.memo = memo
+        self.price_stamp = version_stamp(
+            {m.name: m.sell_price for m in materials}, self.initial_inventory, dict.fromkeys(self.blueprints)
+        )
+        self.inventory_version = 0
+        self._graph = None
         
         # Build dependency graph
         self.dependencies = self._build_dependency_graph()
@@ -23,7 +35,7 @@ class ProductionOptimizer:
         deps = {}
         for bp_name, bp in self.blueprints.items():
             deps[bp_name] = []
-            materials = bp.get_normalized_materials()
+            materials = self.normalized[bp_name]
             
             # Materials are structured as: {"Category": {"MaterialName": {"quantity": X}}}
             for category, category_materials in materials.items():
@@ -62,13 +74,25 @@ class ProductionOptimizer:
         
         return result
     
+    def _memo_key(self, blueprint_name):
+        bp = self.blueprints[blueprint_name]
+        return bp.id if bp.id is not None else blueprint_name
+
+    def _memoized(self, kind, blueprint_name, compute):
+        return self.memo.get_or_compute(
+            kind, self._memo_key(blueprint_name), (self.price_stamp, self.inventory_version), compute
+        )
+
     def _calculate_profit_per_unit(self, blueprint_name):
         """Calculate profit per unit for a blueprint"""
+        return self._memoized("profit_per_unit", blueprint_name, lambda: self._compute_profit_per_unit(blueprint_name))
+
+    def _compute_profit_per_unit(self, blueprint_name):
         bp = self.blueprints[blueprint_name]
         
         # Calculate actual production cost based on current inventory/market
         production_cost = 0
-        materials = bp.get_normalized_materials()
+        materials = self.normalized[blueprint_name]
         
         # Materials are structured as: {"Category": {"MaterialName": {"quantity": X}}}
         for category, category_materials in materials.items():
@@ -100,10 +124,17 @@ class ProductionOptimizer:
             return 0
         
         bp = self.blueprints[item_name]
+        batch_cost = self._memoized("batch_cost", item_name, lambda: self._compute_batch_cost(item_name))
+
+        # Calculate how many batches needed
+        batches_needed = (quantity_needed + bp.amt_per_run - 1) // bp.amt_per_run  # Ceiling division
         
-        # Calculate cost to produce one batch
+        return batch_cost * batches_needed
+
+    def _compute_batch_cost(self, item_name):
+        """Cost to produce one batch of an item, using free inventory first"""
         batch_cost = 0
-        materials = bp.get_normalized_materials()
+        materials = self.normalized[item_name]
         
         # Materials are structured as: {"Category": {"MaterialName": {"quantity": X}}}
         for category, category_materials in materials.items():
@@ -130,18 +161,23 @@ class ProductionOptimizer:
                             cost = needed_after_inventory * material_obj.sell_price
                         
                         batch_cost += cost
-        
-        # Calculate how many batches needed
-        batches_needed = (quantity_needed + bp.amt_per_run - 1) // bp.amt_per_run  # Ceiling division
-        
-        return batch_cost * batches_needed
+
+        return batch_cost
+
+    def base_materials_per_unit(self, blueprint_name):
+        """{base material: quantity} one unit of the blueprint's output explodes to, memoized."""
+        def compute():
+            if self._graph is None:
+                self._graph = BomGraph(self.blueprints.values())
+            return self._graph.explode({blueprint_name: 1})
+        return self._memoized("base_materials", blueprint_name, compute)
     
     def _calculate_max_producible(self, blueprint_name):
         """Calculate maximum quantity we can produce given constraints"""
         bp = self.blueprints[blueprint_name]
         max_runs = float('inf')
         
-        materials = bp.get_normalized_materials()
+        materials = self.normalized[blueprint_name]
         
         # Materials are structured as: {"Category": {"MaterialName": {"quantity": X}}}
         for category, category_materials in materials.items():
@@ -272,11 +308,12 @@ class ProductionOptimizer:
         """Execute production and update tracking"""
         bp = self.blueprints[blueprint_name]
         production_plan[blueprint_name] = quantity
+        self.inventory_version += 1
         
         # Calculate runs needed
         runs_needed = (quantity + bp.amt_per_run - 1) // bp.amt_per_run
         
-        materials = bp.get_normalized_materials()
+        materials = self.normalized[blueprint_name]
         
         for material in materials:
             material_name = material.get('name')
@@ -320,7 +357,7 @@ class ProductionOptimizer:
         runs_needed = (quantity + bp.amt_per_run - 1) // bp.amt_per_run
         
         total_cost = 0
-        materials = bp.get_normalized_materials()
+        materials = self.normalized[blueprint_name]
         
         for material in materials:
             # Handle both string and dict formats
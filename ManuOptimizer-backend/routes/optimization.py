@@ -0,0 +1,404 @@
+import logging
+import os
+import time
+import traceback
+from collections import defaultdict
+
+from models import Material
+from .bom_graph import BomGraph
+from .catalog_queries import catalog_blueprints
+from .lp_model import ProductionModel
+from .market import forge_snapshot, lookup_jita_price
+from .price_refresher import price_refresher
+from .result_cache import optimization_cache, optimization_key
+from .solvers import DEFAULT_SOLVER, solve
+from .utils import accumulate_materials, expand_materials, normalize_materials_structure
+
+
+logger = logging.getLogger(__name__)
+
+# Progress phases reported by run_optimization, in order
+OPTIMIZATION_PHASES = ("model_build", "solve", "dependency_resolution", "invention_costing")
+
+
+def run_optimization(solver_name=DEFAULT_SOLVER, progress=None):
+    """
+    Solve the production plan for the current catalog and inventory.
+
+    Returns (payload, status_code). `progress`, if given, is called with each
+    phase name from OPTIMIZATION_PHASES as the run reaches it. Needs an app context.
+    """
+    def report(phase):
+        if progress:
+            progress(phase)
+
+    try:
+        blueprints = catalog_blueprints()
+        material_objs = {m.name: m for m in Material.query.all()}
+        inventory = {name: m.quantity for name, m in material_objs.items()}
+        untouched_inventory = {name: m.quantity for name, m in material_objs.items()}
+        
+        if not blueprints or not inventory:
+            return {"status": "No optimal solution found"}, 400
+
+        # Same catalog, inventory, prices and solver -> same plan
+        cache_key = optimization_key(
+            blueprints, material_objs.values(), solver=solver_name, market_snapshot=forge_snapshot.fetched_at
+        )
+        cached = optimization_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Returning cached optimization result %s", cache_key[:12])
+            price_refresher.record_plan(cached)
+            return {**cached, "cached": True}, 200
+
+        logger.info("Materials loaded: %s", inventory)
+
+        # Compile the blueprints into a sparse balance matrix for the solver backend
+        report("model_build")
+        model = ProductionModel(blueprints, inventory)
+        profit_per_bp = {b.name: model.profit[j] for j, b in enumerate(model.blueprints)}
+
+        logger.info("Solving optimization problem with %s...", solver_name)
+        report("solve")
+        solve(model, solver_name)
+        model.log_timings()
+
+        if model.status != 'Optimal':
+            logger.info("Optimization status: %s", model.status)
+            # Save the LP file for debugging non-optimal solutions
+            model.write_lp("lp_debug_output.lp")
+            return {"status": f"No optimal solution found: {model.status}"}, 400
+
+        if os.getenv("WRITE_LP_OUTPUT"):
+            # Save the LP file for inspection of the successful run
+            model.write_lp("lp_output.lp")
+
+        solved_runs = model.runs_by_name()
+
+        # Optimization results - only include items we are actually producing
+        what_to_produce = {name: runs for name, runs in solved_runs.items() if runs > 0}
+
+        logger.info("Optimal production: %s", what_to_produce)
+        logger.info("Objective value: %s", model.objective)
+        resolve_started = time.perf_counter()
+        report("dependency_resolution")
+        graph = BomGraph(blueprints)
+
+        # === Dependency resolution with inventory awareness ===
+
+        # Step 1: Build intermediate dependencies first (inventory-aware)
+        total_needed = defaultdict(int)  # Materials (minerals/components/etc.)
+        item_needs = defaultdict(int)    # Items to build (intermediates)
+        used_from_inv_total = defaultdict(int)
+        final_produced = defaultdict(int)
+        produced = defaultdict(int)
+        remaining_inventory = inventory.copy()
+
+        # Set to track processed blueprints
+        processed_blueprints = set()
+
+        # === Pass 1: Expand dependencies BEFORE handling top-level "what_to_produce" ===
+        for b in blueprints:
+            count = what_to_produce.get(b.name, 0)
+            if count > 0:
+                produced[b.name] += count
+
+        logger.info("Initial production plan: %s", produced)  # Log produced quantities
+
+        # === Dependency resolution phase ===
+        # Accumulate all materials and intermediate item needs from the initial production plan
+        for b in blueprints:
+            count = produced.get(b.name, 0)
+            if count > 0 and b.name not in processed_blueprints:
+                accumulate_materials(b, count, total_needed, item_needs, graph)
+                processed_blueprints.add(b.name)  # Mark this blueprint as processed
+
+        # Now subtract inventory from intermediate items first
+        to_build = defaultdict(int)
+        for name, qty_needed in item_needs.items():
+            inv_qty = remaining_inventory.get(name, 0)
+            used = min(inv_qty, qty_needed)
+            if used > 0:
+                used_from_inv_total[name] = used
+                remaining_inventory[name] -= used
+            if qty_needed > used:
+                to_build[name] = qty_needed - used
+
+        # Recursively build what's still missing
+        while to_build:
+            new_item_needs = defaultdict(int)
+            for item_name, qty_to_build in to_build.items():
+                bp = graph.get(item_name)
+                if not bp:
+                    logger.warning("No blueprint found for intermediate item: %s", item_name)
+                    continue
+                produced[item_name] += qty_to_build
+                accumulate_materials(bp, qty_to_build, total_needed, new_item_needs, graph)
+
+            # Subtract inventory from the new layer of dependencies
+            to_build = defaultdict(int)
+            for name, needed_qty in new_item_needs.items():
+                inv_qty = remaining_inventory.get(name, 0)
+                used = min(inv_qty, needed_qty)
+                if used > 0:
+                    used_from_inv_total[name] += used
+                    remaining_inventory[name] -= used
+                if needed_qty > used:
+                    to_build[name] = needed_qty - used
+
+        # === Now build the top-level "what_to_produce" goals ===
+        for b in blueprints:
+            count = what_to_produce.get(b.name, 0)
+            if count > 0:
+                # Only accumulate materials if the blueprint has not been processed
+                if b.name not in processed_blueprints:
+                    final_produced[b.name] += count
+                    accumulate_materials(b, count, total_needed, item_needs, graph)
+                    processed_blueprints.add(b.name)  # Mark this blueprint as processed
+                else:
+                    # If already processed, just add to final_produced
+                    final_produced[b.name] += count
+
+        logger.info("Initial Final produced items: %s", final_produced)  # Log final produced quantities
+
+       
+
+
+        # Satisfy needs from inventory first (for materials, not intermediates)
+        inventory_cost_savings = 0.0
+        inventory_items_used = {}
+
+        # Create a copy of final_produced to preserve original numbers
+        original_final_produced = dict(final_produced)
+        adjusted_final_produced = {}
+
+        for item_name, qty_needed in final_produced.items():
+            adjusted_final_produced[item_name] = qty_needed  # Start with original required amount
+
+            if qty_needed > 0:
+                mat_obj = material_objs.get(item_name)
+
+                if mat_obj:
+                    if mat_obj.sell_price is not None:  # Check if sell_price is not None
+                        cost_per_unit = mat_obj.sell_price
+                        inv_qty = remaining_inventory.get(item_name, 0)
+                        if inv_qty > 0:
+                            used_from_inv = min(inv_qty, qty_needed)
+                            saved = used_from_inv * cost_per_unit
+                            inventory_cost_savings += saved
+                            logger.info("INVENTORY: Using %d x %s (intermediate), cost savings: %.2f", 
+                                    used_from_inv, item_name, saved)
+
+                            remaining_inventory[item_name] -= used_from_inv
+                            category = getattr(mat_obj, "category", "Other")
+
+                            inventory_items_used[item_name] = {
+                                "amount": used_from_inv,
+                                "category": category,
+                                "original_required": qty_needed,  # Track original requirement
+                                "remaining_requirement": qty_needed - used_from_inv  # Track what's left to produce
+                            }
+
+                            # Reduce the production requirement
+                            adjusted_final_produced[item_name] -= used_from_inv
+                        else:
+                            logger.info("INVENTORY: No inventory available for %s", item_name)
+                    else:
+                        logger.warning("Sell price is None for material: %s", item_name)
+                else:
+                    logger.warning("No material found for item: %s", item_name)
+
+        logger.info("Original production requirements: %s", original_final_produced)
+        logger.info("Consumed from inventory directly to production: %s", inventory_items_used)
+        logger.info("Actual production needed after inventory: %s", 
+                   {k: v for k, v in adjusted_final_produced.items() if v > 0})
+
+
+        
+        # Remaining dependencies after accounting for inventory
+        deps = defaultdict(float)
+        for b in blueprints:
+            net_production = final_produced.get(b.name, 0)
+            if net_production > 0:
+                expand_materials(b, graph, quantity=net_production, t1_dependencies=deps, inventory=remaining_inventory)
+        for name, inv_qty in untouched_inventory.items():
+            if name in deps:
+                used = min(inv_qty, deps[name])
+                deps[name] -= used
+                if deps[name] <= 0:
+                    del deps[name]
+
+        # Remove dependencies that are already in the final production
+        for item_name, qty_needed in list(adjusted_final_produced.items()):
+            if item_name in deps:
+                del adjusted_final_produced[item_name]
+
+        extra_produced_t2 = defaultdict(int)
+
+        # Build T1->T2 lookup (could cache this elsewhere)
+        t1_to_t2_bp = {}
+        for bp in blueprints:
+            if bp.tier == "T2":
+                t1_name = bp.name[:-2] + "I" if bp.name.endswith("II") else None
+                if t1_name:
+                    t1_to_t2_bp[t1_name] = bp
+
+        for t1_name, t1_count in list(adjusted_final_produced.items()):  # list() in case we modify produced
+            t2_bp = t1_to_t2_bp.get(t1_name)
+            if not t2_bp or t1_count == 0:
+                continue
+            
+            
+            if profit_per_bp[t2_bp.name] <= 0:
+                continue  # Skip unprofitable T2 blueprints
+            
+            
+            t2_mats = normalize_materials_structure(t2_bp.materials)
+            min_craftable = t1_count
+
+            for section_name, section in t2_mats.items():
+                if section_name == "Invention Materials":
+                    continue
+                for mat, amt_per_run in section.items():
+                    # If the T2 blueprint consumes its T1 version, limit by produced and/or inventory
+                    available = adjusted_final_produced.get(mat, 0) + remaining_inventory.get(mat, 0)
+                    possible = available // amt_per_run if amt_per_run else float('inf')
+                    min_craftable = min(min_craftable, possible)
+
+            if min_craftable > 0:
+                extra_produced_t2[t2_bp.name] += min_craftable
+                for section_name, section in t2_mats.items():
+                    if section_name == "Invention Materials":
+                        continue
+                    for mat, amt_per_run in section.items():
+                        total_needed = min_craftable * amt_per_run
+                        use_from_produced = min(adjusted_final_produced.get(mat, 0), total_needed)
+                        if use_from_produced:
+                            final_produced[mat] -= use_from_produced
+                        use_from_inventory = total_needed - use_from_produced
+                        if use_from_inventory > 0:
+                            remaining_inventory[mat] -= use_from_inventory
+                # Update adjusted, deps, and what to produce to make sure they look right after optimize
+                adjusted_final_produced[t1_name] -= min_craftable
+                deps[t1_name] = deps.get(t1_name, 0) + min_craftable
+                what_to_produce[t2_bp.name] = what_to_produce.get(t2_bp.name, 0) + min_craftable
+
+        # Add this to your output
+        for t2_name, qty in extra_produced_t2.items():
+            adjusted_final_produced[t2_name] = adjusted_final_produced.get(t2_name, 0) + qty  # or wherever you report output
+
+        logger.info("Extra T2s made from leftovers: %s", dict(extra_produced_t2))\
+
+        # Calculate expected invention materials used and expected cost
+        report("invention_costing")
+        expected_invention_materials_used = defaultdict(float)
+        invention_cost = 0.0 
+        for b in blueprints:
+            produced_qty = solved_runs.get(b.name, 0)  # Get the solved quantity for this blueprint
+            if produced_qty > 0:
+                normalized_mats = normalize_materials_structure(b.materials) if isinstance(b.materials, list) else b.materials
+                runs_per_copy = getattr(b, "runs_per_copy", 1) or 1
+                for section_name, section in normalized_mats.items():
+                    if section_name == "Invention Materials":
+                        for mat_name, qty_per_run in section.items():
+                            # Calculate attempts needed (handle potential division by zero if invention_chance is 0 or None)
+                            attempts_needed = 1.0  # Default to 1 if no invention chance (e.g., for T1 BPCs)
+                            if hasattr(b, "invention_chance") and b.invention_chance is not None and b.invention_chance > 0:
+                                attempts_needed = 1 / b.invention_chance
+                            # Update expected invention materials used
+                            expected_invention_materials_used[mat_name] += (qty_per_run * attempts_needed * produced_qty) / runs_per_copy
+                            # Calculate expected cost for datacores
+                            mat_obj = material_objs.get(mat_name)
+                            if mat_obj and hasattr(mat_obj, 'sell_price') and mat_obj.sell_price is not None:
+                                invention_cost += mat_obj.sell_price * (qty_per_run * attempts_needed * produced_qty) / runs_per_copy
+                            elif mat_obj.sell_price is None:
+                                headers = {
+                                    'User-Agent': 'ManuOptimizer 1.0 nariod14@gmail.com'
+                                }
+                                mat_obj.sell_price = lookup_jita_price(mat_obj.type_id, headers=headers)[0]
+                                invention_cost += mat_obj.sell_price * (qty_per_run * attempts_needed * produced_qty) / runs_per_copy
+        report_invention_materials = {
+            mat_name: round(qty)  # round for display
+            for mat_name, qty in expected_invention_materials_used.items()
+            if qty > 0
+        }
+        
+        logger.debug("Expected invention materials used: %s", report_invention_materials)
+                
+
+        # Calculate final material usage (non-recursive)
+        final_usage = defaultdict(float)
+
+        # Accumulate materials for the total production goal
+        for name, count in original_final_produced.items():
+            if count > 0:
+                bp = graph.get(name)
+                if bp:
+                    accumulate_materials(bp, count, final_usage, {}, graph)
+
+        final_material_usage = {}
+        all_materials = set(final_usage) | set(used_from_inv_total)
+        for mat in all_materials:
+            obj = material_objs.get(mat)
+            starting_qty = getattr(obj, "quantity", inventory.get(mat, 0))
+            category = getattr(obj, "category", "Other") if obj else "Other"
+
+            used_int = int(round(final_usage.get(mat, 0)))
+            final_material_usage[mat] = {
+                "used": used_int,
+                "remaining": starting_qty - used_int,
+                "category": category
+            }
+
+
+        
+        # Calculate profits
+        total_sell = sum(bp.sell_price * what_to_produce.get(bp.name, 0) for bp in blueprints)
+        # Calculate true profit considering material costs
+        true_jita = 0.0
+        for bp in blueprints:
+            produced_qty = final_produced.get(bp.name, 0)
+            if produced_qty > 0:
+                # Calculate the total material cost for the produced quantity
+                material_cost = (bp.full_material_cost if bp.tier == 'T2' else bp.material_cost)
+                total_material_cost = material_cost * produced_qty
+
+                # Log the values for debugging
+                logger.info("Blueprint: %s, Produced: %d, Sell Price: %f, Material Cost: %f, Total Material Cost: %f",
+                            bp.name, produced_qty, bp.sell_price, material_cost, total_material_cost)
+
+                # Subtract the total material cost from the total sell price
+                true_jita += (bp.sell_price * produced_qty) - total_material_cost
+        logger.info("True Jita Profit: %f", true_jita)
+
+        model.timings["resolve_ms"] = (time.perf_counter() - resolve_started) * 1000
+
+        result = {
+            "status": "Optimal",
+            
+            "total_profit": total_sell,
+            "true_profit_jita": true_jita,
+            "true_profit_inventory": true_jita + inventory_cost_savings,
+            "inventory_cost_savings": inventory_cost_savings,
+            "what_to_produce": what_to_produce,
+            "original_production_plan": original_final_produced,
+            "adjusted_production_plan": {k: v for k, v in adjusted_final_produced.items() if v > 0},
+            "material_usage": final_material_usage,
+            "dependencies_needed": {k: int(v) for k, v in deps.items() if v > 0},
+            "inventory_savings": inventory_items_used,
+            "expected_invention_materials_used": report_invention_materials,
+            "invention_cost": invention_cost,
+            "timings": {k: round(v, 2) for k, v in model.timings.items()}
+        }
+
+        logger.info("Optimization complete. Final result: %s", result)
+        optimization_cache.put(cache_key, result)
+        # Items in the plan move to the hot refresh tier
+        price_refresher.record_plan(result)
+        return {**result, "cached": False}, 200
+
+    except Exception as e:
+        logger.error("Error: %s", str(e))
+        logger.error(traceback.format_exc())
+        return {"error": "An error occurred during optimization"}, 500
+
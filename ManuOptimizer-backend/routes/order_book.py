@@ -0,0 +1,56 @@
+import time
+
+
+class OrderBookIndex:
+    """
+    Sell side of one market (a structure or station), indexed by type_id.
+
+    Built once per fetch: `lowest` answers the cheapest ask in O(1) and
+    `asks` keeps every ask for a type sorted by price for depth queries.
+    """
+
+    def __init__(self, orders, fetched_at=None):
+        self.fetched_at = fetched_at or time.time()
+        self.lowest = {}
+        self.asks = {}
+        self.order_count = 0
+
+        for order in orders:
+            self.order_count += 1
+            if order.get("is_buy_order"):
+                continue
+            type_id = order["type_id"]
+            price = order["price"]
+            self.asks.setdefault(type_id, []).append((price, order.get("volume_remain", 0)))
+
+            current = self.lowest.get(type_id)
+            if current is None or price < current:
+                self.lowest[type_id] = price
+
+        for ladder in self.asks.values():
+            ladder.sort()
+
+    def __len__(self):
+        return self.order_count
+
+    def lowest_price(self, type_id):
+        return self.lowest.get(type_id)
+
+    def ladder(self, type_id):
+        """[(price, volume_remain), ...] cheapest first."""
+        return self.asks.get(type_id, [])
+
+    def cost_to_buy(self, type_id, quantity):
+        """
+        Walk the ask ladder for `quantity` units. Returns (filled, total_cost),
+        where filled < quantity when the market runs out.
+        """
+        filled = 0
+        total_cost = 0.0
+        for price, volume in self.ladder(type_id):
+            take = min(volume, quantity - filled)
+            filled += take
+            total_cost += take * price
+            if filled >= quantity:
+                break
+        return filled, total_cost
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import PriceCache, db
+
+
+logger = logging.getLogger(__name__)
+
+# type_id used for the "this location was fetched at ..." marker row
+FETCH_MARKER_TYPE_ID = 0
+
+PRICE_FIELDS = ("price", "source", "etag", "expires_at", "fetched_at")
+
+
+def parse_expires(header_value, default_ttl):
+    """Turn an ESI Expires header into an epoch timestamp, falling back to now + default_ttl."""
+    if header_value:
+        try:
+            return parsedate_to_datetime(header_value).timestamp()
+        except (TypeError, ValueError):
+            logger.debug(f"Unparseable Expires header: {header_value}")
+    return time.time() + default_ttl
+
+
+class PriceStore:
+    """
+    Write-behind price cache keyed by (type_id, location_id).
+
+    Lookups are served from memory. The price_cache table is read once on startup
+    and dirty entries are written back in one batch by flush(), so a restarted
+    server still knows every price (and its ETag) it fetched within the TTL.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the persisted cache. Needs an app context."""
+        rows = db.session.execute(db.select(PriceCache)).scalars().all()
+        with self._lock:
+            for row in rows:
+                self._entries[(row.type_id, row.location_id)] = {
+                    field: getattr(row, field) for field in PRICE_FIELDS
+                }
+        logger.info(f"Loaded {len(rows)} cached prices")
+
+    def get(self, type_id, location_id):
+        return self._entries.get((type_id, location_id))
+
+    def get_fresh(self, type_id, location_id, ttl):
+        """Entry fetched less than ttl seconds ago, or None."""
+        entry = self._entries.get((type_id, location_id))
+        if entry and time.time() - entry["fetched_at"] < ttl:
+            return entry
+        return None
+
+    def entries_for(self, location_id):
+        """{type_id: entry} for every priced type at a location (marker row excluded)."""
+        return {
+            type_id: entry
+            for (type_id, loc), entry in list(self._entries.items())
+            if loc == location_id and type_id != FETCH_MARKER_TYPE_ID
+        }
+
+    def put(self, type_id, location_id, price, source, etag=None, expires_at=None, fetched_at=None):
+        entry = {
+            "price": price,
+            "source": source,
+            "etag": etag,
+            "expires_at": expires_at,
+            "fetched_at": fetched_at or time.time(),
+        }
+        with self._lock:
+            self._entries[(type_id, location_id)] = entry
+            self._dirty.add((type_id, location_id))
+        return entry
+
+    def put_many(self, location_id, prices, source, expires_at=None, fetched_at=None):
+        """
+        Store {type_id: price} for one location, plus a marker recording when it
+        was fetched. A bulk fetch has no per-type ETag of its own: a type keeps
+        the one it has only while the price still matches, since a 304 on that
+        ETag hands the stored price back as confirmed.
+        """
+        fetched_at = fetched_at or time.time()
+        with self._lock:
+            for type_id, price in prices.items():
+                previous = self._entries.get((type_id, location_id))
+                self._entries[(type_id, location_id)] = {
+                    "price": price,
+                    "source": source,
+                    "etag": previous["etag"] if previous and previous["price"] == price else None,
+                    "expires_at": expires_at,
+                    "fetched_at": fetched_at,
+                }
+                self._dirty.add((type_id, location_id))
+        self.mark_fetched(location_id, expires_at=expires_at, fetched_at=fetched_at)
+
+    def mark_fetched(self, location_id, expires_at=None, fetched_at=None):
+        self.put(FETCH_MARKER_TYPE_ID, location_id, None, "marker", expires_at=expires_at, fetched_at=fetched_at)
+
+    def fetched_marker(self, location_id, ttl):
+        return self.get_fresh(FETCH_MARKER_TYPE_ID, location_id, ttl)
+
+    def touch(self, type_id, location_id, expires_at=None):
+        """Mark an entry as revalidated (ESI answered 304 Not Modified)."""
+        with self._lock:
+            entry = self._entries.get((type_id, location_id))
+            if not entry:
+                return None
+            entry["fetched_at"] = time.time()
+            entry["expires_at"] = expires_at
+            self._dirty.add((type_id, location_id))
+            return entry
+
+    def flush(self):
+        """Upsert every dirty entry in one executemany. Needs an app context."""
+        with self._lock:
+            keys = list(self._dirty)
+            self._dirty.clear()
+            rows = [
+                {"type_id": type_id, "location_id": location_id, **self._entries[(type_id, location_id)]}
+                for type_id, location_id in keys
+            ]
+
+        if not rows:
+            return 0
+
+        stmt = sqlite_insert(PriceCache.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["type_id", "location_id"],
+            set_={field: stmt.excluded[field] for field in PRICE_FIELDS},
+        )
+        try:
+            db.session.execute(stmt, rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                self._dirty.update(keys)
+            raise
+
+        logger.debug(f"Flushed {len(rows)} cached prices")
+        return len(rows)
+
+
+price_store = PriceStore()
@@ -0,0 +1,71 @@
+import threading
+from collections import defaultdict
+
+from .catalog_state import on_catalog_change
+
+
+def blueprints_by_type_id(material_rows, name_to_type_id):
+    """Reverse BOM index over blueprint_material rows: type_id -> ids of the blueprints that list it."""
+    consumers = defaultdict(set)
+    for row in material_rows:
+        type_id = name_to_type_id.get(row.material_name)
+        if type_id is not None:
+            consumers[type_id].add(row.blueprint_id)
+    return consumers
+
+
+class PriceLedger:
+    """
+    The prices update_prices last committed, so the next run can tell which
+    type_ids moved and recompute only the blueprints that use them.
+
+    Catalog edits mark the touched blueprints dirty; an edit it can't narrow
+    down (new blueprints, material or station changes) resets the ledger, and
+    the next run recomputes everything.
+    """
+
+    def __init__(self):
+        self._prices = None
+        self._dirty_blueprints = set()
+        self._lock = threading.Lock()
+
+    @property
+    def primed(self):
+        return self._prices is not None
+
+    def changed(self, prices):
+        """type_ids whose entry in {type_id: value} differs from the last commit, or None if there is none."""
+        with self._lock:
+            if self._prices is None:
+                return None
+            type_ids = prices.keys() | self._prices.keys()
+            return {tid for tid in type_ids if prices.get(tid) != self._prices.get(tid)}
+
+    def dirty_blueprints(self):
+        with self._lock:
+            return set(self._dirty_blueprints)
+
+    def commit(self, prices):
+        with self._lock:
+            self._prices = dict(prices)
+            self._dirty_blueprints.clear()
+
+    def mark_blueprints(self, ids):
+        with self._lock:
+            self._dirty_blueprints.update(ids)
+
+    def reset(self):
+        with self._lock:
+            self._prices = None
+            self._dirty_blueprints.clear()
+
+
+price_ledger = PriceLedger()
+
+
+@on_catalog_change
+def _track_catalog_edits(kind, ids=None):
+    if kind == "blueprints" and ids is not None:
+        price_ledger.mark_blueprints(ids)
+    elif kind in ("blueprints", "materials", "stations"):
+        price_ledger.reset()
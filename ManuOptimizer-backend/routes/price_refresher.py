@@ -0,0 +1,289 @@
+import logging
+import os
+import threading
+import time
+
+from models import Material
+from .async_fetch import price_fetcher
+from .catalog_queries import pricing_blueprints
+from .catalog_state import on_catalog_change
+from .market import forge_snapshot
+from .price_cache import FETCH_MARKER_TYPE_ID, price_store
+from .utils import JITA_REGION_ID, JITA_STATION_ID
+
+
+logger = logging.getLogger(__name__)
+
+# Longest a price may age before it has to be refetched, per staleness tier
+PRICE_REFRESH_TIERS = {
+    "hot": int(os.getenv("PRICE_REFRESH_HOT", 600)),      # In a recent optimal plan
+    "warm": int(os.getenv("PRICE_REFRESH_WARM", 1800)),   # Used by some blueprint
+    "cold": int(os.getenv("PRICE_REFRESH_COLD", 4 * 3600)),  # Everything else in the catalog
+}
+# Refresh this long before a price would go stale, so requests never find it expired
+PRICE_REFRESH_LEAD = int(os.getenv("PRICE_REFRESH_LEAD", 60))
+PRICE_REFRESH_TICK = int(os.getenv("PRICE_REFRESH_TICK", 15))
+# How long a plan keeps its items in the hot tier
+PRICE_REFRESH_HOT_WINDOW = int(os.getenv("PRICE_REFRESH_HOT_WINDOW", 2 * 3600))
+# Past this many due hot types a full Forge snapshot is cheaper than one request each
+PRICE_REFRESH_BULK_THRESHOLD = int(os.getenv("PRICE_REFRESH_BULK_THRESHOLD", 200))
+PRICE_REFRESH_RETRY = 60
+
+PLAN_KEYS = (
+    "original_production_plan",
+    "adjusted_production_plan",
+    "dependencies_needed",
+    "expected_invention_materials_used",
+)
+
+
+class PriceRefresher:
+    """
+    Keeps cached prices fresh from a background thread, ahead of their expiry.
+
+    Every priced type sits in a staleness tier: items from recent optimal plans
+    are hot, anything a blueprint uses is warm, the rest of the catalog is cold.
+    A price is due once it is within PRICE_REFRESH_LEAD of its tier's max age,
+    but never before ESI's own Expires, since ESI would only serve the same data.
+
+    Due hot Jita types are revalidated one request each (ETag, mostly 304s);
+    any due warm or cold type triggers one Forge snapshot refresh, which
+    reprices every Jita type at once. Only public market data is refreshed:
+    structure books need a character's token, so they stay on the request
+    path, fetched with the caller's own credentials.
+
+    update_prices() asks cached_results() first and only goes to ESI for the
+    jobs the refresher has not kept within their tier.
+    """
+
+    def __init__(self, tiers=None, lead=PRICE_REFRESH_LEAD, tick=PRICE_REFRESH_TICK,
+                 hot_window=PRICE_REFRESH_HOT_WINDOW, bulk_threshold=PRICE_REFRESH_BULK_THRESHOLD):
+        self.tiers = dict(tiers or PRICE_REFRESH_TIERS)
+        self.lead = lead
+        self.tick = tick
+        self.hot_window = hot_window
+        self.bulk_threshold = bulk_threshold
+        # Public endpoints only, never a user's token
+        self.headers = {'User-Agent': 'ManuOptimizer 1.0 nariod14@gmail.com'}
+
+        self.name_to_type_id = {}
+        self.jita_type_ids = set()
+        self.used_type_ids = set()
+        self._catalog_dirty = True
+
+        self._plan_usage = {}
+        self._retry_at = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.app = None
+
+    # === Lifecycle ===
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        if self.running:
+            return
+        self.app = app
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="price-refresher", daemon=True)
+        self._thread.start()
+        logger.info(f"Background price refresher started (tiers: {self.tiers})")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    self.run_once()
+                except Exception:
+                    logger.error("Background price refresh failed", exc_info=True)
+            self._stop.wait(self.tick)
+
+    # === Inputs ===
+
+    def record_plan(self, result):
+        """Mark every item of an optimal plan as hot."""
+        now = time.time()
+        names = set()
+        for key in PLAN_KEYS:
+            names.update((result.get(key) or {}).keys())
+        names.update(
+            name for name, usage in (result.get("material_usage") or {}).items()
+            if usage.get("used")
+        )
+        with self._lock:
+            for name in names:
+                self._plan_usage[name] = now
+
+    def mark_catalog_dirty(self, kind=None, ids=None):
+        self._catalog_dirty = True
+
+    def load_catalog(self):
+        """Rebuild the set of priced types from the database. Needs an app context."""
+        materials = Material.query.all()
+        blueprints = pricing_blueprints()
+
+        name_to_type_id = {m.name: m.type_id for m in materials if m.type_id}
+        name_to_type_id.update({bp.name: bp.type_id for bp in blueprints if bp.type_id})
+
+        jita_type_ids = {m.type_id for m in materials if m.type_id}
+        used_type_ids = set()
+        for bp in blueprints:
+            for row in bp.material_rows:
+                type_id = name_to_type_id.get(row.material_name, row.material_type_id)
+                if type_id:
+                    used_type_ids.add(type_id)
+            if not bp.type_id:
+                continue
+            used_type_ids.add(bp.type_id)
+            # Jita is also the fallback when a structure has no sell orders
+            jita_type_ids.add(bp.type_id)
+
+        with self._lock:
+            self.name_to_type_id = name_to_type_id
+            self.jita_type_ids = jita_type_ids
+            self.used_type_ids = used_type_ids
+            self._catalog_dirty = False
+
+    # === Tiers ===
+
+    def hot_type_ids(self, now=None):
+        cutoff = (now or time.time()) - self.hot_window
+        with self._lock:
+            self._plan_usage = {name: ts for name, ts in self._plan_usage.items() if ts >= cutoff}
+            return {self.name_to_type_id[name] for name in self._plan_usage if name in self.name_to_type_id}
+
+    def tier(self, type_id, hot=None):
+        hot = self.hot_type_ids() if hot is None else hot
+        if type_id in hot:
+            return "hot"
+        if type_id in self.used_type_ids:
+            return "warm"
+        return "cold"
+
+    def max_age(self, type_id, hot=None):
+        return self.tiers[self.tier(type_id, hot)]
+
+    # === Cache state ===
+
+    def _last_jita_fetch(self, type_id):
+        """
+        The newest record of this type's Jita price: its own entry, the region
+        fallback from the last snapshot, or that snapshot's marker if it listed neither.
+        """
+        entry = price_store.get(type_id, JITA_STATION_ID)
+        marker = price_store.get(FETCH_MARKER_TYPE_ID, JITA_STATION_ID)
+        if entry and (not marker or entry["fetched_at"] >= marker["fetched_at"]):
+            return entry
+        region_entry = price_store.get(type_id, JITA_REGION_ID)
+        if marker and region_entry and region_entry["fetched_at"] >= marker["fetched_at"]:
+            return region_entry
+        return marker
+
+    def _due_at(self, last, max_age):
+        if last is None:
+            return 0.0
+        esi_expires = last.get("expires_at") or 0.0
+        return max(esi_expires, last["fetched_at"] + max_age - self.lead)
+
+    def _jita_result(self, type_id, max_age, now):
+        last = self._last_jita_fetch(type_id)
+        if last is None or now - last["fetched_at"] >= max_age:
+            return None
+        if last["source"] == "marker" or last["price"] is None:
+            return None, "not_found"
+        return last["price"], "jita"
+
+    def cached_results(self, jobs, now=None):
+        """
+        Split (type_id, station_id) jobs into fetch_price-style results the
+        refresher has kept within their tier, and the jobs still to fetch.
+        Structure jobs are always left to fetch, under the caller's token.
+        """
+        if not self.running:
+            return [], list(jobs)
+
+        now = now or time.time()
+        hot = self.hot_type_ids(now)
+        results = []
+        missing = []
+        for type_id, station_id in jobs:
+            if not station_id:
+                price_data = self._jita_result(type_id, self.max_age(type_id, hot), now)
+                if price_data is not None:
+                    results.append((type_id, price_data, False))
+                    continue
+            missing.append((type_id, station_id))
+        return results, missing
+
+    # === Scheduling ===
+
+    def due(self, now=None):
+        """What a refresh pass would fetch now: (snapshot?, [hot Jita type_ids])."""
+        now = now or time.time()
+        hot = self.hot_type_ids(now)
+
+        refresh_snapshot = False
+        due_hot = []
+        for type_id in self.jita_type_ids:
+            tier = self.tier(type_id, hot)
+            if now < self._due_at(self._last_jita_fetch(type_id), self.tiers[tier]):
+                continue
+            if tier == "hot":
+                due_hot.append(type_id)
+            else:
+                refresh_snapshot = True
+        if len(due_hot) > self.bulk_threshold:
+            refresh_snapshot = True
+        if refresh_snapshot:
+            due_hot = []
+        if now < self._retry_at.get("jita", 0):
+            refresh_snapshot, due_hot = False, []
+
+        return refresh_snapshot, sorted(due_hot)
+
+    def run_once(self, now=None):
+        """One refresh pass. Needs an app context. Returns what was refreshed."""
+        if self._catalog_dirty:
+            self.load_catalog()
+
+        now = now or time.time()
+        refresh_snapshot, due_hot = self.due(now)
+        refreshed = {"snapshot": False, "types": 0}
+
+        try:
+            if refresh_snapshot:
+                forge_snapshot.ensure_fresh(self.headers, force=True)
+                refreshed["snapshot"] = True
+            elif due_hot:
+                results = price_fetcher.revalidate_jita_prices(due_hot, self.headers)
+                refreshed["types"] = len(due_hot)
+                if any(source == "error" for _, source in results.values()):
+                    self._retry_at["jita"] = now + PRICE_REFRESH_RETRY
+        except Exception:
+            logger.error("Background Jita price refresh failed", exc_info=True)
+            self._retry_at["jita"] = now + PRICE_REFRESH_RETRY
+
+        if refreshed["snapshot"] or refreshed["types"]:
+            price_store.flush()
+            logger.info(
+                f"Background price refresh: snapshot={refreshed['snapshot']}, {refreshed['types']} hot types"
+            )
+        return refreshed
+
+
+price_refresher = PriceRefresher()
+
+
+@on_catalog_change
+def _refresh_catalog(kind, ids=None):
+    price_refresher.mark_catalog_dirty(kind, ids)
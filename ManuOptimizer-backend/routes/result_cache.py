@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from .catalog_state import on_catalog_change
+
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_SIZE = 32
+
+BLUEPRINT_KEY_FIELDS = (
+    "name", "tier", "type_id", "amt_per_run", "materials", "sell_price", "material_cost", "max",
+    "full_material_cost", "invention_chance", "runs_per_copy",
+)
+MATERIAL_KEY_FIELDS = ("name", "type_id", "quantity", "sell_price", "category")
+
+
+def optimization_key(blueprints, materials, **options):
+    """
+    Stable sha256 over every input /optimize reads: blueprint rows, material
+    quantities and prices, plus solver options. Row order does not matter.
+    """
+    payload = {
+        "blueprints": sorted(
+            ([getattr(b, field, None) for field in BLUEPRINT_KEY_FIELDS] for b in blueprints),
+            key=lambda row: row[0],
+        ),
+        "materials": sorted(
+            ([getattr(m, field, None) for field in MATERIAL_KEY_FIELDS] for m in materials),
+            key=lambda row: row[0],
+        ),
+        "options": options,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU of computed results with hit/miss counters."""
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "invalidations": self.invalidations,
+            }
+
+
+optimization_cache = ResultCache()
+
+
+@on_catalog_change
+def _invalidate_optimization_cache(kind, ids=None):
+    optimization_cache.clear()
@@ -0,0 +1,340 @@
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from urllib.parse import quote
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# The SDE is a few MB; map all of it so reads never copy pages through the page cache
+SDE_MMAP_SIZE = 64 * 1024 * 1024
+
+# Trigram index over type names, built by Utils/sdeExtractionCatalyst.py
+TYPE_SEARCH_TABLE = "typeSearch"
+SEARCH_LIMIT = 20
+
+# Ranking buckets for search results, best first
+MATCH_RANKS = {"exact": 0, "prefix": 1, "word": 2, "substring": 3, "fuzzy": 4}
+
+# A fuzzy candidate must share at least this fraction of the query's trigrams
+FUZZY_MIN_OVERLAP = 0.5
+
+# industryActivity* activityIDs exported by Utils/sdeExtractionCatalyst.py
+ACTIVITY_MANUFACTURING = 1
+ACTIVITY_INVENTION = 8
+ACTIVITY_REACTION = 11
+INDUSTRY_TABLES = ("industryActivityMaterials", "industryActivityProducts", "industryActivityProbabilities")
+
+# Stay well under SQLite's bound-parameter limit
+SQL_CHUNK = 500
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def default_sde_path():
+    base_path = getattr(sys, '_MEIPASS', os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    return os.path.join(base_path, 'sde', 'mini_sde.sqlite')
+
+
+class SdeIndex:
+    """
+    Read-only access to sde/mini_sde.sqlite.
+
+    The file is opened in immutable read-only URI mode with mmap, one
+    connection per thread, so waitress workers never share a cursor and SQLite
+    skips locking entirely. load() reads typeName -> (typeID,
+    manufacturingCategory) and typeID -> typeName into dicts once; after that
+    name and id lookups are plain dict reads with no I/O.
+
+    search() answers autocomplete queries: prefixes from a sorted in-memory
+    name list, substrings from the FTS5 trigram table (built in memory for SDE
+    files that predate it), and typos by trigram overlap against in-memory
+    postings. bm25 over an OR of every query trigram scores thousands of rows
+    per keystroke, which is too slow for autocomplete.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_sde_path()
+        self._by_name = None
+        self._by_id = None
+        self._sorted_names = None
+        self._load_lock = threading.Lock()
+        self._local = threading.local()
+        self._memory_search = None
+        self._memory_search_lock = threading.Lock()
+        self._postings = None
+        self._postings_lock = threading.Lock()
+
+    def connect(self):
+        """This thread's read-only connection to the SDE."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if not os.path.exists(self.path):
+                logger.error(f"SDE database not found at: {self.path}")
+                raise FileNotFoundError(f"SDE database not found at: {self.path}")
+            uri = f"file:{quote(os.path.abspath(self.path))}?mode=ro&immutable=1"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={SDE_MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def load(self):
+        """Build the in-memory name and id maps. Safe to call from several threads; loads once."""
+        if self._by_name is not None:
+            return
+        with self._load_lock:
+            if self._by_name is not None:
+                return
+            rows = self.connect().execute('''
+                SELECT i.typeName, i.typeID, COALESCE(m.manufacturingCategory, 'Other')
+                FROM types i
+                LEFT JOIN materialClassifications m ON i.typeID = m.typeID
+                ORDER BY i.typeID
+            ''').fetchall()
+
+            by_name = {}
+            by_id = {}
+            for name, type_id, category in rows:
+                # Names shared by several types resolve to the highest typeID, as the old per-call query did
+                by_name[name] = (type_id, category)
+                by_id[type_id] = name
+            self._sorted_names = sorted((name.casefold(), name) for name in by_name)
+            self._by_id = by_id
+            self._by_name = by_name
+        logger.info(f"Loaded {len(by_name)} SDE type names")
+
+    @property
+    def by_name(self):
+        """{typeName: (typeID, manufacturingCategory)}."""
+        self.load()
+        return self._by_name
+
+    def type_name(self, type_id):
+        self.load()
+        return self._by_id.get(type_id)
+
+    # === Search ===
+
+    def _search_connection(self):
+        """(connection, lock or None) holding the trigram table: the file's, else an in-memory copy."""
+        conn = self.connect()
+        if getattr(self._local, "has_search_table", None) is None:
+            self._local.has_search_table = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (TYPE_SEARCH_TABLE,)
+            ).fetchone() is not None
+        if self._local.has_search_table:
+            return conn, None
+
+        with self._memory_search_lock:
+            if self._memory_search is None:
+                self.load()
+                memory = sqlite3.connect(":memory:", check_same_thread=False)
+                memory.execute(f"CREATE VIRTUAL TABLE {TYPE_SEARCH_TABLE} USING fts5(typeName, tokenize='trigram')")
+                memory.executemany(
+                    f"INSERT INTO {TYPE_SEARCH_TABLE} (rowid, typeName) VALUES (?, ?)", self._by_id.items()
+                )
+                logger.info(f"SDE has no {TYPE_SEARCH_TABLE} table, built the search index in memory")
+                self._memory_search = memory
+        return self._memory_search, self._memory_search_lock
+
+    def _substring_ids(self, needle, limit):
+        """typeIDs whose name contains needle (3+ characters), via the trigram table."""
+        conn, lock = self._search_connection()
+        sql = f"SELECT rowid FROM {TYPE_SEARCH_TABLE} WHERE {TYPE_SEARCH_TABLE} MATCH ? LIMIT ?"
+        phrase = '"' + needle.replace('"', '""') + '"'
+        if lock is None:
+            return [row[0] for row in conn.execute(sql, (phrase, limit))]
+        with lock:
+            return [row[0] for row in conn.execute(sql, (phrase, limit))]
+
+    def _trigram_postings(self):
+        """
+        (type_ids, {trigram: row array}, trigram count per row) over
+        case-folded names, rows indexing type_ids. Built on first use.
+        """
+        if self._postings is None:
+            with self._postings_lock:
+                if self._postings is None:
+                    self.load()
+                    postings = defaultdict(list)
+                    sizes = []
+                    for row, name in enumerate(self._by_id.values()):
+                        grams = trigrams(name.casefold())
+                        sizes.append(len(grams))
+                        for gram in grams:
+                            postings[gram].append(row)
+                    self._postings = (
+                        np.fromiter(self._by_id, dtype=np.int64, count=len(self._by_id)),
+                        {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()},
+                        np.asarray(sizes, dtype=np.int32),
+                    )
+        return self._postings
+
+    def _fuzzy_ids(self, needle, limit):
+        """[(typeID, dice score)] for names sharing enough trigrams with needle, best first."""
+        grams = trigrams(needle)
+        type_ids, postings, sizes = self._trigram_postings()
+        hits = [postings[gram] for gram in grams if gram in postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(type_ids))
+        rows = np.flatnonzero(shared >= FUZZY_MIN_OVERLAP * len(grams))
+        scores = 2 * shared[rows] / (len(grams) + sizes[rows])
+        best = rows[np.argsort(-scores, kind="stable")[:limit]]
+        return [(int(type_ids[row]), float(2 * shared[row] / (len(grams) + sizes[row]))) for row in best]
+
+    def prepare_search(self):
+        """Build the search structures ahead of the first query."""
+        self._search_connection()
+        self._trigram_postings()
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """
+        Ranked type name matches for an autocomplete query: exact, prefix,
+        word prefix, substring, then fuzzy (shared trigrams, most similar
+        first). Returns [{"type_id", "name", "category", "match"}].
+        """
+        self.load()
+        query = unicodedata.normalize("NFKC", query or "").strip()
+        needle = query.casefold()
+        if not needle:
+            return []
+
+        found = {}  # name -> (match, similarity)
+
+        def add(name, match, similarity=1.0):
+            if name not in found or MATCH_RANKS[match] < MATCH_RANKS[found[name][0]]:
+                found[name] = (match, similarity)
+
+        # Prefixes straight off the sorted name list
+        i = bisect_left(self._sorted_names, (needle,))
+        while i < len(self._sorted_names) and self._sorted_names[i][0].startswith(needle) and len(found) < limit:
+            folded, name = self._sorted_names[i]
+            add(name, "exact" if folded == needle else "prefix")
+            i += 1
+
+        # Trigrams need three characters; shorter queries are prefix only
+        if len(needle) >= 3 and len(found) < limit:
+            for type_id in self._substring_ids(needle, limit * 4):
+                name = self._by_id[type_id]
+                folded = name.casefold()
+                if folded.startswith(needle):
+                    add(name, "prefix")
+                else:
+                    add(name, "word" if f" {needle}" in folded else "substring")
+
+            if len(found) < limit:
+                for type_id, similarity in self._fuzzy_ids(needle, limit):
+                    add(self._by_id[type_id], "fuzzy", similarity)
+
+        ranked = sorted(
+            found.items(), key=lambda item: (MATCH_RANKS[item[1][0]], -item[1][1], len(item[0]), item[0])
+        )
+        return [
+            {"type_id": self._by_name[name][0], "name": name, "category": self._by_name[name][1], "match": match}
+            for name, (match, _) in ranked[:limit]
+        ]
+
+    # === Industry ===
+
+    def has_industry_data(self):
+        conn = self.connect()
+        found = {row[0] for row in conn.execute(
+            f"SELECT name FROM sqlite_master WHERE name IN ({', '.join('?' * len(INDUSTRY_TABLES))})", INDUSTRY_TABLES
+        )}
+        return found == set(INDUSTRY_TABLES)
+
+    def _select_in(self, sql, ids, *params):
+        """Run sql, whose last placeholder is an `IN ({})` list, over ids in chunks."""
+        conn = self.connect()
+        ids = list(ids)
+        rows = []
+        for i in range(0, len(ids), SQL_CHUNK):
+            chunk = ids[i:i + SQL_CHUNK]
+            rows.extend(conn.execute(sql.format(", ".join("?" * len(chunk))), (*params, *chunk)))
+        return rows
+
+    def industry_recipes(self, product_type_ids):
+        """
+        {product typeID: recipe} for every product some blueprint manufactures
+        or reacts. A recipe is a dict with blueprint_type_id, activity_id,
+        quantity (units per run), materials [(typeID, qty per run)] and
+        invention: None, or the T1 blueprint_type_id, probability, runs per
+        invented copy and materials per attempt. Products several blueprints
+        make resolve to the lowest blueprint typeID.
+        """
+        recipes = {}
+        for bp_id, activity, product_id, quantity in sorted(self._select_in(
+            "SELECT typeID, activityID, productTypeID, quantity FROM industryActivityProducts "
+            "WHERE activityID IN (?, ?) AND productTypeID IN ({})",
+            set(product_type_ids), ACTIVITY_MANUFACTURING, ACTIVITY_REACTION,
+        )):
+            recipes.setdefault(product_id, {
+                "blueprint_type_id": bp_id, "activity_id": activity, "quantity": quantity,
+                "materials": [], "invention": None,
+            })
+        by_blueprint = {(r["blueprint_type_id"], r["activity_id"]): r for r in recipes.values()}
+
+        for bp_id, activity, material_id, quantity in self._select_in(
+            "SELECT typeID, activityID, materialTypeID, quantity FROM industryActivityMaterials "
+            "WHERE activityID IN (?, ?) AND typeID IN ({}) ORDER BY typeID, activityID, rowid",
+            {bp_id for bp_id, _ in by_blueprint}, ACTIVITY_MANUFACTURING, ACTIVITY_REACTION,
+        ):
+            recipe = by_blueprint.get((bp_id, activity))
+            if recipe is not None:
+                recipe["materials"].append((material_id, quantity))
+
+        # T2 blueprints are themselves the product of inventing from a T1 blueprint
+        manufactured = {r["blueprint_type_id"]: r for r in recipes.values() if r["activity_id"] == ACTIVITY_MANUFACTURING}
+        sources = {}
+        for source_id, invented_id, runs in sorted(self._select_in(
+            "SELECT typeID, productTypeID, quantity FROM industryActivityProducts "
+            "WHERE activityID = ? AND productTypeID IN ({})",
+            manufactured, ACTIVITY_INVENTION,
+        )):
+            sources.setdefault(invented_id, (source_id, runs))
+        if not sources:
+            return recipes
+
+        probabilities = {
+            (source_id, invented_id): probability
+            for source_id, invented_id, probability in self._select_in(
+                "SELECT typeID, productTypeID, probability FROM industryActivityProbabilities "
+                "WHERE activityID = ? AND productTypeID IN ({})",
+                sources, ACTIVITY_INVENTION,
+            )
+        }
+        invention_materials = {}
+        for source_id, material_id, quantity in self._select_in(
+            "SELECT typeID, materialTypeID, quantity FROM industryActivityMaterials "
+            "WHERE activityID = ? AND typeID IN ({}) ORDER BY typeID, rowid",
+            {source_id for source_id, _ in sources.values()}, ACTIVITY_INVENTION,
+        ):
+            invention_materials.setdefault(source_id, []).append((material_id, quantity))
+
+        for invented_id, (source_id, runs) in sources.items():
+            manufactured[invented_id]["invention"] = {
+                "blueprint_type_id": source_id,
+                "probability": probabilities.get((source_id, invented_id)),
+                "runs": runs,
+                "materials": invention_materials.get(source_id, []),
+            }
+        return recipes
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+sde_index = SdeIndex()
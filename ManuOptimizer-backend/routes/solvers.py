@@ -0,0 +1,85 @@
+import logging
+import os
+import time
+
+import numpy as np
+from pulp import PULP_CBC_CMD, LpStatus, value
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOLVER = "cbc"
+
+# scipy.optimize.milp status codes mapped onto PuLP's LpStatus strings
+HIGHS_STATUS = {
+    0: "Optimal",
+    1: "Not Solved",  # Iteration or time limit reached
+    2: "Infeasible",
+    3: "Unbounded",
+    4: "Undefined",
+}
+
+
+def solve_cbc(model):
+    """PuLP + CBC: writes the model to a temp file and runs the CBC binary in a subprocess."""
+    prob, variables = model.to_pulp()
+    started = time.perf_counter()
+    prob.solve(PULP_CBC_CMD(msg=False))
+    model.timings["solve_ms"] = (time.perf_counter() - started) * 1000
+
+    model.status = LpStatus[prob.status]
+    if model.status == "Optimal":
+        model.solution = [value(var) or 0 for var in variables]
+        model.objective = value(prob.objective)
+
+
+def solve_highs(model):
+    """In-process HiGHS through scipy.optimize.milp, fed straight from the CSR matrix."""
+    from scipy.optimize import Bounds, LinearConstraint, milp
+
+    n_bps = len(model.blueprints)
+    if n_bps == 0:
+        model.status = "Optimal"
+        model.solution = []
+        model.objective = 0.0
+        return
+
+    constraints = []
+    if model.balance.shape[0]:
+        constraints.append(LinearConstraint(model.balance, -np.inf, model.inventory))
+
+    started = time.perf_counter()
+    res = milp(
+        c=-model.profit,  # milp minimizes
+        constraints=constraints,
+        integrality=np.ones(n_bps),
+        bounds=Bounds(np.zeros(n_bps), model.upper),
+    )
+    model.timings["solve_ms"] = (time.perf_counter() - started) * 1000
+
+    model.status = HIGHS_STATUS.get(res.status, "Undefined")
+    if model.status == "Optimal":
+        model.solution = res.x.tolist()
+        model.objective = -res.fun
+
+
+SOLVERS = {
+    "cbc": solve_cbc,
+    "highs": solve_highs,
+}
+
+
+def get_solver_name(requested=None, config=None):
+    """Per-request choice first, then app config, then the OPTIMIZER_SOLVER env var."""
+    name = requested or (config or {}).get("OPTIMIZER_SOLVER") or os.getenv("OPTIMIZER_SOLVER") or DEFAULT_SOLVER
+    name = name.lower()
+    if name not in SOLVERS:
+        raise ValueError(f"Unknown solver '{name}', expected one of: {', '.join(SOLVERS)}")
+    return name
+
+
+def solve(model, solver_name=DEFAULT_SOLVER):
+    """Solve a ProductionModel in place. Each backend records its own solve_ms."""
+    SOLVERS[solver_name](model)
+    logger.info(f"Solved with {solver_name}: {model.status}")
+    return model.status
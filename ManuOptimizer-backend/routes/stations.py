@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from models import Station, db
+from .catalog_state import catalog_changed
 import logging
 
 logger = logging.getLogger(__name__)
@@ -29,6 +30,7 @@ def add_station():
         new_station = Station(name=name, station_id=station_id)
         db.session.add(new_station)
         db.session.commit()
+        catalog_changed("stations")
 
         return jsonify({'message': 'Station added successfully', 'station': {
             'id': new_station.id,
@@ -62,6 +64,7 @@ def delete_station(id):
     try:
         db.session.delete(station)
         db.session.commit()
+        catalog_changed("stations")
         return jsonify({'message': 'Station deleted'}), 200
     except Exception as e:
         db.session.rollback()
@@ -90,6 +93,7 @@ def edit_station(id):
         station.name = name
         station.station_id = station_id_val
         db.session.commit()
+        catalog_changed("stations")
         return jsonify({'message': 'Station updated', 'station': {'id': station.id, 'name': station.name, 'station_id': station.station_id}}), 200
     except Exception as e:
         db.session.rollback()
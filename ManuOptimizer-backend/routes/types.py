@@ -0,0 +1,26 @@
+from flask import Blueprint, request, jsonify
+from .sde import sde_index, SEARCH_LIMIT
+import logging
+
+logger = logging.getLogger(__name__)
+
+types_bp = Blueprint('types', __name__, url_prefix='/api/types')
+
+MAX_SEARCH_LIMIT = 100
+
+
+@types_bp.route('/search', methods=['GET'])
+def search_types():
+    """Autocomplete over SDE type names: ?q=<text>&limit=<n>."""
+    try:
+        query = request.args.get('q', '')
+        try:
+            limit = int(request.args.get('limit', SEARCH_LIMIT))
+        except ValueError:
+            return jsonify({'error': 'Invalid limit'}), 400
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+        return jsonify(sde_index.search(query, limit)), 200
+    except Exception as e:
+        logger.error(f"Type search failed for {request.args.get('q')!r}: {e}")
+        return jsonify({'error': str(e)}), 500
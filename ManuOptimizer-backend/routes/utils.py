@@ -8,13 +8,18 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import os
-import sys
 import sqlite3
+import sys
 import unicodedata
 from time import time
 import math
 
-from models import BlueprintT2, db, Blueprint, Material
+from models import BlueprintMaterial, BlueprintT2, db, Blueprint, Material
+from .bom_graph import as_bom_graph
+from .esi_client import fetch_all_pages, get_esi_session
+from .order_book import OrderBookIndex
+from .price_cache import parse_expires, price_store
+from .sde import sde_index
 
 
 # Constants
@@ -45,12 +50,8 @@ def normalize_name(name: str) -> str:
 
 def expand_materials(bp, blueprints, quantity=1, t1_dependencies=None, inventory=None):
     expanded = defaultdict(float)
-
-    # Normalize materials if they are a list
-    if isinstance(bp.materials, list):
-        normalized = normalize_materials_structure(bp.materials)
-    else:
-        normalized = bp.materials
+    graph = as_bom_graph(blueprints)
+    normalized = graph.normalized(bp)
 
     # Units produced per run (default = 1)
     amt_per_run = getattr(bp, "amt_per_run", 1)
@@ -64,7 +65,7 @@ def expand_materials(bp, blueprints, quantity=1, t1_dependencies=None, inventory
 
     for section_name, section in normalized.items():
         for mat, qty_per_run in section.items():
-            sub_bp = next((b for b in blueprints if b.name == mat), None)
+            sub_bp = graph.get(mat)
 
             total_mat_needed = qty_per_run * runs_needed
             adjusted_mat_needed = total_mat_needed * usage_ratio
@@ -97,7 +98,7 @@ def expand_materials(bp, blueprints, quantity=1, t1_dependencies=None, inventory
                 if remaining_qty > 0:
                     sub_mats = expand_materials(
                         sub_bp,
-                        blueprints,
+                        graph,
                         quantity=remaining_qty,
                         t1_dependencies=t1_dependencies,
                         inventory=inventory,
@@ -109,7 +110,7 @@ def expand_materials(bp, blueprints, quantity=1, t1_dependencies=None, inventory
                 # For T2 sub-blueprints, just expand normally
                 sub_mats = expand_materials(
                     sub_bp,
-                    blueprints,
+                    graph,
                     quantity=adjusted_mat_needed,
                     t1_dependencies=t1_dependencies,
                     inventory=inventory,
@@ -127,7 +128,8 @@ def expand_materials(bp, blueprints, quantity=1, t1_dependencies=None, inventory
 def accumulate_materials(blueprint: Blueprint, quantity: int, total_needed: dict, item_needs: dict, blueprints: list):
     """Accumulate total materials and item-level needs, properly handling invention materials."""
 
-    normalized_materials = normalize_materials_structure(blueprint.materials)
+    graph = as_bom_graph(blueprints)
+    normalized_materials = graph.normalized(blueprint)
     runs_per_copy = getattr(blueprint, 'runs_per_copy', 1)
     for category, materials in normalized_materials.items():
         for mat_name, mat_qty in materials.items():
@@ -143,16 +145,17 @@ def accumulate_materials(blueprint: Blueprint, quantity: int, total_needed: dict
                 adjusted_qty = mat_qty * quantity
             total_needed[mat_name] = total_needed.get(mat_name, 0) + adjusted_qty
             # If this is a buildable Item (not a raw material), track as a build target
-            if any(b.name == mat_name for b in blueprints):
+            if graph.is_buildable(mat_name):
                 item_needs[mat_name] = item_needs.get(mat_name, 0) + adjusted_qty
 
 
 def can_fulfill(bp, inventory, blueprints):
-    all_materials = expand_materials_clean(bp, blueprints, quantity=1)
+    graph = as_bom_graph(blueprints)
+    all_materials = expand_materials_clean(bp, graph, quantity=1)
     for mat in all_materials:
         if inventory.get(mat, 0) > 0:
             continue
-        if any(b.name == mat for b in blueprints):
+        if graph.is_buildable(mat):
             continue
         return False
     return True
@@ -164,13 +167,15 @@ def expand_materials_clean(bp, blueprints, quantity=1):
     Don't handle inventory here - that's for the optimizer constraints.
     """
     expanded = defaultdict(float)
+    graph = as_bom_graph(blueprints)
 
     logger.debug(f"Expanding {bp.name} for quantity {quantity}")
-    # Normalize materials if they are a list
-    if isinstance(bp.materials, list):
-        normalized = normalize_materials_structure(bp.materials)
-    else:
-        normalized = bp.materials
+    if graph.get(bp.name) is bp:
+        # Pro-rata expansion is linear, so the whole chain is one vectorized explosion
+        expanded.update(graph.explode({bp.name: quantity}))
+        return expanded
+
+    normalized = graph.normalized(bp)
 
     # Units produced per run (default = 1)
     amt_per_run = getattr(bp, "amt_per_run", 1)
@@ -184,7 +189,7 @@ def expand_materials_clean(bp, blueprints, quantity=1):
 
     for section_name, section in normalized.items():
         for mat, qty_per_run in section.items():
-            sub_bp = next((b for b in blueprints if b.name == mat), None)
+            sub_bp = graph.get(mat)
 
             total_mat_needed = qty_per_run * runs_needed
             adjusted_mat_needed = total_mat_needed * usage_ratio
@@ -202,7 +207,7 @@ def expand_materials_clean(bp, blueprints, quantity=1):
                 # Recursively expand sub-blueprints
                 sub_mats = expand_materials_clean(
                     sub_bp,
-                    blueprints,
+                    graph,
                     quantity=adjusted_mat_needed
                 )
                 for sm, sq in sub_mats.items():
@@ -230,7 +235,13 @@ def normalize_materials_structure(materials_raw):
     }
     """
     if isinstance(materials_raw, dict):
-        return materials_raw  # Already in correct format
+        normalized = {}
+        for key, value in materials_raw.items():
+            if isinstance(value, dict):
+                normalized.setdefault(key, {}).update(value)
+            else:  # Flat form {material: qty}
+                normalized.setdefault("Uncategorized", {})[key] = value
+        return normalized
 
     elif isinstance(materials_raw, list):
         normalized = {}
@@ -300,46 +311,42 @@ def fetch_price(type_id, station_id, headers):
 
 
 def get_item_info(material_names):
-    # Get the path to the SDE
-    base_path = getattr(sys, '_MEIPASS', os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    sde_path = os.path.join(base_path, 'sde', 'mini_sde.sqlite')
-    
-    if not os.path.exists(sde_path):
-        logger.error(f"SDE database not found at: {sde_path}")
-        raise FileNotFoundError(f"SDE database not found at: {sde_path}")
-
-    # Connect to the SDE database
-    conn = sqlite3.connect(sde_path)
-    cursor = conn.cursor()
-
-    # Normalize the material names
-    normalized_names = [unicodedata.normalize('NFC', normalize_name(name)) for name in material_names]
-
-    # Query the SDE database
-    placeholders = ', '.join('?' for _ in normalized_names)
-    query = f'''
-    SELECT i.typeName, i.typeID, COALESCE(m.manufacturingCategory, 'Other')
-    FROM types i
-    LEFT JOIN materialClassifications m ON i.typeID = m.typeID
-    WHERE i.typeName IN ({placeholders})
-    '''
-    cursor.execute(query, normalized_names)
-    rows = cursor.fetchall()
+    """{normalized name: {"type_id", "category"}} from the in-memory SDE index; unknown names get type_id 0."""
+    by_name = sde_index.by_name
 
     info = {}
-    for name, tid, cat in rows:
-        info[normalize_name(name)] = {"type_id": tid, "category": cat}
-    
-    if not info:
+    for name in material_names:
+        key = normalize_name(name)
+        hit = by_name.get(unicodedata.normalize('NFC', key))
+        info[key] = {"type_id": hit[0], "category": hit[1]} if hit else {"type_id": 0, "category": "Other"}
+
+    if not any(entry["type_id"] for entry in info.values()):
         logger.debug("No material info found")
 
-    conn.close()
+    return info
 
-    # Return the material information
-    return {
-        normalize_name(name): info.get(normalize_name(name), {"type_id": 0, "category": "Other"})
-        for name in material_names
-    }
+def build_material_rows(materials):
+    """
+    BlueprintMaterial rows for a bill of materials in any accepted shape (nested,
+    flat or list). Type ids come from the SDE; without one, rows keep just their names.
+    """
+    normalized = normalize_materials_structure(materials)
+    names = [name for section in normalized.values() for name in section]
+    try:
+        info = get_item_info(names) if names else {}
+    except (FileNotFoundError, sqlite3.Error):
+        logger.warning("SDE unavailable, saving bill of materials without type ids")
+        info = {}
+    return [
+        BlueprintMaterial(
+            material_name=name,
+            material_type_id=info.get(normalize_name(name), {}).get("type_id") or None,
+            category=category,
+            qty_per_run=qty,
+        )
+        for category, section in normalized.items()
+        for name, qty in section.items()
+    ]
 
 def compute_expanded_materials(blueprint, quantity, blueprints):
     """Returns dict of materials (including Items) required to produce `quantity` final units of blueprint output"""
@@ -369,15 +376,12 @@ def validate_inventory(inventory, iteration):
 def expand_sub_blueprints_one_level(bp, blueprints, quantity=1):
     """Expand one level of materials for a blueprint without full recursion into T1."""
     expanded = defaultdict(float)
-
-    if isinstance(bp.materials, list):
-        normalized = normalize_materials_structure(bp.materials)
-    else:
-        normalized = bp.materials
+    graph = as_bom_graph(blueprints)
+    normalized = graph.normalized(bp)
 
     for section_name, section in normalized.items():
         for mat, qty in section.items():
-            sub_bp = next((b for b in blueprints if b.name == mat), None)
+            sub_bp = graph.get(mat)
             if sub_bp:
                 # Just add the immediate material (the sub_blueprint name and qty*quantity)
                 expanded[mat] += qty * quantity
@@ -388,22 +392,7 @@ def expand_sub_blueprints_one_level(bp, blueprints, quantity=1):
     return expanded
 
 def get_item_name(type_id):
-    base_path = getattr(sys, '_MEIPASS', os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    sde_path = os.path.join(base_path, 'sde', 'mini_sde.sqlite')
-
-    if not os.path.exists(sde_path):
-        logger.error(f"SDE database not found at: {sde_path}")
-        raise FileNotFoundError(f"SDE database not found at: {sde_path}")
-
-    conn = sqlite3.connect(sde_path)
-    cursor = conn.cursor()
-
-    cursor.execute('SELECT typeName FROM invTypes WHERE typeID = ?', (type_id,))
-    result = cursor.fetchone()
-
-    conn.close()
-
-    return result[0] if result else None
+    return sde_index.type_name(type_id)
 
 
 
@@ -597,58 +586,45 @@ def get_material_category_lookup():
     for mineral in known_minerals:
         lookup[mineral] = "Minerals"
 
-    # Scan through all blueprint materials
-    blueprints = Blueprint.query.all()
-    for bp in reversed(blueprints):  # prioritize newer blueprints
-        if isinstance(bp.materials, dict):
-            for cat_or_material, contents in bp.materials.items():
-                if isinstance(contents, dict):  # Nested form {category: {material: qty}}
-                    for mat in contents:
-                        lookup[mat] = cat_or_material
-                else:  # Flat form {material: qty}
-                    lookup[cat_or_material] = "Uncategorized"
+    # Scan through all blueprint materials, newest blueprint first so older ones overwrite
+    rows = db.session.query(BlueprintMaterial.material_name, BlueprintMaterial.category).order_by(
+        BlueprintMaterial.blueprint_id.desc(), BlueprintMaterial.id
+    )
+    for mat, category in rows:
+        lookup[mat] = category
 
     return lookup
 
 
-# Add this helper function to routes.py
 def create_esi_session():
-    session = requests.Session()
-    retry = Retry(
-        total=5,
-        backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504]
-    )
-    session.mount('https://', HTTPAdapter(max_retries=retry))
-    return session
+    """Kept for existing callers: returns the shared pooled ESI session rather than a new one."""
+    return get_esi_session()
 
 JITA_STATION_ID = 60003760
 
 import time
 
-cache = {}
-
 def get_lowest_jita_sell_price(type_id, headers, retries=2):
-    cached = cache.get(type_id)
-    if cached:
-        age = time.time() - cached.get("timestamp", 0)
-        if age < PRICE_CACHE_TTL:
-            # Return cached price immediately, no HTTP request
-            return cached["lowest_price"], "cached"
+    if price_store.get_fresh(type_id, JITA_STATION_ID, PRICE_CACHE_TTL):
+        # Return cached price immediately, no HTTP request
+        return price_store.get(type_id, JITA_STATION_ID)["price"], "cached"
 
     # Proceed with HTTP request to update price if no fresh cache
+    cached = price_store.get(type_id, JITA_STATION_ID)
     local_headers = headers.copy()
-    if cached:
+    if cached and cached.get("etag"):
         local_headers["If-None-Match"] = cached["etag"]
 
     url = f"https://esi.evetech.net/latest/markets/{JITA_REGION_ID}/orders/?order_type=sell&type_id={type_id}"
 
     for attempt in range(retries + 1):
         try:
-            response = requests.get(url, headers=local_headers, timeout=10)
+            response = get_esi_session().get(url, headers=local_headers, timeout=10)
 
+            expires_at = parse_expires(response.headers.get("Expires"), PRICE_CACHE_TTL)
             if response.status_code == 304 and cached:
-                return cached["lowest_price"], "cached"
+                price_store.touch(type_id, JITA_STATION_ID, expires_at)
+                return cached["price"], "cached"
 
             response.raise_for_status()
             orders = response.json()
@@ -659,14 +635,10 @@ def get_lowest_jita_sell_price(type_id, headers, retries=2):
                 return None, "not_found"
 
             lowest_price = min(order["price"] for order in jita_orders)
-            etag = response.headers.get("ETag")
-
-            if etag:
-                cache[type_id] = {
-                    "etag": etag,
-                    "lowest_price": lowest_price,
-                    "timestamp": time.time()
-                }
+            price_store.put(
+                type_id, JITA_STATION_ID, lowest_price, "jita",
+                etag=response.headers.get("ETag"), expires_at=expires_at
+            )
 
             return lowest_price, "jita"
         except Exception as e:
@@ -690,13 +662,10 @@ def get_lowest_jita_sell_prices_loop(type_ids: list[int], headers, retries=2) ->
     return prices
 
 
-# Temporary cache for structure orders
-structure_order_cache = defaultdict(list)
-
 #TODO: add search by region
 
 
-# Cache becomes: { station_id: (timestamp, [orders]) }
+# Cache becomes: { station_id: (timestamp, OrderBookIndex) }
 structure_order_cache = {}
 
 CACHE_TTL = 60 * 5  # 5 minutes
@@ -706,6 +675,14 @@ def get_station_sell_price(type_id, station_id, headers):
     cached = structure_order_cache.get(station_id)
     use_cache = False
 
+    # Prices persisted by an earlier process answer without refetching the structure
+    if not cached and price_store.fetched_marker(station_id, CACHE_TTL):
+        entry = price_store.get_fresh(type_id, station_id, CACHE_TTL)
+        if entry:
+            return entry["price"], "structure"
+        logger.warning(f"No sell orders for type_id {type_id} at structure {station_id}")
+        return None, "not_found"
+
     if cached:
         age = now - cached[0]
         if age < CACHE_TTL:
@@ -716,49 +693,31 @@ def get_station_sell_price(type_id, station_id, headers):
 
     if not use_cache:
         url = f"https://esi.evetech.net/latest/markets/structures/{station_id}/"
-        all_orders = []
-        page = 1
 
         try:
             logger.info(f"Fetching structure orders at {station_id}")
 
-            while True:
-                paged_url = f"{url}?page={page}"
-                res = requests.get(paged_url, headers=headers)
-
-                if res.status_code == 500:
-                    logger.warning(f"Server error on page {page} — stopping early.")
-                    break
-
-                res.raise_for_status()
-                page_orders = res.json()
-                all_orders.extend(page_orders)
+            # A page that fails after retries raises: a partial book would price items wrong
+            responses = fetch_all_pages(url, headers=headers, session=get_esi_session())
+            all_orders = [order for res in responses for order in res.json()]
+            logger.info(f"Fetched {len(responses)} pages with {len(all_orders)} orders.")
 
-                logger.info(f"Fetched page {page} with {len(page_orders)} orders.")
-                if len(page_orders) < 1000:
-                    break
-                page += 1
-
-            # Update cache
-            structure_order_cache[station_id] = (now, all_orders)
+            # Index once per fetch; every lookup until the TTL runs out is a dict hit
+            book = OrderBookIndex(all_orders, fetched_at=now)
+            structure_order_cache[station_id] = (now, book)
+            price_store.put_many(station_id, book.lowest, "structure", fetched_at=now)
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to fetch structure orders from {station_id}: {e}")
             return None, "error"
     else:
-        all_orders = cached[1]
-
-    # Filter sell orders for this type_id
-    sell_orders = [
-        order for order in all_orders
-        if not order['is_buy_order'] and order['type_id'] == type_id
-    ]
+        book = cached[1]
 
-    if not sell_orders:
+    lowest = book.lowest_price(type_id)
+    if lowest is None:
         logger.warning(f"No sell orders for type_id {type_id} at structure {station_id}")
         return None, "not_found"
 
-    lowest = min(order['price'] for order in sell_orders)
     logger.info(f"Lowest sell price for type_id {type_id} at structure {station_id}: {lowest}")
 
     return lowest, "structure"
@@ -772,7 +731,7 @@ def refresh_access_token():
     if not refresh_token:
         return None
 
-    response = requests.post(
+    response = get_esi_session().post(
         TOKEN_URL,
         auth=(CLIENT_ID, CLIENT_SECRET),
         data={"grant_type": "refresh_token", "refresh_token": refresh_token},
@@ -808,35 +767,22 @@ def fetch_market_price(blueprint_name, region_id, station_id=None, use_region=Fa
         type_id = type_data['inventory_types'][0]['id']
 
         # Market orders query
-        orders = []
-        page = 1
-        while True:
-            params = {
-                'type_id': type_id,
-                'order_type': 'sell',
-                'page': page
-            }
-            
-            if use_region:
-                endpoint = f"markets/{region_id}/orders/"
-            else:
-                endpoint = f"markets/structures/{station_id}/"
+        if use_region:
+            endpoint = f"markets/{region_id}/orders/"
+        else:
+            endpoint = f"markets/structures/{station_id}/"
 
-            orders_resp = session.get(
+        try:
+            responses = fetch_all_pages(
                 f"https://esi.evetech.net/latest/{endpoint}",
-                params=params
+                params={'type_id': type_id, 'order_type': 'sell'},
+                session=session
             )
-            
-            if orders_resp.status_code == 403:
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 403:
                 raise ValueError("Structure market access not allowed")
-                
-            orders_resp.raise_for_status()
-            page_orders = orders_resp.json()
-            orders.extend(page_orders)
-
-            if len(page_orders) < 1000:
-                break
-            page += 1
+            raise
+        orders = [order for res in responses for order in res.json()]
 
         # Price determination logic
         if use_region:
@@ -1,5 +1,5 @@
 import logging
-from app import create_app
+from app import create_app, start_background_tasks
 from waitress import serve
 import webbrowser
 import sys
@@ -34,6 +34,7 @@ if __name__ == '__main__':
         logger.info("2. Click 'Optimize Production' to calculate the most profitable manufacturing plan")
         logger.info("3. Press Ctrl+C in this terminal to stop the server")
         
+        start_background_tasks(app)
         serve(app, host=host, port=port)
     except Exception as e:
         logger.error(f"An error occurred: {str(e)}")
@@ -0,0 +1,114 @@
+"""
+Compare dependency expansion on deep T2/reaction chains: the old helpers that
+find sub-blueprints by scanning the blueprint list against the BomGraph ones,
+and one vectorized BomGraph.explode() of the whole plan against summing the
+legacy per-blueprint expansions.
+
+    python test/bench_bom_graph.py [--depths 3 5 8] [--width 40]
+"""
+import argparse
+import logging
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from routes.bom_graph import BomGraph
+from routes.utils import accumulate_materials, expand_materials_clean, normalize_materials_structure
+from synthetic_catalog import make_chain_catalog
+
+
+def legacy_expand_materials_clean(bp, blueprints, quantity=1):
+    expanded = defaultdict(float)
+    normalized = normalize_materials_structure(bp.materials)
+    amt_per_run = getattr(bp, "amt_per_run", 1)
+    runs_needed = math.ceil(quantity / amt_per_run)
+    units_produced = runs_needed * amt_per_run
+    usage_ratio = quantity / units_produced if units_produced > 0 else 0
+
+    for section_name, section in normalized.items():
+        for mat, qty_per_run in section.items():
+            sub_bp = next((b for b in blueprints if b.name == mat), None)
+            adjusted_mat_needed = qty_per_run * runs_needed * usage_ratio
+            if section_name == "Invention Materials" and getattr(bp, "invention_chance", None):
+                adjusted_mat_needed = qty_per_run * (runs_needed / bp.invention_chance) * usage_ratio
+            if sub_bp:
+                for sm, sq in legacy_expand_materials_clean(sub_bp, blueprints, adjusted_mat_needed).items():
+                    expanded[sm] += sq
+            else:
+                expanded[mat] += adjusted_mat_needed
+    return expanded
+
+
+def legacy_accumulate_materials(blueprint, quantity, total_needed, item_needs, blueprints):
+    runs_per_copy = getattr(blueprint, 'runs_per_copy', 1)
+    for category, materials in normalize_materials_structure(blueprint.materials).items():
+        for mat_name, mat_qty in materials.items():
+            adjusted_qty = mat_qty * quantity
+            if category == "Invention Materials" and getattr(blueprint, "invention_chance", None):
+                adjusted_qty = (mat_qty * quantity / blueprint.invention_chance) / runs_per_copy
+            total_needed[mat_name] = total_needed.get(mat_name, 0) + adjusted_qty
+            if any(b.name == mat_name for b in blueprints):
+                item_needs[mat_name] = item_needs.get(mat_name, 0) + adjusted_qty
+
+
+def resolve_all(blueprints, tops, expand, accumulate):
+    """Full expansion of every top-level blueprint plus a layer-by-layer accumulate pass."""
+    for bp in tops:
+        expand(bp, blueprints, quantity=10)
+
+    by_name = {b.name: b for b in blueprints}
+    total_needed, to_build = {}, {bp.name: 10 for bp in tops}
+    while to_build:
+        item_needs = {}
+        for name, qty in to_build.items():
+            accumulate(by_name[name], qty, total_needed, item_needs, blueprints)
+        to_build = item_needs
+    return total_needed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depths", type=int, nargs="+", default=[3, 5, 7])
+    parser.add_argument("--width", type=int, default=30)
+    args = parser.parse_args()
+    logging.disable(logging.DEBUG)
+
+    print(f"{'depth':>5} {'blueprints':>10} {'legacy ms':>10} {'graph ms':>9} {'speedup':>8} {'explode ms':>10}")
+    for depth in args.depths:
+        blueprints, _ = make_chain_catalog(depth, width=args.width)
+        tops = [b for b in blueprints if b.tier == "T2"]
+
+        started = time.perf_counter()
+        legacy = resolve_all(blueprints, tops, legacy_expand_materials_clean, legacy_accumulate_materials)
+        legacy_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        graph = BomGraph(blueprints)
+        new = resolve_all(graph, tops, expand_materials_clean, accumulate_materials)
+        graph_ms = (time.perf_counter() - started) * 1000
+
+        assert legacy.keys() == new.keys()
+        assert all(math.isclose(legacy[k], new[k], rel_tol=1e-9) for k in legacy)
+
+        # Whole plan in one explosion, checked against the legacy per-blueprint sum
+        plan = {bp.name: 10 for bp in tops}
+        started = time.perf_counter()
+        exploded = BomGraph(blueprints).explode(plan)
+        explode_ms = (time.perf_counter() - started) * 1000
+
+        expected = defaultdict(float)
+        for bp in tops:
+            for mat, qty in legacy_expand_materials_clean(bp, blueprints, quantity=10).items():
+                expected[mat] += qty
+        assert expected.keys() == exploded.keys()
+        assert all(math.isclose(expected[k], exploded[k], rel_tol=1e-9) for k in expected)
+
+        print(f"{depth:>5} {len(blueprints):>10} {legacy_ms:>10.1f} {graph_ms:>9.1f} {legacy_ms / graph_ms:>7.1f}x {explode_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
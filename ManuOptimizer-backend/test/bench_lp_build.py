@@ -0,0 +1,72 @@
+"""
+Compare /optimize model construction: the old per-term LpAffineExpression
+accumulation against ProductionModel's CSR build + batch PuLP emit.
+
+    python test/bench_lp_build.py [--sizes 50 150 300 3000]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pulp import LpAffineExpression, LpMaximize, LpProblem, LpVariable, lpSum
+from routes.lp_model import ProductionModel
+from routes.utils import normalize_materials_structure, sanitize_name
+from synthetic_catalog import SYNTHETIC_SIZES, make_catalog
+
+
+def legacy_build(blueprints, inventory):
+    sanitized_inventory = {sanitize_name(name): qty for name, qty in inventory.items()}
+    x = {sanitize_name(b.name): LpVariable(sanitize_name(b.name), lowBound=0, cat='Integer') for b in blueprints}
+    prob = LpProblem("MaxProfit", LpMaximize)
+    profit_per_bp = {}
+    for b in blueprints:
+        s_name = sanitize_name(b.name)
+        profit_per_bp[s_name] = (b.sell_price - (b.full_material_cost if b.tier == 'T2' else b.material_cost)) / b.amt_per_run
+    prob += lpSum(profit_per_bp[s_name] * x[s_name] for s_name in x.keys())
+
+    consumption = defaultdict(LpAffineExpression)
+    production = defaultdict(LpAffineExpression)
+    for b in blueprints:
+        s_bp_name = sanitize_name(b.name)
+        production[s_bp_name] += b.amt_per_run * x[s_bp_name]
+        for section in normalize_materials_structure(b.materials).values():
+            for mat_name, qty_per_run in section.items():
+                consumption[sanitize_name(mat_name)] += qty_per_run * x[s_bp_name]
+
+    for s_item_name in set(sanitized_inventory) | set(consumption) | set(production):
+        prob += (consumption.get(s_item_name, 0) - production.get(s_item_name, 0)
+                 <= sanitized_inventory.get(s_item_name, 0)), f"MaterialBalance_{s_item_name}"
+    for b in blueprints:
+        if b.max is not None:
+            s_name = sanitize_name(b.name)
+            prob += x[s_name] <= b.max, f"MaxProd_{s_name}"
+    return prob
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SYNTHETIC_SIZES) + [3000])
+    args = parser.parse_args()
+
+    print(f"{'blueprints':>10} {'legacy ms':>10} {'build ms':>9} {'emit ms':>8} {'speedup':>8}")
+    for size in args.sizes:
+        blueprints, inventory = make_catalog(size, materials_per_bp=12)
+
+        started = time.perf_counter()
+        legacy_build(blueprints, inventory)
+        legacy_ms = (time.perf_counter() - started) * 1000
+
+        model = ProductionModel(blueprints, inventory)
+        model.to_pulp()
+        new_ms = model.timings["build_ms"] + model.timings["emit_ms"]
+
+        print(f"{size:>10} {legacy_ms:>10.1f} {model.timings['build_ms']:>9.1f} "
+              f"{model.timings['emit_ms']:>8.1f} {legacy_ms / new_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
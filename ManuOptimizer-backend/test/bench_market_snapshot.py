@@ -0,0 +1,139 @@
+"""
+Benchmark the region market snapshot against the old one-request-per-type_id path.
+
+Record a fixture once (needs network):
+    python test/bench_market_snapshot.py --record test/fixtures/forge_orders
+
+Replay it offline:
+    python test/bench_market_snapshot.py --fixture test/fixtures/forge_orders --types 300 --latency 150
+
+Without a fixture, --synthetic N generates N pages of fake orders instead.
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.market import ESI_BASE_URL, MarketSnapshot
+from routes.utils import JITA_REGION_ID, JITA_STATION_ID
+
+
+HEADERS = {'User-Agent': 'ManuOptimizer 1.0 nariod14@gmail.com'}
+
+
+class ReplayResponse:
+    def __init__(self, orders, total_pages):
+        self.status_code = 200
+        self.headers = {"X-Pages": str(total_pages)}
+        self._orders = orders
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._orders
+
+
+class ReplaySession:
+    """Serves recorded pages and sleeps `latency` seconds per request to stand in for ESI."""
+
+    def __init__(self, pages, latency):
+        self.pages = pages
+        self.latency = latency
+        self.requests = 0
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.requests += 1
+        time.sleep(self.latency)
+        page = (params or {}).get("page", 1)
+        return ReplayResponse(self.pages[page - 1], len(self.pages))
+
+
+def record(fixture_dir):
+    from routes.utils import create_esi_session
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    session = create_esi_session()
+    url = f"{ESI_BASE_URL}/markets/{JITA_REGION_ID}/orders/"
+    page, total_pages = 1, 1
+    while page <= total_pages:
+        res = session.get(url, params={"order_type": "sell", "page": page}, headers=HEADERS, timeout=20)
+        res.raise_for_status()
+        total_pages = int(res.headers.get("X-Pages", 1))
+        with gzip.open(os.path.join(fixture_dir, f"page_{page:04d}.json.gz"), "wt") as f:
+            json.dump(res.json(), f)
+        print(f"Recorded page {page}/{total_pages}")
+        page += 1
+
+
+def load_fixture(fixture_dir):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "page_*.json.gz"))):
+        with gzip.open(path, "rt") as f:
+            pages.append(json.load(f))
+    if not pages:
+        raise SystemExit(f"No recorded pages in {fixture_dir}, run with --record first")
+    return pages
+
+
+def synthetic_pages(page_count, seed=42):
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(page_count):
+        pages.append([
+            {
+                "type_id": rng.randint(18, 60000),
+                "price": round(rng.uniform(1, 1e7), 2),
+                "location_id": JITA_STATION_ID if rng.random() < 0.4 else rng.randint(60000000, 60010000),
+                "is_buy_order": False,
+                "volume_remain": rng.randint(1, 10000),
+            }
+            for _ in range(1000)
+        ])
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", metavar="DIR")
+    parser.add_argument("--fixture", metavar="DIR")
+    parser.add_argument("--synthetic", type=int, default=50, metavar="PAGES")
+    parser.add_argument("--types", type=int, default=300, help="catalog size (distinct type_ids to price)")
+    parser.add_argument("--latency", type=float, default=150, help="simulated ESI round trip in ms")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record)
+        return
+
+    pages = load_fixture(args.fixture) if args.fixture else synthetic_pages(args.synthetic)
+    latency = args.latency / 1000.0
+
+    snapshot = MarketSnapshot()
+    session = ReplaySession(pages, latency)
+    started = time.perf_counter()
+    snapshot.refresh(HEADERS, session=session)
+    refresh_time = time.perf_counter() - started
+
+    type_ids = sorted(snapshot.region_lowest)[:args.types]
+    started = time.perf_counter()
+    for tid in type_ids:
+        snapshot.get_price(tid)
+    lookup_time = time.perf_counter() - started
+
+    # The per-type path costs one round trip per type_id (10 in flight at once)
+    per_type_time = len(type_ids) * latency / 10
+
+    print(f"pages={len(pages)} orders={snapshot.orders} types_indexed={len(snapshot.region_lowest)}")
+    print(f"snapshot: {session.requests} requests, refresh {refresh_time:.3f}s, "
+          f"{len(type_ids)} lookups {lookup_time * 1000:.3f}ms")
+    print(f"per-type: {len(type_ids)} requests, ~{per_type_time:.3f}s at {args.latency:.0f}ms / 10 workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Compare the production LP solver backends on the synthetic catalog sizes.
+
+    python test/bench_solvers.py [--sizes 50 150 300] [--solvers cbc highs]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from routes.lp_model import ProductionModel
+from routes.solvers import SOLVERS, solve
+from synthetic_catalog import SYNTHETIC_SIZES, make_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SYNTHETIC_SIZES))
+    parser.add_argument("--solvers", nargs="+", default=list(SOLVERS), choices=list(SOLVERS))
+    args = parser.parse_args()
+
+    print(f"{'blueprints':>10} {'solver':>7} {'build ms':>9} {'emit ms':>8} {'solve ms':>10} {'objective':>16}  status")
+    for size in args.sizes:
+        blueprints, inventory = make_catalog(size)
+        for solver_name in args.solvers:
+            model = ProductionModel(blueprints, inventory)
+            solve(model, solver_name)
+            print(f"{size:>10} {solver_name:>7} {model.timings['build_ms']:>9.1f} "
+                  f"{model.timings.get('emit_ms', 0):>8.1f} {model.timings['solve_ms']:>10.1f} "
+                  f"{model.objective or 0:>16.2f}  {model.status}")
+
+
+if __name__ == "__main__":
+    main()
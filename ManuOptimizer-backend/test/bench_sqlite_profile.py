@@ -0,0 +1,111 @@
+"""
+Benchmark readers against a concurrent writer with and without the SQLite profile.
+
+A writer thread keeps repricing the whole material table in one transaction, like
+update_prices committing a refresh, while reader threads run 500-row reads
+the request handlers do. With the default rollback journal, readers stall whenever the
+writer spills or commits; under WAL they keep reading the last committed snapshot.
+
+    python test/bench_sqlite_profile.py --rows 200000 --readers 4 --seconds 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, text
+from routes import db_profile
+
+
+def build(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE material (id INTEGER PRIMARY KEY, name TEXT UNIQUE, quantity INTEGER, sell_price FLOAT)"
+        )
+        conn.execute(
+            text("INSERT INTO material (name, quantity, sell_price) VALUES (:name, :quantity, :sell_price)"),
+            [{"name": f"Item {i}", "quantity": i % 1000, "sell_price": 1.0} for i in range(rows)],
+        )
+    engine.dispose()
+
+
+def run(path, rows, tuned, readers, seconds):
+    uri = f"sqlite:///{path}"
+    engine = create_engine(uri, **(db_profile.engine_options(uri, pool_size=readers + 1) if tuned else {}))
+    if tuned:
+        db_profile.install(engine)
+    else:
+        # Undo what a previous tuned run left in the file header
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=DELETE")
+
+    stop = threading.Event()
+    latencies, errors, commits = [], [0], [0]
+    lock = threading.Lock()
+
+    def writer():
+        rng = random.Random(1)
+        while not stop.is_set():
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("UPDATE material SET sell_price = :p"), {"p": rng.uniform(1, 1e6)})
+                commits[0] += 1
+            except Exception:
+                errors[0] += 1
+
+    def reader():
+        rng = random.Random(threading.get_ident())
+        while not stop.is_set():
+            first = rng.randint(1, rows - 500)
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(
+                        text("SELECT id, quantity, sell_price FROM material WHERE id BETWEEN :a AND :b"),
+                        {"a": first, "b": first + 500},
+                    ).fetchall()
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    latencies.sort()
+    ms = lambda s: s * 1000
+    print(f"{'tuned' if tuned else 'default':>7}: {len(latencies)} reads, {commits[0]} commits, {errors[0]} errors, "
+          f"read p50 {ms(statistics.median(latencies)):.1f}ms "
+          f"p95 {ms(latencies[int(len(latencies) * 0.95)]):.1f}ms max {ms(latencies[-1]):.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build(path, args.rows)
+        run(path, args.rows, False, args.readers, args.seconds)
+        run(path, args.rows, True, args.readers, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
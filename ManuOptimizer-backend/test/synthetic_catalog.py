@@ -0,0 +1,103 @@
+"""Seeded synthetic blueprint catalogs for the optimizer benchmarks."""
+import random
+from types import SimpleNamespace
+
+# Catalog sizes (number of blueprints) the benchmarks run against
+SYNTHETIC_SIZES = (50, 150, 300)
+
+MINERALS = ["Tritanium", "Pyerite", "Mexallon", "Isogen", "Nocxium", "Zydrine", "Megacyte", "Morphite"]
+
+
+def make_catalog(size, seed=7, base_materials=60, materials_per_bp=8):
+    """
+    Returns (blueprints, inventory). Roughly a third of the blueprints are
+    components that other blueprints consume, a tenth are T2 with invention
+    materials, the rest are T1 end products.
+    """
+    rng = random.Random(seed)
+    bases = MINERALS + [f"Base Material {i}" for i in range(base_materials - len(MINERALS))]
+    datacores = [f"Datacore {i}" for i in range(10)]
+
+    blueprints = []
+    components = []
+    for i in range(size):
+        roll = rng.random()
+        if roll < 0.33:
+            tier, name = "T1", f"Component {i}"
+        elif roll < 0.43 and components:
+            tier, name = "T2", f"Module {i} II"
+        else:
+            tier, name = "T1", f"Module {i}"
+
+        materials = {"Minerals": {}, "Items": {}}
+        for mat in rng.sample(bases, min(materials_per_bp, len(bases))):
+            materials["Minerals"][mat] = rng.randint(1, 500)
+        if components and not name.startswith("Component"):
+            for comp in rng.sample(components, min(3, len(components))):
+                materials["Items"][comp] = rng.randint(1, 20)
+        if tier == "T2":
+            materials["Invention Materials"] = {dc: rng.randint(1, 4) for dc in rng.sample(datacores, 2)}
+
+        material_cost = sum(materials["Minerals"].values()) * rng.uniform(3, 8)
+        bp = SimpleNamespace(
+            id=i + 1,
+            type_id=100000 + i,
+            name=name,
+            tier=tier,
+            materials=materials,
+            amt_per_run=rng.choice([1, 1, 1, 10, 100]),
+            sell_price=material_cost * rng.uniform(0.8, 1.6),
+            material_cost=material_cost,
+            full_material_cost=material_cost * 1.1,
+            invention_chance=0.34 if tier == "T2" else None,
+            runs_per_copy=10 if tier == "T2" else 1,
+            max=rng.choice([None, None, rng.randint(1, 50)]),
+        )
+        blueprints.append(bp)
+        if name.startswith("Component"):
+            components.append(name)
+
+    inventory = {mat: rng.randint(0, 200000) for mat in bases + datacores}
+    return blueprints, inventory
+
+
+def make_chain_catalog(depth, width=20, seed=7, inputs_per_bp=3):
+    """
+    Returns (blueprints, inventory) for a layered T2/reaction-style chain:
+    layer 0 reactions consume raw moon materials, every later layer consumes
+    items from the layer below, and the top layer is T2 with invention
+    materials. Expanding a top-level blueprint walks all `depth` layers.
+    """
+    rng = random.Random(seed)
+    raws = [f"Moon Material {i}" for i in range(16)] + MINERALS
+    datacores = [f"Datacore {i}" for i in range(10)]
+
+    blueprints = []
+    below = raws
+    for layer in range(depth):
+        top = layer == depth - 1
+        names = [f"Layer {layer} Item {i}" + (" II" if top else "") for i in range(width)]
+        for name in names:
+            materials = {"Items": {mat: rng.randint(1, 10) for mat in rng.sample(below, min(inputs_per_bp, len(below)))}}
+            materials["Minerals"] = {mat: rng.randint(10, 200) for mat in rng.sample(MINERALS, 2)}
+            if top:
+                materials["Invention Materials"] = {dc: rng.randint(1, 4) for dc in rng.sample(datacores, 2)}
+            material_cost = rng.uniform(1e4, 1e6)
+            blueprints.append(SimpleNamespace(
+                id=len(blueprints) + 1,
+                type_id=200000 + len(blueprints),
+                name=name,
+                tier="T2" if top else "T1",
+                materials=materials,
+                amt_per_run=rng.choice([1, 1, 10, 100]) if layer == 0 else 1,
+                sell_price=material_cost * rng.uniform(0.8, 1.6),
+                material_cost=material_cost,
+                full_material_cost=material_cost * 1.1,
+                invention_chance=0.34 if top else None,
+                runs_per_copy=10 if top else 1,
+                max=None,
+            ))
+        below = names
+
+    inventory = {mat: rng.randint(0, 200000) for mat in raws + datacores}
+    return blueprints, inventory
@@ -0,0 +1,183 @@
+import sys
+import os
+import asyncio
+import socket
+import threading
+import time
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from aiohttp import web
+from routes.async_fetch import AsyncPriceFetcher
+from routes.esi_client import ErrorLimitTracker, EsiSession
+from routes.price_cache import price_store
+from routes.utils import JITA_STATION_ID, structure_order_cache
+
+STRUCTURE_ID = 1035466617946
+
+
+class FakeEsi:
+    """A local aiohttp app answering the two market endpoints the fetcher uses."""
+
+    def __init__(self, delay=0.05, fail_first=0):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.structure_pages = 1
+        self.failing_structure_page = None
+
+    async def region_orders(self, request):
+        self.calls.append(("region", request.query.get("type_id")))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return web.Response(status=503)
+            type_id = int(request.query["type_id"])
+            return web.json_response([
+                {"type_id": type_id, "price": 10.0 + type_id, "location_id": JITA_STATION_ID, "is_buy_order": False},
+                {"type_id": type_id, "price": 1.0, "location_id": 1, "is_buy_order": False},
+            ], headers={"X-ESI-Error-Limit-Remain": "100", "X-ESI-Error-Limit-Reset": "60"})
+        finally:
+            self.in_flight -= 1
+
+    async def structure_orders(self, request):
+        page = int(request.query.get("page", 1))
+        self.calls.append(("structure", str(page)))
+        await asyncio.sleep(self.delay)
+        if page == self.failing_structure_page:
+            return web.Response(status=404)
+        headers = {"X-Pages": str(self.structure_pages)}
+        return web.json_response([{"type_id": 33 + page, "price": 4.0 * page, "is_buy_order": False}], headers=headers)
+
+
+@pytest.fixture
+def fake_esi():
+    fake = FakeEsi()
+    app = web.Application()
+    app.router.add_get("/markets/{region_id}/orders/", fake.region_orders)
+    app.router.add_get("/markets/structures/{station_id}/", fake.structure_orders)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    yield fake, f"http://127.0.0.1:{port}"
+
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def fresh_type_ids(start, count):
+    ids = list(range(start, start + count))
+    for tid in ids:
+        price_store._entries.pop((tid, JITA_STATION_ID), None)
+    return ids
+
+
+def test_duplicate_jobs_share_one_request(fake_esi):
+    fake, base_url = fake_esi
+    fetcher = AsyncPriceFetcher(concurrency=4, base_url=base_url)
+    try:
+        tid = fresh_type_ids(900001, 1)[0]
+        results = fetcher.fetch_prices([(tid, None), (tid, None)], {})
+        assert results == [(tid, (10.0 + tid, "jita"), False)]
+
+        # Concurrent callers for the same key wait on the same in-flight request
+        tid2 = fresh_type_ids(900002, 1)[0]
+
+        async def race():
+            return await asyncio.gather(*(fetcher.jita_price(tid2, {}) for _ in range(5)))
+
+        assert fetcher.run(race()) == [(10.0 + tid2, "jita")] * 5
+        assert [c for c in fake.calls if c[0] == "region"] == [("region", str(tid)), ("region", str(tid2))]
+    finally:
+        fetcher.close()
+
+
+def test_concurrency_limit_and_station_fallback(fake_esi):
+    fake, base_url = fake_esi
+    fetcher = AsyncPriceFetcher(concurrency=3, base_url=base_url)
+    try:
+        ids = fresh_type_ids(900100, 12)
+        jobs = [(tid, None) for tid in ids] + [(34, STRUCTURE_ID), (ids[0], STRUCTURE_ID)]
+        results = {(tid, fallback): data for tid, data, fallback in fetcher.fetch_prices(jobs, {})}
+
+        assert fake.max_in_flight <= 3
+        assert results[(34, False)] == (4.0, "structure")
+        assert results[(ids[0], True)][0] == 10.0 + ids[0]  # Not sold at the structure, Jita fallback
+        assert len([c for c in fake.calls if c[0] == "region"]) == len(ids)
+        assert [c for c in fake.calls if c[0] == "structure"] == [("structure", "1")]
+    finally:
+        fetcher.close()
+
+
+def test_server_errors_are_retried(fake_esi):
+    fake, base_url = fake_esi
+    fake.fail_first = 2
+    fetcher = AsyncPriceFetcher(base_url=base_url, retries=3, backoff=0.01)
+    try:
+        tid = fresh_type_ids(900200, 1)[0]
+        assert fetcher.fetch_prices([(tid, None)], {}) == [(tid, (10.0 + tid, "jita"), False)]
+        assert len(fake.calls) == 3
+
+        fake.fail_first = 5
+        tid = fresh_type_ids(900201, 1)[0]
+        assert fetcher.fetch_prices([(tid, None)], {}) == [(tid, (None, "error"), False)]
+    finally:
+        fetcher.close()
+
+
+def test_structure_pages_are_fetched_concurrently(fake_esi):
+    fake, base_url = fake_esi
+    fake.structure_pages = 6
+    fetcher = AsyncPriceFetcher(concurrency=10, base_url=base_url)
+    try:
+        started = time.perf_counter()
+        book = fetcher.run(fetcher.station_orders(STRUCTURE_ID + 1, {}))
+        elapsed = time.perf_counter() - started
+
+        assert sorted(book.lowest) == list(range(34, 40))
+        assert book.lowest_price(39) == 24.0
+        assert sorted(int(page) for kind, page in fake.calls if kind == "structure") == list(range(1, 7))
+        assert elapsed < 6 * fake.delay  # Page 1, then pages 2-6 side by side
+
+        # A failed page fails the whole fetch rather than caching a partial book
+        fake.failing_structure_page = 4
+        assert fetcher.fetch_prices([(34, STRUCTURE_ID + 2)], {})[0][1] != (4.0, "structure")
+        assert STRUCTURE_ID + 2 not in structure_order_cache
+    finally:
+        fetcher.close()
+
+
+def test_a_low_budget_seen_by_the_session_pauses_the_fetcher(fake_esi):
+    fake, base_url = fake_esi
+    tracker = ErrorLimitTracker(floor=10)
+    session = EsiSession(error_limit=tracker)
+    fetcher = AsyncPriceFetcher(base_url=base_url, error_limit=tracker)
+    try:
+        session._track_error_limit(SimpleNamespace(
+            headers={"X-ESI-Error-Limit-Remain": "3", "X-ESI-Error-Limit-Reset": "1"}
+        ))
+        tid = fresh_type_ids(900300, 1)[0]
+        started = time.perf_counter()
+        assert fetcher.fetch_prices([(tid, None)], {}) == [(tid, (10.0 + tid, "jita"), False)]
+        assert time.perf_counter() - started >= 0.5
+        # The fetcher's own response reset the shared budget for the session too
+        assert tracker.remain == 100
+        assert tracker.wait_time() == 0
+    finally:
+        fetcher.close()
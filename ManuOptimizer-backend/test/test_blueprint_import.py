@@ -0,0 +1,136 @@
+import sys
+import os
+import sqlite3
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from flask import Flask
+from models import Blueprint, BlueprintT2, ReactionFormula, db
+from routes import blueprint_import, blueprints
+from routes.sde import SdeIndex
+
+
+TYPES = [
+    (34, 'Tritanium', 'Minerals'), (35, 'Pyerite', 'Minerals'), (20410, 'Datacore - Mechanical Engineering', 'Invention Materials'),
+    (16633, 'Hydrocarbons', 'Reaction Materials'), (587, 'Rifter', 'Items'), (691, 'Rifter Blueprint', None),
+    (11377, 'Jaguar', 'Items'), (11378, 'Jaguar Blueprint', None), (16659, 'Carbon Polymers', 'Reaction Materials'),
+    (46166, 'Carbon Polymers Reaction Formula', None), (222, 'Antimatter Charge S', 'Items'), (1137, 'Antimatter Charge S Blueprint', None),
+]
+
+INDUSTRY = '''
+    CREATE TABLE industryActivityMaterials (typeID INTEGER, activityID INTEGER, materialTypeID INTEGER, quantity INTEGER);
+    CREATE TABLE industryActivityProducts (typeID INTEGER, activityID INTEGER, productTypeID INTEGER, quantity INTEGER);
+    CREATE TABLE industryActivityProbabilities (typeID INTEGER, activityID INTEGER, productTypeID INTEGER, probability REAL);
+    INSERT INTO industryActivityMaterials VALUES
+        (691, 1, 34, 32000), (691, 1, 35, 6000), (691, 8, 20410, 2),
+        (11378, 1, 587, 1), (11378, 1, 34, 1000),
+        (46166, 11, 16633, 100),
+        (1137, 1, 34, 300);
+    INSERT INTO industryActivityProducts VALUES
+        (691, 1, 587, 1), (691, 8, 11378, 10),
+        (11378, 1, 11377, 1),
+        (46166, 11, 16659, 200),
+        (1137, 1, 222, 100);
+    INSERT INTO industryActivityProbabilities VALUES (691, 8, 11378, 0.34);
+'''
+
+
+def build_sde(path, with_industry=True):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE types (typeID INTEGER PRIMARY KEY, typeName TEXT);
+        CREATE TABLE materialClassifications (
+            typeID INTEGER PRIMARY KEY, typeName TEXT, groupID INTEGER, groupName TEXT,
+            categoryID INTEGER, categoryName TEXT, manufacturingCategory TEXT
+        );
+    ''' + (INDUSTRY if with_industry else ''))
+    conn.executemany("INSERT INTO types VALUES (?, ?)", [(t, n) for t, n, _ in TYPES])
+    conn.executemany(
+        "INSERT INTO materialClassifications (typeID, typeName, manufacturingCategory) VALUES (?, ?, ?)",
+        [(t, n, c) for t, n, c in TYPES if c]
+    )
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = SdeIndex(build_sde(tmp_path / "mini_sde.sqlite"))
+    monkeypatch.setattr(blueprint_import, "sde_index", index)
+    monkeypatch.setattr(blueprints, "sde_index", index)
+    return index
+
+
+@pytest.fixture
+def client(index):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(app)
+    app.register_blueprint(blueprints.blueprints_bp)
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.session.remove()
+
+
+def test_recipes_follow_invention_back_to_the_t1_blueprint(index):
+    recipes = index.industry_recipes([587, 11377, 16659])
+    assert recipes[587]["materials"] == [(34, 32000), (35, 6000)]
+    assert recipes[587]["invention"] is None
+    assert recipes[11377]["invention"] == {
+        "blueprint_type_id": 691, "probability": 0.34, "runs": 10, "materials": [(20410, 2)],
+    }
+    assert recipes[16659]["activity_id"] == 11
+    assert recipes[16659]["quantity"] == 200
+
+
+def test_specs_carry_tier_runs_and_sections(index):
+    specs, not_found = blueprint_import.blueprint_specs([11377, 16659, 222, 424242])
+    by_name = {s["name"]: s for s in specs}
+
+    assert not_found == [424242]
+    assert by_name["Jaguar"] == {
+        "name": "Jaguar", "type_id": 11377, "tier": "T2", "amt_per_run": 1,
+        "materials": {
+            "Items": {"Rifter": 1},
+            "Minerals": {"Tritanium": 1000},
+            "Invention Materials": {"Datacore - Mechanical Engineering": 2},
+        },
+        "invention_chance": 0.34, "runs_per_copy": 10,
+    }
+    assert by_name["Carbon Polymers"]["tier"] == "Reaction"
+    assert by_name["Carbon Polymers"]["materials"] == {"Reaction Materials": {"Hydrocarbons": 100}}
+    assert by_name["Antimatter Charge S"]["amt_per_run"] == 100
+
+
+def test_import_endpoint_creates_then_updates(client):
+    response = client.post('/api/blueprints/blueprints/import', json={"type_ids": [587, 11377, 16659, 424242]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["created"], body["updated"], body["replaced"], body["not_found"]) == (3, 0, 0, [424242])
+
+    assert isinstance(Blueprint.query.filter_by(name="Rifter").one(), Blueprint)
+    assert BlueprintT2.query.filter_by(name="Jaguar").one().runs_per_copy == 10
+    assert ReactionFormula.query.filter_by(name="Carbon Polymers").one().amt_per_run == 200
+
+    body = client.post('/api/blueprints/blueprints/import', json={"type_ids": [587, 11377], "station_id": 60003760}).get_json()
+    assert (body["created"], body["updated"]) == (0, 2)
+    assert Blueprint.query.count() == 3
+
+
+def test_import_replaces_rows_whose_tier_changed(client):
+    db.session.add(Blueprint(name="Jaguar", type_id=11377, sell_price=1.0, material_cost=0.0))
+    db.session.commit()
+
+    body = client.post('/api/blueprints/blueprints/import', json={"type_ids": [11377]}).get_json()
+    assert body["replaced"] == 1
+    jaguar = Blueprint.query.filter_by(name="Jaguar").one()
+    assert isinstance(jaguar, BlueprintT2) and jaguar.invention_chance == 0.34
+
+
+def test_import_rejects_bad_input_and_old_sdes(client, tmp_path, monkeypatch):
+    assert client.post('/api/blueprints/blueprints/import', json={"type_ids": ["x"]}).status_code == 400
+    assert client.post('/api/blueprints/blueprints/import', json={}).status_code == 400
+
+    monkeypatch.setattr(blueprints, "sde_index", SdeIndex(build_sde(tmp_path / "old.sqlite", with_industry=False)))
+    assert client.post('/api/blueprints/blueprints/import', json={"type_ids": [587]}).status_code == 503
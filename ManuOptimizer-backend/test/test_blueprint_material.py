@@ -0,0 +1,136 @@
+import sys
+import os
+import importlib.util
+import json
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from flask import Flask
+from models import Blueprint, BlueprintMaterial, BlueprintT2, db
+from routes.price_ledger import blueprints_by_type_id
+from routes.utils import build_material_rows, get_material_category_lookup
+
+MIGRATION = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'alembic', 'versions', 'e5a1c7f04d2b_add_blueprint_material_table.py'
+)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def test_materials_round_trip_through_rows(app):
+    db.session.add(Blueprint(
+        name="Rifter", sell_price=0, material_cost=0, material_rows=build_material_rows(
+            {"Minerals": {"Tritanium": 32000, "Pyerite": 6000}, "Other": {"Unobtainium": 2.5}}
+        )
+    ))
+    db.session.add(BlueprintT2(
+        name="Jaguar", sell_price=0, material_cost=0, invention_chance=0.34,
+        material_rows=build_material_rows([{"name": "Rifter", "quantity": 1, "category": "Items"}])
+    ))
+    db.session.commit()
+    db.session.expire_all()
+
+    rifter = Blueprint.query.filter_by(name="Rifter").one()
+    assert rifter.materials == {"Minerals": {"Tritanium": 32000, "Pyerite": 6000}, "Other": {"Unobtainium": 2.5}}
+    assert list(rifter.materials["Minerals"]) == ["Tritanium", "Pyerite"]  # Written order is kept
+    assert [(r.material_name, r.material_type_id) for r in rifter.material_rows] == [
+        ("Tritanium", 34), ("Pyerite", 35), ("Unobtainium", None)
+    ]
+    assert Blueprint.query.filter_by(name="Jaguar").one().get_normalized_materials() == {"Items": {"Rifter": 1}}
+
+    # Reverse lookups come straight off the type_id index
+    users = db.session.query(BlueprintMaterial.blueprint_id).filter_by(material_type_id=34).all()
+    assert users == [(rifter.id,)]
+    assert blueprints_by_type_id(BlueprintMaterial.query.all(), {"Tritanium": 34, "Rifter": 587}) == {
+        34: {rifter.id}, 587: {Blueprint.query.filter_by(name="Jaguar").one().id}
+    }
+    assert get_material_category_lookup()["Rifter"] == "Items"
+
+
+def test_flat_bom_is_uncategorized(app):
+    db.session.add(Blueprint(
+        name="Doohickey", material_rows=build_material_rows({"Tritanium": 7, "Minerals": {"Pyerite": 1}}),
+        sell_price=0, material_cost=0
+    ))
+    db.session.commit()
+    db.session.expire_all()
+
+    assert Blueprint.query.one().materials == {"Uncategorized": {"Tritanium": 7}, "Minerals": {"Pyerite": 1}}
+    assert [r.material_type_id for r in BlueprintMaterial.query.all()] == [34, 35]
+
+
+def test_reassigning_replaces_rows_and_delete_cascades(app):
+    bp = Blueprint(
+        name="Rifter", material_rows=build_material_rows({"Minerals": {"Tritanium": 1}}), sell_price=0, material_cost=0
+    )
+    db.session.add(bp)
+    db.session.commit()
+
+    bp.material_rows = build_material_rows({"Minerals": {"Pyerite": 2}})
+    db.session.commit()
+    assert [(r.material_name, r.qty_per_run) for r in BlueprintMaterial.query.all()] == [("Pyerite", 2.0)]
+
+    db.session.delete(bp)
+    db.session.commit()
+    assert BlueprintMaterial.query.count() == 0
+
+
+def test_migration_backfills_and_drops_the_json_column(tmp_path):
+    spec = importlib.util.spec_from_file_location("blueprint_material_migration", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(sa.text(
+            "CREATE TABLE blueprint (id INTEGER PRIMARY KEY, name VARCHAR(100), materials JSON NOT NULL)"
+        ))
+        conn.execute(sa.text("CREATE TABLE material (id INTEGER PRIMARY KEY, name VARCHAR(100), type_id INTEGER)"))
+        conn.execute(sa.text("INSERT INTO material (name, type_id) VALUES ('Widget Part', 990001)"))
+        conn.execute(sa.text("INSERT INTO blueprint VALUES (1, 'Widget', :m)"), {"m": json.dumps(
+            {"Minerals": {"Tritanium": 10}, "Items": {"Widget Part": 2}}
+        )})
+        conn.execute(sa.text("INSERT INTO blueprint VALUES (2, 'Gizmo', :m)"), {"m": json.dumps(
+            [{"name": "Pyerite", "quantity": 4, "category": "Minerals"}]
+        )})
+        # Legacy flat BOM, {material: qty} with no categories
+        conn.execute(sa.text("INSERT INTO blueprint VALUES (3, 'Doohickey', :m)"), {"m": json.dumps(
+            {"Tritanium": 7, "Mystery Goo": 1.5}
+        )})
+
+    def run(step):
+        with engine.begin() as conn:
+            with Operations.context(MigrationContext.configure(conn)):
+                step()
+
+    run(migration.upgrade)
+    run(migration.upgrade)  # A second run is a no-op
+    with engine.connect() as conn:
+        assert 'materials' not in {c['name'] for c in sa.inspect(conn).get_columns('blueprint')}
+        assert conn.execute(sa.text(
+            "SELECT blueprint_id, material_type_id, material_name, category, qty_per_run FROM blueprint_material ORDER BY id"
+        )).fetchall() == [
+            (1, 34, "Tritanium", "Minerals", 10.0),
+            (1, 990001, "Widget Part", "Items", 2.0),
+            (2, 35, "Pyerite", "Minerals", 4.0),
+            (3, 34, "Tritanium", "Uncategorized", 7.0),
+            (3, None, "Mystery Goo", "Uncategorized", 1.5),
+        ]
+
+    run(migration.downgrade)
+    with engine.connect() as conn:
+        assert json.loads(conn.execute(sa.text("SELECT materials FROM blueprint WHERE id = 2")).scalar()) == {
+            "Minerals": {"Pyerite": 4}
+        }
@@ -0,0 +1,91 @@
+import sys
+import os
+from types import SimpleNamespace
+import numpy as np
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.bom_graph import BomGraph
+from routes.utils import accumulate_materials, can_fulfill, expand_materials, expand_materials_clean
+
+
+def make_bp(name, materials, amt_per_run=1, tier="T1", invention_chance=None, runs_per_copy=1):
+    return SimpleNamespace(name=name, materials=materials, amt_per_run=amt_per_run, tier=tier,
+                           invention_chance=invention_chance, runs_per_copy=runs_per_copy)
+
+
+def chain():
+    return [
+        make_bp("Reaction", [{"name": "Moon Goo", "quantity": 4, "category": "Moon"}], amt_per_run=2),
+        make_bp("Component", {"Items": {"Reaction": 3}, "Minerals": {"Tritanium": 10}}),
+        make_bp("Module II", {"Items": {"Component": 2}, "Invention Materials": {"Datacore": 2}},
+                tier="T2", invention_chance=0.5, runs_per_copy=10),
+    ]
+
+
+def test_graph_indexes_items_and_producers():
+    graph = BomGraph(chain())
+
+    assert graph.get("Component").name == "Component"
+    assert graph.get("Tritanium") is None
+    assert graph.is_buildable("Reaction")
+    assert not graph.is_buildable("Moon Goo")
+    assert graph.producer[graph.item_index["Reaction"]] == 0
+    assert graph.producer[graph.item_index["Moon Goo"]] == -1
+    # List-style materials are normalized once at compile time
+    assert graph.normalized(graph.blueprints[0]) == {"Moon": {"Moon Goo": 4}}
+    assert ("Items", graph.item_index["Component"], 2) in graph.edges[2]
+    assert [b.name for b in graph] == ["Reaction", "Component", "Module II"]
+
+
+def test_helpers_accept_graph_or_list():
+    blueprints = chain()
+    graph = BomGraph(blueprints)
+    top = blueprints[2]
+
+    assert expand_materials_clean(top, graph, quantity=1) == expand_materials_clean(top, blueprints, quantity=1)
+    assert expand_materials_clean(top, graph, quantity=1) == {"Moon Goo": 12, "Tritanium": 20, "Datacore": 4}
+
+    deps = {}
+    expanded = expand_materials(top, graph, quantity=1, t1_dependencies=deps, inventory={"Component": 1})
+    assert deps == {"Component": 1, "Reaction": 3}
+    assert expanded["Tritanium"] == 10
+
+    total, items = {}, {}
+    accumulate_materials(top, 10, total, items, graph)
+    assert items == {"Component": 20}
+    assert total == {"Component": 20, "Datacore": 4}
+
+    assert can_fulfill(top, {"Moon Goo": 1, "Tritanium": 1, "Datacore": 1}, graph)
+    assert not can_fulfill(top, {"Moon Goo": 1}, graph)
+
+
+def test_explode_whole_plan_matches_per_blueprint_expansion():
+    blueprints = chain()
+    graph = BomGraph(blueprints)
+
+    exploded = graph.explode({"Module II": 1, "Component": 2})
+    assert exploded == pytest.approx({"Moon Goo": 24, "Tritanium": 40, "Datacore": 4})
+
+    # One plan per column
+    demand = np.stack([graph.demand_vector({"Module II": 1}), graph.demand_vector({"Reaction": 1})], axis=1)
+    gross, reached = graph.explode_vectors(demand)
+    goo = graph.item_index["Moon Goo"]
+    assert gross[goo].tolist() == pytest.approx([12, 2])
+    assert reached[graph.item_index["Datacore"]].tolist() == [True, False]
+
+
+def test_explode_rounds_to_whole_runs():
+    graph = BomGraph(chain())
+
+    # 3 Reaction units need 2 runs of 2 -> 8 Moon Goo instead of 6
+    assert graph.explode({"Component": 1})["Moon Goo"] == pytest.approx(6)
+    assert graph.explode({"Component": 1}, round_runs=True)["Moon Goo"] == pytest.approx(8)
+
+
+def test_explode_rejects_cycles():
+    graph = BomGraph([
+        make_bp("A", {"Items": {"B": 1}}),
+        make_bp("B", {"Items": {"A": 1}}),
+    ])
+    with pytest.raises(ValueError):
+        graph.explode({"A": 1})
@@ -0,0 +1,138 @@
+import sys
+import os
+from contextlib import contextmanager
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from models import Blueprint, BlueprintT2, Material, ReactionFormula, Station, db
+from routes.blueprints import blueprints_bp
+from routes.catalog_queries import catalog_blueprints, listing_blueprints, pricing_blueprints
+from routes.catalog_state import catalog_changed
+from routes.price_refresher import PriceRefresher
+from routes.utils import build_material_rows
+from synthetic_catalog import make_catalog
+
+CITADEL_ID = 1022734985679
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(app)
+    app.register_blueprint(blueprints_bp)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+def seed(size):
+    """A catalog with T1, T2 and reaction rows, every fifth one built at a citadel."""
+    db.drop_all()
+    db.create_all()
+    db.session.add(Station(name="Some Citadel", station_id=CITADEL_ID))
+    blueprints, inventory = make_catalog(size)
+    for i, bp in enumerate(blueprints):
+        fields = dict(
+            name=bp.name, type_id=bp.type_id, material_rows=build_material_rows(bp.materials), amt_per_run=bp.amt_per_run,
+            sell_price=bp.sell_price, material_cost=bp.material_cost, max=bp.max,
+            station_id=CITADEL_ID if i % 5 == 0 else None,
+        )
+        if bp.tier == "T2":
+            db.session.add(BlueprintT2(
+                invention_chance=bp.invention_chance, runs_per_copy=bp.runs_per_copy,
+                full_material_cost=bp.full_material_cost, invention_cost=0, **fields
+            ))
+        elif i % 7 == 0:
+            db.session.add(ReactionFormula(**fields))
+        else:
+            db.session.add(Blueprint(**fields))
+    for name, quantity in inventory.items():
+        db.session.add(Material(name=name, quantity=quantity, sell_price=5.0, category="Minerals"))
+    db.session.commit()
+    db.session.expunge_all()
+    catalog_changed("blueprints")
+
+
+@contextmanager
+def count_statements():
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def statements_per_size(app, run, sizes=(10, 40)):
+    counts = []
+    for size in sizes:
+        seed(size)
+        with count_statements() as statements:
+            run()
+        counts.append(len(statements))
+        db.session.expunge_all()
+    return counts
+
+
+def test_catalog_loads_subclass_columns_in_the_same_statement(app):
+    def run():
+        for bp in catalog_blueprints():
+            # Everything /update_prices and the cost matrix read
+            bp.materials, bp.type_id, bp.station_id, bp.use_jita_sell, bp.material_cost
+            if isinstance(bp, BlueprintT2):
+                bp.invention_chance, bp.runs_per_copy, bp.full_material_cost
+
+    assert statements_per_size(app, run) == [2, 2]
+    assert {type(bp) for bp in catalog_blueprints()} == {Blueprint, BlueprintT2, ReactionFormula}
+
+
+def test_blueprint_list_is_constant(app):
+    client = app.test_client()
+    def run():
+        response = client.get('/api/blueprints/blueprints')
+        assert response.status_code == 200
+
+    assert statements_per_size(app, run) == [2, 2]
+
+    listed = {b["name"]: b for b in client.get('/api/blueprints/blueprints').get_json()}
+    t2 = next(b for b in listed.values() if b["tier"] == "T2")
+    assert t2["invention_chance"] == 0.34
+    assert sum(b["station_name"] == "Some Citadel" for b in listed.values()) == 8
+    assert all(b["materials"] for b in listed.values())
+
+
+def test_listing_materials_match_the_model(app):
+    seed(20)
+    blueprints, materials_by_id = listing_blueprints()
+    db.session.expunge_all()
+    assert materials_by_id == {bp.id: bp.materials for bp in db.session.query(Blueprint)}
+    assert len(blueprints) == 20
+
+
+def test_optimize_is_constant(app):
+    client = app.test_client()
+    def run():
+        response = client.get('/api/blueprints/optimize')
+        assert response.status_code == 200
+
+    counts = statements_per_size(app, run)
+    assert counts[0] == counts[1]
+
+
+def test_price_refresher_catalog_is_constant(app):
+    refresher = PriceRefresher()
+    assert statements_per_size(app, refresher.load_catalog) == [3, 3]
+    assert len(refresher.jita_type_ids) == 40  # Every blueprint; the seeded materials have no type_id
+    assert len(pricing_blueprints()) == 40
+
+
+def test_reset_max_is_one_update(app):
+    seed(30)
+    with count_statements() as statements:
+        assert app.test_client().post('/api/blueprints/blueprints/reset_max').status_code == 200
+    assert [s.split()[0] for s in statements] == ["UPDATE"]
+    assert db.session.query(Blueprint).filter(Blueprint.max.isnot(None)).count() == 0
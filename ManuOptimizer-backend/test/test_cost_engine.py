@@ -0,0 +1,99 @@
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.cost_engine import CostMatrix
+from synthetic_catalog import make_catalog
+
+
+class FakeBlueprint:
+    def __init__(self, id, name, materials, tier="T1", invention_chance=None, runs_per_copy=None):
+        self.id = id
+        self.name = name
+        self.materials = materials
+        self.tier = tier
+        self.invention_chance = invention_chance
+        self.runs_per_copy = runs_per_copy
+
+    def get_normalized_materials(self):
+        return self.materials
+
+
+NAME_TO_TYPE_ID = {"Tritanium": 34, "Pyerite": 35, "Morphite": 11399, "Widget": 1000, "Datacore A": 20410, "Datacore B": 20411}
+PRICES = {34: 5.5, 35: 12.25, 11399: None, 1000: 300.0, 20410: 90000.0, 20411: 47500.0}
+
+CATALOG = [
+    FakeBlueprint(1, "Widget", {"Minerals": {"Tritanium": 10, "Pyerite": 4}}),
+    FakeBlueprint(2, "Widget II", {
+        "Items": {"Widget": 2},
+        "Minerals": {"Tritanium": 100, "Morphite": 3},
+        "Invention Materials": {"Datacore A": 2, "Datacore B": 1},
+    }, tier="T2", invention_chance=34, runs_per_copy=10),
+    FakeBlueprint(3, "Gizmo II", {
+        "Minerals": {"Pyerite": 3},
+        "Invention Materials": {"Datacore B": 1},
+    }, tier="T2", invention_chance=0.25, runs_per_copy=5),
+    FakeBlueprint(4, "Broken II", {
+        "Minerals": {"Tritanium": 1},
+        "Invention Materials": {"Datacore A": 1},
+    }, tier="T2", invention_chance=0, runs_per_copy=10),
+    FakeBlueprint(5, "Mystery", {"Minerals": {"Unobtainium": 5}}),
+]
+
+
+def legacy_costs(bp, name_to_type_id, type_id_to_price):
+    """The per-blueprint loop update_prices used before the cost matrix."""
+    total_cost = 0.0
+    invention_cost = 0.0
+    for category, materials_dict in bp.get_normalized_materials().items():
+        for mat_name, qty in materials_dict.items():
+            unit_price = type_id_to_price.get(name_to_type_id.get(mat_name))
+            if unit_price is None:
+                continue
+            if category == "Invention Materials":
+                invention_cost += unit_price * qty
+            else:
+                total_cost += unit_price * qty
+
+    material_cost = round(total_cost, 2)
+    if bp.tier == 'T2' and bp.invention_chance and bp.runs_per_copy:
+        chance = bp.invention_chance / 100.0 if bp.invention_chance > 1 else bp.invention_chance
+        per_run = invention_cost / (chance * bp.runs_per_copy) if chance > 0 else 0
+        return material_cost, invention_cost, round(material_cost + per_run, 2)
+    return material_cost, invention_cost, material_cost
+
+
+def test_costs_are_pinned():
+    material_cost, invention_cost, full_material_cost = CostMatrix(CATALOG, NAME_TO_TYPE_ID).costs(PRICES)
+
+    assert material_cost == [104.0, 1150.0, 36.75, 5.5, 0.0]
+    assert invention_cost == [0.0, 227500.0, 47500.0, 90000.0, 0.0]
+    # Widget II: 1150 + 227500 / (0.34 * 10); Gizmo II: 36.75 + 47500 / (0.25 * 5); Broken II has no chance
+    assert full_material_cost == [104.0, 68061.76, 38036.75, 5.5, 0.0]
+
+
+def test_missing_prices_are_reported_per_entry():
+    matrix = CostMatrix(CATALOG, NAME_TO_TYPE_ID)
+    assert [(bp.name, tid) for bp, tid in matrix.missing_prices(PRICES)] == [("Widget II", 11399), ("Mystery", None)]
+
+
+def test_matches_the_per_blueprint_loop_exactly():
+    blueprints, inventory = make_catalog(300)
+    catalog = [
+        FakeBlueprint(bp.id, bp.name, bp.materials, bp.tier, bp.invention_chance, bp.runs_per_copy)
+        for bp in blueprints
+    ]
+    rng = random.Random(3)
+    names = sorted(set(inventory) | {bp.name for bp in blueprints})
+    name_to_type_id = {name: i + 1 for i, name in enumerate(names)}
+    type_id_to_price = {tid: (round(rng.uniform(0.01, 1e6), 2) if rng.random() > 0.05 else None) for tid in name_to_type_id.values()}
+
+    expected = [legacy_costs(bp, name_to_type_id, type_id_to_price) for bp in catalog]
+    material_cost, invention_cost, full_material_cost = CostMatrix(catalog, name_to_type_id).costs(type_id_to_price)
+
+    assert list(zip(material_cost, invention_cost, full_material_cost)) == expected
+
+
+def test_empty_catalog():
+    assert CostMatrix([], NAME_TO_TYPE_ID).costs(PRICES) == ([], [], [])
@@ -0,0 +1,82 @@
+import sys
+import os
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from routes.catalog_state import catalog_changed
+from routes.cost_memo import CostMemo, cost_memo
+from routes.opt_helpers import ProductionOptimizer
+
+
+def make_bp(id, name, materials, sell_price, amt_per_run=1):
+    bp = SimpleNamespace(id=id, name=name, materials=materials, sell_price=sell_price, amt_per_run=amt_per_run,
+                         type_id=None, max=None)
+    bp.get_normalized_materials = lambda: bp.materials
+    return bp
+
+
+def make_mat(name, sell_price):
+    return SimpleNamespace(id=None, name=name, sell_price=sell_price, type_id=None)
+
+
+def catalog():
+    blueprints = [
+        make_bp(1, "Reaction", {"Moon": {"Moon Goo": 4}}, 50, amt_per_run=2),
+        make_bp(2, "Component", {"Items": {"Reaction": 3}, "Minerals": {"Tritanium": 10}}, 400),
+        make_bp(3, "Module", {"Items": {"Component": 2, "Reaction": 1}}, 2000),
+    ]
+    # The optimizer only prices materials it has a Material row for, intermediates included
+    materials = [make_mat("Moon Goo", 10), make_mat("Tritanium", 1), make_mat("Reaction", 30), make_mat("Component", 200)]
+    return blueprints, materials
+
+
+def test_memoized_costs_match_a_cold_memo():
+    blueprints, materials = catalog()
+    memo = CostMemo()
+    warm = ProductionOptimizer(blueprints, materials, {}, memo=memo)
+    profits = {name: warm._calculate_profit_per_unit(name) for name in warm.blueprints}
+
+    cold = ProductionOptimizer(blueprints, materials, {}, memo=CostMemo())
+    assert profits == {name: cold._calculate_profit_per_unit(name) for name in cold.blueprints}
+    # Reaction's tree is walked by Component and Module but each batch cost is computed once
+    assert memo.stats()["misses"] == len(blueprints) + 2
+
+    again = ProductionOptimizer(blueprints, materials, {}, memo=memo)
+    assert {name: again._calculate_profit_per_unit(name) for name in again.blueprints} == profits
+    assert memo.stats()["misses"] == len(blueprints) + 2
+
+
+def test_price_or_inventory_change_misses():
+    blueprints, materials = catalog()
+    memo = CostMemo()
+    before = ProductionOptimizer(blueprints, materials, {}, memo=memo)._calculate_profit_per_unit("Component")
+
+    materials[0].sell_price = 20
+    after = ProductionOptimizer(blueprints, materials, {}, memo=memo)._calculate_profit_per_unit("Component")
+    assert after < before
+
+    free = ProductionOptimizer(blueprints, materials, {"Moon Goo": 100}, memo=memo)
+    assert free._calculate_profit_per_unit("Component") > after
+
+
+def test_base_materials_per_unit():
+    blueprints, materials = catalog()
+    optimizer = ProductionOptimizer(blueprints, materials, {}, memo=CostMemo())
+    assert optimizer.base_materials_per_unit("Module") == pytest.approx({"Moon Goo": 14, "Tritanium": 20})
+
+
+def test_blueprint_edit_clears_the_memo():
+    cost_memo.clear()
+    cost_memo.get_or_compute("batch_cost", 1, "stamp", lambda: 1.0)
+    cost_memo.get_or_compute("profit_per_unit", 2, "stamp", lambda: 5.0)
+
+    # Editing blueprint 1 also stales blueprint 2 if 2 builds from it
+    catalog_changed("blueprints", [1])
+    assert cost_memo.stats()["size"] == 0
+
+    cost_memo.get_or_compute("batch_cost", 1, "stamp", lambda: 1.0)
+    catalog_changed("stations")
+    assert cost_memo.get_or_compute("batch_cost", 1, "stamp", lambda: None) == 1.0
+
+    catalog_changed("prices")
+    assert cost_memo.stats()["size"] == 0
@@ -0,0 +1,75 @@
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, StaticPool
+from models import Material, db
+from routes import db_profile
+
+
+def make_app(uri, **pool):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_profile.engine_options(uri, **pool)
+    db.init_app(app)
+    with app.app_context():
+        db_profile.install(db.engine)
+        db.create_all()
+    return app
+
+
+def test_every_pooled_connection_gets_the_profile(tmp_path):
+    app = make_app(f"sqlite:///{tmp_path / 'eve.db'}", pool_size=3, max_overflow=0)
+    with app.app_context():
+        engine = db.engine
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 3
+
+    settings = []
+    def check():
+        with engine.connect() as conn:
+            settings.append(db_profile.current_settings(conn))
+            barrier.wait()  # Hold the connection so each thread opens its own
+    barrier = threading.Barrier(3)
+    threads = [threading.Thread(target=check) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(settings) == 3
+    for s in settings:
+        assert s == {
+            "journal_mode": "wal",
+            "synchronous": 1,
+            "cache_size": db_profile.SQLITE_PRAGMAS["cache_size"],
+            "mmap_size": db_profile.SQLITE_PRAGMAS["mmap_size"],
+            "temp_store": 2,
+            "busy_timeout": db_profile.DB_BUSY_TIMEOUT_MS,
+        }
+
+
+def test_readers_do_not_wait_on_an_open_write(tmp_path):
+    app = make_app(f"sqlite:///{tmp_path / 'eve.db'}")
+    with app.app_context():
+        db.session.add(Material(name="Tritanium", quantity=1))
+        db.session.commit()
+
+        with db.engine.connect() as writer:
+            writer.exec_driver_sql("BEGIN IMMEDIATE")
+            writer.execute(text("UPDATE material SET quantity = 99"))
+            with db.engine.connect() as reader:
+                reader.exec_driver_sql("PRAGMA busy_timeout=0")  # Fail fast instead of waiting
+                assert reader.execute(text("SELECT quantity FROM material")).scalar() == 1
+            writer.commit()
+
+        assert db.session.execute(text("SELECT quantity FROM material")).scalar() == 99
+
+
+def test_in_memory_databases_keep_their_single_connection():
+    assert db_profile.engine_options("sqlite:///:memory:") == {}
+    app = make_app("sqlite:///:memory:")
+    with app.app_context():
+        assert isinstance(db.engine.pool, StaticPool)
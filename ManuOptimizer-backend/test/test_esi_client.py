@@ -0,0 +1,161 @@
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from routes.esi_client import ESI_MAX_CONCURRENCY, ErrorLimitTracker, EsiSession, esi_error_limit, fetch_all_pages, get_esi_session
+from routes.utils import create_esi_session
+
+
+def esi_response(remain, reset):
+    return SimpleNamespace(headers={"X-ESI-Error-Limit-Remain": str(remain), "X-ESI-Error-Limit-Reset": str(reset)})
+
+
+def test_one_pooled_session_per_process():
+    session = get_esi_session()
+    assert session is get_esi_session()
+    assert create_esi_session() is session
+    assert session.get_adapter("https://esi.evetech.net")._pool_maxsize == ESI_MAX_CONCURRENCY
+
+
+def test_throttle_waits_out_the_error_window():
+    session = EsiSession(error_limit=ErrorLimitTracker(floor=10))
+
+    session._track_error_limit(esi_response(80, 30))
+    started = time.perf_counter()
+    session.throttle()
+    assert time.perf_counter() - started < 0.05
+
+    session._track_error_limit(esi_response(5, 30))
+    assert session.error_limit.remain == 5
+    session.error_limit.reset_at = time.time() + 0.2
+    started = time.perf_counter()
+    session.throttle()
+    assert time.perf_counter() - started >= 0.15
+    assert session.error_limit.remain is None  # Window reset, next call goes straight through
+
+
+def test_sessions_and_async_fetcher_share_the_error_limit():
+    from routes.async_fetch import price_fetcher
+    assert get_esi_session().error_limit is esi_error_limit
+    assert price_fetcher.error_limit is esi_error_limit
+
+    tracker = ErrorLimitTracker(floor=10)
+    tracker.update({"X-ESI-Error-Limit-Remain": "50", "X-ESI-Error-Limit-Reset": "30"})
+    assert tracker.wait_time() == 0
+    tracker.pause(30)  # A 420 spends the budget outright
+    assert 29 < tracker.wait_time() <= 30
+
+
+def test_responses_without_limit_headers_are_ignored():
+    session = EsiSession(error_limit=ErrorLimitTracker())
+    session._track_error_limit(SimpleNamespace(headers={}))
+    assert session.error_limit.remain is None
+
+
+class ScriptedAdapter(BaseAdapter):
+    """Answers each request with the next (status, error limit remain) in the script."""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        status, remain = self.script[self.sent]
+        self.sent += 1
+        res = requests.Response()
+        res.status_code = status
+        res.headers["X-ESI-Error-Limit-Remain"] = str(remain)
+        res.headers["X-ESI-Error-Limit-Reset"] = "30"
+        res.request = request
+        res.url = request.url
+        res._content = b"[]"
+        return res
+
+    def close(self):
+        pass
+
+
+def test_status_retries_go_through_the_throttle(monkeypatch):
+    session = EsiSession(error_limit=ErrorLimitTracker(floor=10), backoff_factor=0)
+    adapter = ScriptedAdapter([(502, 50), (503, 9), (200, 9)])
+    session.mount("https://esi.test/", adapter)
+    throttled = []
+    original = session.throttle
+    monkeypatch.setattr(session, "throttle", lambda: throttled.append(session.error_limit.remain) or original())
+    slept = []
+    monkeypatch.setattr(time, "sleep", slept.append)
+
+    assert session.get("https://esi.test/markets/").status_code == 200
+    assert adapter.sent == 3
+    # Each retry saw the error budget the previous response reported, and the
+    # one after a response at the floor waited out the window first
+    assert throttled == [None, 50, 9]
+    assert max(slept) > 29
+
+
+def test_retries_give_up_with_the_last_response_and_skip_posts(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    session = EsiSession(error_limit=ErrorLimitTracker(), max_retries=2, backoff_factor=0)
+    adapter = ScriptedAdapter([(500, 90)] * 3)
+    session.mount("https://esi.test/", adapter)
+    assert session.get("https://esi.test/markets/").status_code == 500
+    assert adapter.sent == 3
+
+    adapter = ScriptedAdapter([(500, 90)])
+    session.mount("https://esi.test/", adapter)
+    assert session.post("https://esi.test/universe/ids/", json=["Tritanium"]).status_code == 500
+    assert adapter.sent == 1
+
+
+class PagedSession:
+    """Serves `total_pages` pages of one order each, sleeping `latency` per request."""
+
+    def __init__(self, total_pages, latency=0.05, failing_page=None):
+        self.total_pages = total_pages
+        self.latency = latency
+        self.failing_page = failing_page
+        self.pages_requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        page = params["page"]
+        with self._lock:
+            self.pages_requested.append(page)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+
+        res = requests.Response()
+        res.status_code = 500 if page == self.failing_page else 200
+        res.headers["X-Pages"] = str(self.total_pages)
+        res._content = f'[{{"type_id": 34, "price": {page}.0, "params": "{params.get("order_type")}"}}]'.encode()
+        return res
+
+
+def test_fetch_all_pages_reads_x_pages_and_fetches_the_rest_concurrently():
+    session = PagedSession(total_pages=8)
+    started = time.perf_counter()
+    responses = fetch_all_pages("https://esi.test/orders/", params={"order_type": "sell"}, session=session, max_workers=8)
+    elapsed = time.perf_counter() - started
+
+    assert [res.json()[0]["price"] for res in responses] == [float(p) for p in range(1, 9)]
+    assert responses[0].json()[0]["params"] == "sell"
+    assert sorted(session.pages_requested) == list(range(1, 9))
+    assert session.max_in_flight > 1
+    assert elapsed < 8 * session.latency  # Page 1, then the rest side by side
+
+
+def test_fetch_all_pages_raises_instead_of_truncating():
+    session = PagedSession(total_pages=5, latency=0.01, failing_page=3)
+    with pytest.raises(requests.exceptions.HTTPError):
+        fetch_all_pages("https://esi.test/orders/", session=session)
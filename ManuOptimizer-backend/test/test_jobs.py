@@ -0,0 +1,86 @@
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from routes.jobs import JobManager, JobQueueFull
+
+
+def wait_done(manager, job_id):
+    job = manager.get(job_id)
+    while job["status"] not in ("done", "failed"):
+        job = manager.wait_for_change(job_id, job["version"], timeout=5)
+    return job
+
+
+def test_job_reports_phases_and_result():
+    manager = JobManager(workers=1)
+
+    def work(progress=None):
+        progress("model_build")
+        progress("solve")
+        return {"total_profit": 42}, 200
+
+    job_id = manager.submit(work)
+    job = wait_done(manager, job_id)
+
+    assert job["status"] == "done"
+    assert job["result"] == {"total_profit": 42}
+    assert job["phase"] == "solve"
+
+
+def test_job_failure_is_recorded():
+    manager = JobManager(workers=1)
+
+    def error_payload(progress=None):
+        return {"error": "Optimization failed"}, 400
+
+    def crash(progress=None):
+        raise RuntimeError("boom")
+
+    assert wait_done(manager, manager.submit(error_payload))["status"] == "failed"
+    job = wait_done(manager, manager.submit(crash))
+    assert job["status"] == "failed"
+    assert job["error"] == "boom"
+
+
+def test_submit_rejects_when_queue_is_full():
+    manager = JobManager(workers=1, max_pending=1)
+    release = threading.Event()
+
+    def blocked(progress=None):
+        release.wait(5)
+        return {}, 200
+
+    job_id = manager.submit(blocked)
+    with pytest.raises(JobQueueFull):
+        manager.submit(blocked)
+
+    release.set()
+    wait_done(manager, job_id)
+    wait_done(manager, manager.submit(blocked))
+
+
+def test_finished_jobs_are_evicted():
+    manager = JobManager(workers=1, max_pending=4, max_stored=2)
+    release = threading.Event()
+
+    def blocked(progress=None):
+        release.wait(5)
+        return {}, 200
+
+    # Nothing finishes until all four are in, so no submit() can evict an earlier job
+    ids = [manager.submit(blocked) for _ in range(4)]
+    release.set()
+    for job_id in ids:
+        job = manager.get(job_id)
+        while job is not None and job["status"] not in ("done", "failed"):
+            job = manager.wait_for_change(job_id, job["version"], timeout=5)
+
+    assert manager.get(ids[0]) is None
+    assert manager.get(ids[-1])["status"] == "done"
+
+    manager.ttl = 0
+    with manager._changed:
+        manager._jobs[ids[-1]]["finished_at"] -= 1
+    assert manager.get(ids[-1]) is None
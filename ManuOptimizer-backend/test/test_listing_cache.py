@@ -0,0 +1,97 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from models import Blueprint, Material, db
+from routes.blueprints import blueprints_bp
+from routes.catalog_state import catalog_changed, catalog_version
+from routes.listing_cache import listing_cache
+from routes.materials import materials_bp
+from routes.utils import build_material_rows
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(app)
+    app.register_blueprint(blueprints_bp)
+    app.register_blueprint(materials_bp)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Material(name="Tritanium", quantity=100, type_id=34, category="Minerals"))
+        db.session.add(Blueprint(
+            name="Rifter", material_rows=build_material_rows({"Minerals": {"Tritanium": 32000}}),
+            sell_price=1.0, material_cost=1.0
+        ))
+        db.session.commit()
+        listing_cache.clear()
+        catalog_changed("materials")  # Rows written behind the routes' back
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def statements(app):
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+@pytest.mark.parametrize("url", ['/api/materials/materials', '/api/blueprints/blueprints'])
+def test_matching_etag_is_a_304_without_the_database(app, statements, url):
+    client = app.test_client()
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers["ETag"] and first.headers["Last-Modified"]
+    assert "no-cache" in first.headers["Cache-Control"]
+    assert statements
+
+    statements.clear()
+    again = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+    # A plain reload is served from the cached JSON
+    repeat = client.get(url)
+    assert repeat.status_code == 200 and repeat.data == first.data
+    assert statements == []
+
+    revalidated = client.get(url, headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert revalidated.status_code == 304
+
+
+def test_writes_bump_the_version_and_the_etag(app):
+    client = app.test_client()
+    before = client.get('/api/materials/materials')
+    version = catalog_version()[0]
+
+    client.post('/api/materials/materials', data={"name": "Pyerite", "quantity": "5"})
+    assert catalog_version()[0] == version + 1
+
+    after = client.get('/api/materials/materials', headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert {m["name"] for m in after.get_json()} == {"Tritanium", "Pyerite"}
+
+    # The blueprint list is tagged with the same version, so it refreshes too
+    blueprint_id = client.get('/api/blueprints/blueprints').get_json()[0]["id"]
+    etag = client.get('/api/blueprints/blueprints').headers["ETag"]
+    client.put(f'/api/blueprints/blueprint/{blueprint_id}', json={"sell_price": 2.0})
+    listed = client.get('/api/blueprints/blueprints', headers={"If-None-Match": etag})
+    assert listed.status_code == 200
+    assert listed.get_json()[0]["sell_price"] == 2.0
+
+
+def test_errors_are_not_cached(app, monkeypatch):
+    from routes import blueprints
+    monkeypatch.setattr(blueprints, "listing_blueprints", lambda: 1 / 0)
+    response = app.test_client().get('/api/blueprints/blueprints')
+    assert response.status_code == 500
+    assert "ETag" not in response.headers
+    assert "blueprints" not in listing_cache.stats()["entries"]
@@ -0,0 +1,59 @@
+import sys
+import os
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.lp_model import ProductionModel
+
+
+def make_bp(name, materials, sell_price, material_cost, amt_per_run=1, max=None, tier="T1"):
+    return SimpleNamespace(name=name, materials=materials, sell_price=sell_price, material_cost=material_cost,
+                           full_material_cost=material_cost, amt_per_run=amt_per_run, max=max, tier=tier)
+
+
+def test_balance_matrix_nets_production_against_consumption():
+    blueprints = [
+        make_bp("Component", {"Minerals": {"Tritanium": 10}}, 50, 20, amt_per_run=2),
+        make_bp("Module", {"Minerals": {"Tritanium": 5}, "Items": {"Component": 3}}, 300, 100, max=4),
+    ]
+    model = ProductionModel(blueprints, {"Tritanium": 100, "Pyerite": 7})
+    balance = model.balance.toarray()
+
+    trit, comp = model.item_index["Tritanium"], model.item_index["Component"]
+    assert balance[trit].tolist() == [10, 5]
+    assert balance[comp].tolist() == [-2, 3]
+    assert model.inventory[model.item_index["Pyerite"]] == 7
+    assert model.profit.tolist() == [15, 200]
+    assert model.upper[1] == 4
+
+
+def test_pulp_emit_solves_like_the_original_model():
+    from pulp import PULP_CBC_CMD, LpStatus, value
+
+    blueprints = [
+        make_bp("Component", {"Minerals": {"Tritanium": 10}}, 50, 20),
+        make_bp("Module", {"Minerals": {"Tritanium": 5}, "Items": {"Component": 2}}, 300, 100, max=4),
+    ]
+    model = ProductionModel(blueprints, {"Tritanium": 100})
+    prob, variables = model.to_pulp()
+    prob.solve(PULP_CBC_CMD(msg=False))
+    model.solution = [value(v) for v in variables]
+
+    assert LpStatus[prob.status] == "Optimal"
+    assert model.runs_by_name() == {"Component": 8, "Module": 4}
+
+
+def test_solver_backends_agree():
+    from routes.solvers import SOLVERS, solve
+
+    blueprints = [
+        make_bp("Component", {"Minerals": {"Tritanium": 10}}, 50, 20),
+        make_bp("Module", {"Minerals": {"Tritanium": 5}, "Items": {"Component": 2}}, 300, 100, max=4),
+        make_bp("Loss Maker", {"Minerals": {"Tritanium": 1}}, 1, 5),
+    ]
+    results = {}
+    for solver_name in SOLVERS:
+        model = ProductionModel(blueprints, {"Tritanium": 100})
+        assert solve(model, solver_name) == "Optimal"
+        results[solver_name] = (model.runs_by_name(), round(model.objective, 6))
+
+    assert results["cbc"] == results["highs"] == ({"Component": 8, "Module": 4, "Loss Maker": 0}, 1040)
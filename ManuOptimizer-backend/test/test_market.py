@@ -0,0 +1,34 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.market import MarketSnapshot
+from routes.utils import JITA_STATION_ID
+
+OTHER_STATION = 60008494
+
+
+def make_order(type_id, price, location_id=JITA_STATION_ID, is_buy_order=False):
+    return {"type_id": type_id, "price": price, "location_id": location_id, "is_buy_order": is_buy_order}
+
+
+def test_snapshot_prefers_jita_over_region():
+    snapshot = MarketSnapshot()
+    snapshot.load_pages([
+        [make_order(34, 5.0), make_order(34, 4.0, OTHER_STATION), make_order(35, 9.0, OTHER_STATION)],
+        [make_order(34, 4.5), make_order(34, 1.0, is_buy_order=True)],
+    ])
+
+    assert snapshot.get_price(34) == (4.5, "jita")
+    assert snapshot.get_price(35) == (9.0, "jita")  # No Jita orders, region fallback
+    assert snapshot.get_price(36) == (None, "not_found")
+    assert snapshot.pages == 2
+    assert snapshot.is_fresh()
+
+
+def test_snapshot_reload_replaces_old_prices():
+    snapshot = MarketSnapshot()
+    snapshot.load_pages([[make_order(34, 5.0)]])
+    snapshot.load_pages([[make_order(35, 7.0)]])
+
+    assert snapshot.get_price(34) == (None, "not_found")
+    assert snapshot.get_price(35) == (7.0, "jita")
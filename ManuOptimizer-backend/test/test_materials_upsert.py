@@ -0,0 +1,83 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from models import Material, db
+from routes.materials import materials_bp
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(app)
+    app.register_blueprint(materials_bp)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Material(name="Tritanium", quantity=1, type_id=34, category="Minerals", sell_price=5.0),
+            Material(name="Zydrine", quantity=7, type_id=39, category="Minerals"),
+        ])
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def inventory():
+    db.session.expire_all()
+    return {m.name: (m.quantity, m.type_id, m.category) for m in Material.query.all()}
+
+
+def test_add_mode_upserts_and_keeps_the_rest(app):
+    response = app.test_client().post('/api/materials/update_materials', json={
+        "updateType": "add", "materials": {"Tritanium": 500, "Pyerite": 20},
+    })
+    body = response.get_json()
+    assert response.status_code == 200
+    assert (body["inserted"], body["updated"], body["deleted"]) == (1, 1, 0)
+    assert "elapsed_ms" in body
+
+    assert inventory() == {
+        "Tritanium": (500, 34, "Minerals"),
+        "Pyerite": (20, 35, "Minerals"),
+        "Zydrine": (7, 39, "Minerals"),
+    }
+    assert Material.query.filter_by(name="Tritanium").one().sell_price == 5.0  # Prices survive an upsert
+
+
+def test_replace_mode_deletes_unlisted_rows_and_keeps_ids(app):
+    tritanium_id = Material.query.filter_by(name="Tritanium").one().id
+    body = app.test_client().post('/api/materials/update_materials', json={
+        "updateType": "replace", "materials": {"Tritanium": 3, "Mexallon": 4},
+    }).get_json()
+
+    assert (body["inserted"], body["updated"], body["deleted"]) == (1, 1, 1)
+    assert set(inventory()) == {"Tritanium", "Mexallon"}
+    assert Material.query.filter_by(name="Tritanium").one().id == tritanium_id
+
+
+def test_statement_count_does_not_grow_with_the_paste(app):
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    paste = {f"Item {i}": i for i in range(2000)}
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    body = app.test_client().post('/api/materials/update_materials', json={
+        "updateType": "replace", "materials": paste,
+    }).get_json()
+    event.remove(db.engine, "before_cursor_execute", record)
+
+    assert (body["inserted"], body["deleted"]) == (2000, 2)
+    assert Material.query.count() == 2000
+    # Existing-name SELECT, one executemany upsert, one chunked DELETE
+    assert len(statements) == 3
+
+
+def test_single_material_form(app):
+    client = app.test_client()
+    assert client.post('/api/materials/materials', data={"name": "Isogen", "quantity": "12"}).get_json()["inserted"] == 1
+    assert client.post('/api/materials/materials', data={"name": "Isogen", "quantity": "15"}).get_json()["updated"] == 1
+    assert inventory()["Isogen"] == (15, 37, "Minerals")
+    assert client.post('/api/materials/materials', data={"name": "Isogen", "quantity": "lots"}).status_code == 400
@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.order_book import OrderBookIndex
+from routes import utils
+
+
+ORDERS = [
+    {"type_id": 34, "price": 5.0, "volume_remain": 100, "is_buy_order": False},
+    {"type_id": 34, "price": 4.0, "volume_remain": 50, "is_buy_order": False},
+    {"type_id": 34, "price": 9.0, "volume_remain": 1000, "is_buy_order": True},
+    {"type_id": 35, "price": 12.0, "volume_remain": 10, "is_buy_order": False},
+    {"type_id": 36, "price": 30.0, "volume_remain": 10, "is_buy_order": True},
+]
+
+
+def test_index_keeps_lowest_ask_and_sorted_ladder():
+    book = OrderBookIndex(ORDERS)
+    assert len(book) == 5
+    assert book.lowest_price(34) == 4.0
+    assert book.lowest_price(35) == 12.0
+    assert book.lowest_price(36) is None  # Only buy orders
+    assert book.ladder(34) == [(4.0, 50), (5.0, 100)]
+    assert book.ladder(99) == []
+
+
+def test_cost_to_buy_walks_the_ladder():
+    book = OrderBookIndex(ORDERS)
+    assert book.cost_to_buy(34, 20) == (20, 80.0)
+    assert book.cost_to_buy(34, 70) == (70, 50 * 4.0 + 20 * 5.0)
+    assert book.cost_to_buy(34, 500) == (150, 700.0)  # Market runs dry
+    assert book.cost_to_buy(99, 5) == (0, 0.0)
+
+
+def test_station_lookups_hit_the_index_until_ttl(monkeypatch):
+    station_id = 1000000000001
+    calls = []
+
+    class FakeResponse:
+        status_code = 200
+        headers = {}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return ORDERS
+
+    class FakeSession:
+        def get(self, url, params=None, headers=None, timeout=None):
+            calls.append(url)
+            return FakeResponse()
+
+    monkeypatch.setattr(utils, "get_esi_session", lambda: FakeSession())
+    utils.structure_order_cache.pop(station_id, None)
+    try:
+        assert utils.get_station_sell_price(34, station_id, {}) == (4.0, "structure")
+        assert utils.get_station_sell_price(35, station_id, {}) == (12.0, "structure")
+        assert utils.get_station_sell_price(36, station_id, {}) == (None, "not_found")
+        assert len(calls) == 1
+        assert isinstance(utils.structure_order_cache[station_id][1], OrderBookIndex)
+    finally:
+        utils.structure_order_cache.pop(station_id, None)
@@ -0,0 +1,126 @@
+import sys
+import os
+import json
+import time
+import pytest
+import requests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask
+from models import db
+from routes.market import MarketSnapshot
+from routes import utils
+from routes.price_cache import PriceStore, price_store
+from routes.utils import JITA_REGION_ID, JITA_STATION_ID, PRICE_CACHE_TTL
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def test_prices_survive_a_restart(app):
+    store = PriceStore()
+    store.put(34, JITA_STATION_ID, 4.5, "jita", etag='"abc"', expires_at=time.time() + 300)
+    store.put(35, 1035466617946, 9.0, "structure")
+    assert store.flush() == 2
+    assert store.flush() == 0  # Nothing dirty left
+
+    restarted = PriceStore()
+    restarted.load()
+    assert restarted.get_fresh(34, JITA_STATION_ID, ttl=600)["price"] == 4.5
+    assert restarted.get(34, JITA_STATION_ID)["etag"] == '"abc"'
+    assert restarted.get_fresh(34, JITA_STATION_ID, ttl=0) is None
+
+
+def test_bulk_write_keeps_per_type_etags_only_for_unchanged_prices(app):
+    store = PriceStore()
+    store.put(34, JITA_STATION_ID, 4.5, "jita", etag='"abc"')
+    store.put(35, JITA_STATION_ID, 9.0, "jita", etag='"def"')
+    store.put_many(JITA_STATION_ID, {34: 4.5, 35: 8.0, 36: 1.0}, "jita")
+    assert store.get(34, JITA_STATION_ID)["etag"] == '"abc"'
+    assert store.get(35, JITA_STATION_ID)["price"] == 8.0
+    assert store.get(35, JITA_STATION_ID)["etag"] is None
+    assert store.get(36, JITA_STATION_ID)["etag"] is None
+
+
+class EtagEsiSession:
+    """Serves one Jita sell order at 4.5 with ETag "abc", and a 304 to requests that send it."""
+
+    def __init__(self):
+        self.sent = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.sent.append(headers.get("If-None-Match"))
+        res = requests.Response()
+        if headers.get("If-None-Match") == '"abc"':
+            res.status_code = 304
+            return res
+        res.status_code = 200
+        res.headers["ETag"] = '"abc"'
+        res._content = json.dumps([{"type_id": 34, "price": 4.5, "location_id": JITA_STATION_ID}]).encode()
+        return res
+
+
+def test_a_304_never_confirms_a_price_the_etag_did_not_come_with(app, monkeypatch):
+    monkeypatch.setattr(price_store, "_entries", {})
+    monkeypatch.setattr(price_store, "_dirty", set())
+    session = EtagEsiSession()
+    monkeypatch.setattr(utils, "get_esi_session", lambda: session)
+    stale = time.time() - 2 * PRICE_CACHE_TTL
+
+    price_store.put(34, JITA_STATION_ID, 4.5, "jita", etag='"abc"', fetched_at=stale)
+    # An older snapshot lands afterwards with a different price
+    price_store.put_many(JITA_STATION_ID, {34: 4.0}, "jita", fetched_at=stale)
+
+    assert utils.get_lowest_jita_sell_price(34, {}) == (4.5, "jita")
+    assert session.sent == [None]
+
+    # Same price from the snapshot: the ETag still stands and the 304 is honoured
+    price_store.put_many(JITA_STATION_ID, {34: 4.5}, "jita", fetched_at=stale)
+    assert utils.get_lowest_jita_sell_price(34, {}) == (4.5, "cached")
+    assert session.sent == [None, '"abc"']
+
+
+def test_snapshot_restores_from_store(app):
+    store = PriceStore()
+    snapshot = MarketSnapshot()
+    snapshot.load_pages([[{"type_id": 34, "price": 4.5, "location_id": JITA_STATION_ID, "is_buy_order": False}]])
+    snapshot.persist(store)
+    store.flush()
+
+    restarted = PriceStore()
+    restarted.load()
+    restored = MarketSnapshot()
+    assert restored.restore(restarted)
+    assert restored.is_fresh()
+    assert restored.get_price(34) == (4.5, "jita")
+
+
+def test_region_fallbacks_are_kept_apart_from_hub_prices(app):
+    store = PriceStore()
+    snapshot = MarketSnapshot()
+    snapshot.load_pages([[
+        {"type_id": 34, "price": 4.5, "location_id": JITA_STATION_ID, "is_buy_order": False},
+        {"type_id": 34, "price": 4.0, "location_id": 60000001, "is_buy_order": False},
+        {"type_id": 35, "price": 9.0, "location_id": 60000001, "is_buy_order": False},
+    ]])
+    snapshot.persist(store)
+    store.flush()
+
+    restarted = PriceStore()
+    restarted.load()
+    assert set(restarted.entries_for(JITA_STATION_ID)) == {34}
+    assert restarted.get(35, JITA_REGION_ID)["price"] == 9.0
+
+    restored = MarketSnapshot()
+    assert restored.restore(restarted)
+    assert restored.station_lowest == {34: 4.5}
+    assert restored.region_lowest == {34: 4.0, 35: 9.0}
+    assert restored.get_price(34) == (4.5, "jita")
+    assert restored.get_price(35) == (9.0, "jita")
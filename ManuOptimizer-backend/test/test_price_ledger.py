@@ -0,0 +1,37 @@
+import sys
+import os
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.catalog_state import catalog_changed
+from routes.price_ledger import PriceLedger, blueprints_by_type_id, price_ledger
+
+
+def test_reverse_index_maps_materials_to_blueprints():
+    rows = [
+        SimpleNamespace(blueprint_id=blueprint_id, material_name=name)
+        for blueprint_id, name in [(1, "Tritanium"), (1, "Pyerite"), (2, "Tritanium"), (2, "Datacore"), (3, "Unknown Part")]
+    ]
+    consumers = blueprints_by_type_id(rows, {"Tritanium": 34, "Pyerite": 35, "Datacore": 20410})
+    assert consumers == {34: {1, 2}, 35: {1}, 20410: {2}}
+
+
+def test_ledger_reports_moved_type_ids():
+    ledger = PriceLedger()
+    assert ledger.changed({34: (5.0, False)}) is None  # Nothing committed yet, recompute all
+
+    ledger.commit({34: (5.0, False), 35: (9.0, False)})
+    assert ledger.changed({34: (5.0, False), 35: (9.0, False)}) == set()
+    assert ledger.changed({34: (5.5, False), 35: (9.0, False)}) == {34}
+    assert ledger.changed({34: (5.0, True), 36: (1.0, False)}) == {34, 35, 36}
+
+
+def test_catalog_edits_mark_or_reset():
+    price_ledger.commit({34: (5.0, False)})
+    catalog_changed("blueprints", [7])
+    catalog_changed("prices")
+    assert price_ledger.primed
+    assert price_ledger.dirty_blueprints() == {7}
+
+    catalog_changed("materials")
+    assert not price_ledger.primed
+    assert price_ledger.dirty_blueprints() == set()
@@ -0,0 +1,129 @@
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from routes import price_refresher as refresher_module
+from routes.price_cache import price_store
+from routes.price_refresher import PriceRefresher
+from routes.utils import JITA_REGION_ID, JITA_STATION_ID
+
+NOW = 1_000_000.0
+STRUCTURE_ID = 1035466617946
+TIERS = {"hot": 600, "warm": 1800, "cold": 7200}
+
+
+@pytest.fixture
+def refresher(monkeypatch):
+    monkeypatch.setattr(price_store, "_entries", {})
+    monkeypatch.setattr(price_store, "_dirty", set())
+    r = PriceRefresher(tiers=TIERS, lead=60)
+    r.name_to_type_id = {"Hot Module": 1, "Tritanium": 2, "Spare Part": 3}
+    r.jita_type_ids = {1, 2, 3}
+    r.used_type_ids = {1, 2}
+    r._catalog_dirty = False
+    r.record_plan({"original_production_plan": {"Hot Module": 5}, "material_usage": {"Tritanium": {"used": 0}}})
+    return r
+
+
+def put_jita(type_id, price, fetched_at, expires_at=None):
+    price_store.put(type_id, JITA_STATION_ID, price, "jita", expires_at=expires_at or fetched_at + 300, fetched_at=fetched_at)
+
+
+def test_tiers_follow_plans_and_catalog_usage(refresher):
+    hot = refresher.hot_type_ids()
+    assert refresher.tier(1, hot) == "hot"
+    assert refresher.tier(2, hot) == "warm"  # In no plan, but a blueprint uses it
+    assert refresher.tier(3, hot) == "cold"
+
+    refresher._plan_usage["Hot Module"] -= refresher.hot_window + 1
+    assert refresher.tier(1) == "warm"
+
+
+def test_hot_types_are_revalidated_ahead_of_expiry_but_not_before_esi(refresher):
+    put_jita(1, 10.0, NOW, expires_at=NOW + 700)
+    put_jita(2, 20.0, NOW)
+    put_jita(3, 30.0, NOW)
+
+    assert refresher.due(NOW + 539) == (False, [])
+    # Past the lead but ESI still serves the same page until its Expires
+    assert refresher.due(NOW + 600) == (False, [])
+    assert refresher.due(NOW + 700) == (False, [1])
+    # A due warm type refreshes the whole snapshot, which covers the hot ones too
+    assert refresher.due(NOW + 1740) == (True, [])
+
+
+def test_background_fetches_never_carry_a_token(refresher, monkeypatch):
+    sent = []
+    monkeypatch.setattr(refresher_module.forge_snapshot, "ensure_fresh", lambda headers, force=False: sent.append(headers))
+    monkeypatch.setattr(price_store, "flush", lambda: None)
+
+    assert refresher.run_once(now=NOW)["snapshot"] is True  # Nothing cached yet, so everything is due
+    assert sent and all("Authorization" not in headers for headers in sent)
+
+
+def test_cached_results_use_prices_within_their_tier(refresher, monkeypatch):
+    monkeypatch.setattr(refresher, "_thread", threading.current_thread())
+    put_jita(1, 10.0, NOW)
+    put_jita(2, 20.0, NOW)
+    price_store.mark_fetched(JITA_STATION_ID, fetched_at=NOW)  # Snapshot had no orders for type 3
+    price_store.put_many(STRUCTURE_ID, {1: 9.0}, "structure", fetched_at=NOW)
+    jobs = [(1, None), (2, None), (3, None), (1, STRUCTURE_ID)]
+
+    results, missing = refresher.cached_results(jobs, now=NOW + 100)
+    assert results == [
+        (1, (10.0, "jita"), False),
+        (2, (20.0, "jita"), False),
+        (3, (None, "not_found"), False),
+    ]
+    # Structure prices are fetched on the request path, with the caller's own token
+    assert missing == [(1, STRUCTURE_ID)]
+
+    # Hot prices go stale first, warm ones keep being served
+    results, missing = refresher.cached_results(jobs, now=NOW + 900)
+    assert missing == [(1, None), (1, STRUCTURE_ID)]
+    assert [r[0] for r in results] == [2, 3]
+
+
+def test_cached_results_fall_back_to_the_snapshot_region_price(refresher, monkeypatch):
+    monkeypatch.setattr(refresher, "_thread", threading.current_thread())
+    price_store.put_many(JITA_STATION_ID, {1: 10.0}, "jita", fetched_at=NOW)
+    price_store.put_many(JITA_REGION_ID, {1: 8.0, 3: 30.0}, "jita", fetched_at=NOW)
+
+    results, missing = refresher.cached_results([(1, None), (3, None)], now=NOW + 100)
+    assert results == [(1, (10.0, "jita"), False), (3, (30.0, "jita"), False)]
+    assert missing == []
+
+
+def test_cached_results_fetch_everything_when_not_running(refresher):
+    put_jita(1, 10.0, NOW)
+    assert refresher.cached_results([(1, None)], now=NOW + 1) == ([], [(1, None)])
+
+
+def test_run_once_picks_per_type_or_snapshot(refresher, monkeypatch):
+    calls = []
+    monkeypatch.setattr(refresher_module.forge_snapshot, "ensure_fresh", lambda headers, force=False: calls.append("snapshot"))
+    monkeypatch.setattr(
+        refresher_module.price_fetcher, "revalidate_jita_prices",
+        lambda type_ids, headers: calls.append(list(type_ids)) or {tid: (1.0, "jita") for tid in type_ids},
+    )
+    monkeypatch.setattr(price_store, "flush", lambda: calls.append("flush"))
+    put_jita(1, 10.0, NOW)
+    put_jita(2, 20.0, NOW)
+    put_jita(3, 30.0, NOW)
+
+    assert refresher.run_once(now=NOW + 10) == {"snapshot": False, "types": 0}
+    assert calls == []
+    assert refresher.run_once(now=NOW + 560)["types"] == 1
+    assert calls == [[1], "flush"]
+    assert refresher.run_once(now=NOW + 1800)["snapshot"] is True
+    assert calls[-2:] == ["snapshot", "flush"]
+
+
+
+def test_create_app_does_not_start_the_refresher():
+    from app import create_app, start_background_tasks
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    assert not refresher_module.price_refresher.running
+    start_background_tasks(app)  # Entry points opt in; a testing app still stays quiet
+    assert not refresher_module.price_refresher.running
@@ -0,0 +1,57 @@
+import sys
+import os
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.catalog_state import catalog_changed
+from routes.result_cache import ResultCache, optimization_cache, optimization_key
+
+
+def make_bp(name, sell_price=100.0, max=None):
+    return SimpleNamespace(
+        name=name, tier="T1", type_id=1, amt_per_run=1, materials={"Minerals": {"Tritanium": 10}},
+        sell_price=sell_price, material_cost=50.0, max=max,
+    )
+
+
+def make_mat(name, quantity, sell_price=5.0):
+    return SimpleNamespace(name=name, type_id=34, quantity=quantity, sell_price=sell_price, category="Minerals")
+
+
+def test_key_ignores_row_order():
+    bps = [make_bp("Rifter"), make_bp("Merlin")]
+    mats = [make_mat("Tritanium", 1000), make_mat("Pyerite", 500)]
+
+    assert optimization_key(bps, mats, solver="cbc") == optimization_key(bps[::-1], mats[::-1], solver="cbc")
+
+
+def test_key_changes_with_inputs():
+    bps = [make_bp("Rifter")]
+    mats = [make_mat("Tritanium", 1000)]
+    base = optimization_key(bps, mats, solver="cbc")
+
+    assert optimization_key([make_bp("Rifter", sell_price=101.0)], mats, solver="cbc") != base
+    assert optimization_key([make_bp("Rifter", max=5)], mats, solver="cbc") != base
+    assert optimization_key(bps, [make_mat("Tritanium", 999)], solver="cbc") != base
+    assert optimization_key(bps, [make_mat("Tritanium", 1000, sell_price=6.0)], solver="cbc") != base
+    assert optimization_key(bps, mats, solver="highs") != base
+
+
+def test_lru_eviction_and_stats():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["size"] == 2
+
+
+def test_catalog_change_clears_optimization_cache():
+    optimization_cache.put("key", {"status": "Optimal"})
+    catalog_changed("materials")
+    assert optimization_cache.get("key") is None
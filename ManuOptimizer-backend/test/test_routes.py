@@ -5,12 +5,11 @@ import pytest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app import create_app
 from models import db, Blueprint, Material
+from routes.utils import build_material_rows
 
 @pytest.fixture
 def app():
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
     return app
 
 @pytest.fixture
@@ -24,8 +23,8 @@ def client(app):
 @pytest.fixture
 def sample_data(app):
     with app.app_context():
-        blueprint1 = Blueprint(name="Item1", materials={"Category1": {"Material1": 2, "Material2": 1}}, sell_price=100, material_cost=50, max=5)
-        blueprint2 = Blueprint(name="Item2", materials={"Category2": {"Material2": 3, "Material3": 2}}, sell_price=150, material_cost=70)
+        blueprint1 = Blueprint(name="Item1", material_rows=build_material_rows({"Category1": {"Material1": 2, "Material2": 1}}), sell_price=100, material_cost=50, max=5)
+        blueprint2 = Blueprint(name="Item2", material_rows=build_material_rows({"Category2": {"Material2": 3, "Material3": 2}}), sell_price=150, material_cost=70)
         
         material1 = Material(name="Material1", quantity=10)
         material2 = Material(name="Material2", quantity=15)
@@ -0,0 +1,69 @@
+import sys
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from routes import utils
+from routes.sde import SdeIndex
+
+
+@pytest.fixture
+def sde_file(tmp_path):
+    path = tmp_path / "mini_sde.sqlite"
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE types (typeID INTEGER PRIMARY KEY, typeName TEXT);
+        CREATE TABLE materialClassifications (
+            typeID INTEGER PRIMARY KEY, typeName TEXT, groupID INTEGER, groupName TEXT,
+            categoryID INTEGER, categoryName TEXT, manufacturingCategory TEXT
+        );
+        INSERT INTO types VALUES (34, 'Tritanium'), (35, 'Pyerite'), (500, 'Twin Name'), (501, 'Twin Name'), (600, 'Café Module');
+        INSERT INTO materialClassifications VALUES (34, 'Tritanium', 18, 'Mineral', 4, 'Material', 'Minerals');
+    ''')
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_lookups_come_from_memory(sde_file):
+    index = SdeIndex(sde_file)
+    assert index.by_name["Tritanium"] == (34, "Minerals")
+    assert index.by_name["Pyerite"] == (35, "Other")  # No classification
+    assert index.by_name["Twin Name"] == (501, "Other")  # Highest typeID wins
+    assert index.type_name(600) == "Café Module"
+    assert index.type_name(1) is None
+
+    # The maps survive the file going away
+    index.close()
+    os.remove(sde_file)
+    assert index.by_name["Tritanium"] == (34, "Minerals")
+
+
+def test_connection_is_read_only(sde_file):
+    conn = SdeIndex(sde_file).connect()
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO types VALUES (1, 'Nope')")
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        SdeIndex(str(tmp_path / "missing.sqlite")).load()
+
+
+def test_get_item_info_normalizes_and_defaults(sde_file, monkeypatch):
+    monkeypatch.setattr(utils, "sde_index", SdeIndex(sde_file))
+    assert utils.get_item_info(["  Tritanium ", "Café Module", "Unknown"]) == {
+        "Tritanium": {"type_id": 34, "category": "Minerals"},
+        "Café Module": {"type_id": 600, "category": "Other"},
+        "Unknown": {"type_id": 0, "category": "Other"},
+    }
+    assert utils.get_item_name(35) == "Pyerite"
+
+
+def test_concurrent_first_use_loads_once(sde_file):
+    index = SdeIndex(sde_file)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: (index.by_name["Pyerite"], index.connect()), range(32)))
+    assert {r[0] for r in results} == {(35, "Other")}
+    assert len({id(r[1]) for r in results}) <= 8  # One connection per thread
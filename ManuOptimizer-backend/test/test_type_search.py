@@ -0,0 +1,89 @@
+import sys
+import os
+import sqlite3
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
+from flask import Flask
+from routes import types as types_routes
+from routes.sde import SdeIndex
+from routes.types import types_bp
+
+
+NAMES = [
+    (34, 'Tritanium'), (35, 'Pyerite'), (36, 'Mexallon'),
+    (3029, 'Tritanium Prospecting Array'), (638, 'Raven'), (17636, 'Raven Navy Issue'),
+    (17843, 'Drake Navy Issue'), (11399, 'Morphite'), (28668, 'Nanite Repair Paste'),
+]
+
+
+def build_sde(path, with_search_table):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE types (typeID INTEGER PRIMARY KEY, typeName TEXT);
+        CREATE TABLE materialClassifications (
+            typeID INTEGER PRIMARY KEY, typeName TEXT, groupID INTEGER, groupName TEXT,
+            categoryID INTEGER, categoryName TEXT, manufacturingCategory TEXT
+        );
+        INSERT INTO materialClassifications VALUES (34, 'Tritanium', 18, 'Mineral', 4, 'Material', 'Minerals');
+    ''')
+    conn.executemany("INSERT INTO types VALUES (?, ?)", NAMES)
+    if with_search_table:
+        # Same DDL as Utils/sdeExtractionCatalyst.py
+        conn.execute('''
+            CREATE VIRTUAL TABLE typeSearch USING fts5(
+                typeName, content='types', content_rowid='typeID', tokenize='trigram'
+            )
+        ''')
+        conn.execute("INSERT INTO typeSearch(typeSearch) VALUES ('rebuild')")
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+@pytest.fixture(params=[True, False], ids=["fts-in-file", "fts-in-memory"])
+def index(request, tmp_path):
+    return SdeIndex(build_sde(tmp_path / "mini_sde.sqlite", request.param))
+
+
+def names(results):
+    return [(r["name"], r["match"]) for r in results]
+
+
+def test_exact_then_prefix(index):
+    results = index.search("tritanium")
+    assert names(results) == [("Tritanium", "exact"), ("Tritanium Prospecting Array", "prefix")]
+    assert results[0] == {"type_id": 34, "name": "Tritanium", "category": "Minerals", "match": "exact"}
+
+
+def test_word_and_substring_matches(index):
+    assert names(index.search("navy")) == [("Drake Navy Issue", "word"), ("Raven Navy Issue", "word")]
+    assert names(index.search("phit")) == [("Morphite", "substring")]
+
+
+def test_typos_fall_back_to_fuzzy(index):
+    assert names(index.search("Trtanium"))[0] == ("Tritanium", "fuzzy")
+    assert names(index.search("ravn navy issue"))[0] == ("Raven Navy Issue", "fuzzy")
+
+
+def test_short_and_empty_queries(index):
+    assert names(index.search("Ra")) == [("Raven", "prefix"), ("Raven Navy Issue", "prefix")]
+    assert index.search("   ") == []
+    assert index.search("zzzz") == []
+
+
+def test_limit_keeps_the_best(index):
+    assert names(index.search("raven", limit=1)) == [("Raven", "exact")]
+
+
+def test_search_endpoint(index, monkeypatch):
+    monkeypatch.setattr(types_routes, "sde_index", index)
+    app = Flask(__name__)
+    app.register_blueprint(types_bp)
+    client = app.test_client()
+
+    response = client.get('/api/types/search?q=pye')
+    assert response.status_code == 200
+    assert response.get_json() == [{"type_id": 35, "name": "Pyerite", "category": "Other", "match": "prefix"}]
+
+    assert client.get('/api/types/search').get_json() == []
+    assert client.get('/api/types/search?q=raven&limit=nope').status_code == 400
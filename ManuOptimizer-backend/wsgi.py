@@ -1,4 +1,5 @@
 # wsgi.py
-from app import create_app
+from app import create_app, start_background_tasks
 
-application = create_app()
\ No newline at end of file
+application = create_app()
+start_background_tasks(application)
\ No newline at end of file